@@ -33,6 +33,7 @@ CREATE TABLE candidates (
     graduation_year INTEGER NOT NULL,
     total_citations INTEGER DEFAULT 0,
     h_index INTEGER DEFAULT 0,
+    ranking_score INTEGER DEFAULT 0,
     research_interests TEXT[] DEFAULT '{}',
     profile_image_url TEXT,
     linkedin_url TEXT,
@@ -57,6 +58,28 @@ CREATE TABLE publications (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- 4b. Normalized publications (build --pub-layout normalized): each paper stored once,
+--     linked to its candidate authors through candidate_publications
+CREATE TABLE papers (
+    id VARCHAR(255) PRIMARY KEY,  -- OpenAlex work id
+    title TEXT NOT NULL,
+    venue VARCHAR(255),
+    year INTEGER,
+    citations INTEGER DEFAULT 0,
+    doi TEXT,
+    abstract TEXT,
+    topic_id VARCHAR(255),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE candidate_publications (
+    candidate_id UUID REFERENCES candidates(id) ON DELETE CASCADE,
+    paper_id VARCHAR(255) REFERENCES papers(id) ON DELETE CASCADE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (candidate_id, paper_id)
+);
+
 -- 5. Candidate-Topic many-to-many relationship
 CREATE TABLE candidate_topics (
     candidate_id UUID REFERENCES candidates(id) ON DELETE CASCADE,
@@ -80,14 +103,45 @@ CREATE TABLE academic_metrics (
     UNIQUE(university_id, year)
 );
 
+-- 7. University comparison aggregates (written by the build; one row per university, label and year)
+-- papers = publication rows of the university's candidates in that year, counted as the
+-- comparison page's charts count them (see QUERY_LOGIC_EXPLANATION.md)
+CREATE TABLE university_conference_stats (
+    university_id UUID REFERENCES universities(id) ON DELETE CASCADE,
+    conference TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    papers INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (university_id, year, conference)
+);
+
+CREATE TABLE university_topic_stats (
+    university_id UUID REFERENCES universities(id) ON DELETE CASCADE,
+    topic TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    papers INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (university_id, year, topic)
+);
+
+CREATE TABLE university_emerging_topic_stats (
+    university_id UUID REFERENCES universities(id) ON DELETE CASCADE,
+    topic TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    papers INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (university_id, year, topic)
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_candidates_university_id ON candidates(university_id);
 CREATE INDEX idx_candidates_graduation_year ON candidates(graduation_year);
 CREATE INDEX idx_candidates_citations ON candidates(total_citations);
+CREATE INDEX idx_candidates_ranking_score ON candidates(ranking_score);
 CREATE INDEX idx_publications_candidate_id ON publications(candidate_id);
 CREATE INDEX idx_publications_paper_id ON publications(paper_id);
 CREATE INDEX idx_publications_year ON publications(year);
 CREATE INDEX idx_publications_citations ON publications(citations);
+CREATE INDEX idx_papers_year ON papers(year);
+CREATE INDEX idx_papers_citations ON papers(citations);
+CREATE INDEX idx_candidate_publications_paper_id ON candidate_publications(paper_id);
 CREATE INDEX idx_academic_metrics_university_year ON academic_metrics(university_id, year);
 
 -- Create updated_at trigger function
@@ -103,6 +157,7 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_universities_updated_at BEFORE UPDATE ON universities FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_candidates_updated_at BEFORE UPDATE ON candidates FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_publications_updated_at BEFORE UPDATE ON publications FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+CREATE TRIGGER update_papers_updated_at BEFORE UPDATE ON papers FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_research_topics_updated_at BEFORE UPDATE ON research_topics FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_academic_metrics_updated_at BEFORE UPDATE ON academic_metrics FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
@@ -110,14 +165,24 @@ CREATE TRIGGER update_academic_metrics_updated_at BEFORE UPDATE ON academic_metr
 ALTER TABLE universities ENABLE ROW LEVEL SECURITY;
 ALTER TABLE candidates ENABLE ROW LEVEL SECURITY;
 ALTER TABLE publications ENABLE ROW LEVEL SECURITY;
+ALTER TABLE papers ENABLE ROW LEVEL SECURITY;
+ALTER TABLE candidate_publications ENABLE ROW LEVEL SECURITY;
 ALTER TABLE research_topics ENABLE ROW LEVEL SECURITY;
 ALTER TABLE candidate_topics ENABLE ROW LEVEL SECURITY;
 ALTER TABLE academic_metrics ENABLE ROW LEVEL SECURITY;
+ALTER TABLE university_conference_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE university_topic_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE university_emerging_topic_stats ENABLE ROW LEVEL SECURITY;
 
 -- Create policies for public read access
 CREATE POLICY "Allow public read access on universities" ON universities FOR SELECT USING (true);
 CREATE POLICY "Allow public read access on candidates" ON candidates FOR SELECT USING (true);
 CREATE POLICY "Allow public read access on publications" ON publications FOR SELECT USING (true);
+CREATE POLICY "Allow public read access on papers" ON papers FOR SELECT USING (true);
+CREATE POLICY "Allow public read access on candidate_publications" ON candidate_publications FOR SELECT USING (true);
 CREATE POLICY "Allow public read access on research_topics" ON research_topics FOR SELECT USING (true);
 CREATE POLICY "Allow public read access on candidate_topics" ON candidate_topics FOR SELECT USING (true);
 CREATE POLICY "Allow public read access on academic_metrics" ON academic_metrics FOR SELECT USING (true);
+CREATE POLICY "Allow public read access on university_conference_stats" ON university_conference_stats FOR SELECT USING (true);
+CREATE POLICY "Allow public read access on university_topic_stats" ON university_topic_stats FOR SELECT USING (true);
+CREATE POLICY "Allow public read access on university_emerging_topic_stats" ON university_emerging_topic_stats FOR SELECT USING (true);
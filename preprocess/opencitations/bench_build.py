@@ -0,0 +1,1683 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_build.py
+----------------------------------------
+Micro/stage benchmarks for build_clean_dataset_chunked_v5_full.py
+
+Generates a synthetic OpenAlex-style metadata CSV (same columns as
+paper_citation_summary.csv) and times the old vs. new code paths. A stage
+exits non-zero (AssertionError) when the new path's output differs from the
+old one's; the timings are reported, never checked.
+
+Usage:
+    python bench_build.py pass1 --rows 200000
+    python bench_build.py pass2 --rows 200000 --student-first-year-min 2005
+    python bench_build.py workers --rows 1000000 --workers 1,4,16,32
+    python bench_build.py memory --rows 10000000 --student-first-year-min 2005
+    python bench_build.py alias --lookups 20000
+    python bench_build.py csrank
+    python bench_build.py csfetch --latency 0.05
+    python bench_build.py topics --rows 100000
+    python bench_build.py metrics --candidates 1000000
+    python bench_build.py finalize --candidates 1000000
+    python bench_build.py affiliation --candidates 1000000 --hops 1,2,3
+    python bench_build.py resume --rows 200000 --chunksize 5000 --workers 1,4
+    python bench_build.py checkpoint --rows 1000000 --chunksize 10000 --student-first-year-min 2005
+    SUPABASE_PGHOST=localhost SUPABASE_SSLMODE=disable ... python bench_build.py pgdiff --data-dir out/ --delta 0.02
+    SUPABASE_PGHOST=localhost SUPABASE_SSLMODE=disable ... python bench_build.py pgdelete --data-dir out/
+    python bench_build.py incremental --rows 1000000 --delta 0.02
+    python bench_build.py layout --meta sample_meta.csv
+    python bench_build.py format --rows 100000 --student-first-year-min 2005
+    python bench_build.py compress --rows 1000000 --workers 1,4
+    python bench_build.py sample --rows 1000000 --target 100000
+    SUPABASE_PGHOST=localhost SUPABASE_SSLMODE=disable ... python bench_build.py pgload --data-dir out/
+    SUPABASE_PGHOST=localhost SUPABASE_SSLMODE=disable ... python bench_build.py pgparallel --data-dir out/ --workers 1,4
+    SUPABASE_PGHOST=localhost SUPABASE_SSLMODE=disable ... python bench_build.py comparison --data-dir out/
+    python bench_build.py spill --rows 2000000 --student-first-year-min 2005 --memory-limits 1G,512M
+"""
+
+import os, io, sys, json, time, random, argparse, tempfile, csv, resource, subprocess, signal, glob, shutil, pickle
+from collections import defaultdict, Counter
+from itertools import zip_longest
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+import build_clean_dataset_chunked_v5_full as build
+import clean_demo
+
+FIRST = ["john", "wei", "maria", "ahmed", "yuki", "anna", "li", "carlos", "fatima", "ivan",
+         "sara", "jun", "omar", "elena", "raj", "chen", "lucas", "mei", "noah", "zoe"]
+LAST = ["smith", "wang", "garcia", "khan", "tanaka", "muller", "zhang", "silva", "ali", "petrov",
+        "kim", "liu", "hassan", "rossi", "patel", "chen", "martin", "lee", "brown", "wu"]
+WORDS = ["learning", "neural", "network", "graph", "image", "policy", "transformer", "model",
+         "language", "clustering", "vision", "systems", "secure", "query", "robust", "efficient"]
+FILLER = ["the", "of", "we", "propose", "method", "results", "data", "performance", "approach",
+          "analysis", "study", "using", "based", "paper", "show", "novel", "framework", "evaluation"]
+VENUES = ["ICML 2021", "NeurIPS", "CVPR", "ACL", "KDD", "VLDB", "Journal of ML Research", "arXiv"]
+
+
+def _author(rng, n_people):
+    i = rng.randrange(n_people)
+    first, last = FIRST[i % len(FIRST)], LAST[(i // len(FIRST)) % len(LAST)]
+    tag = i // (len(FIRST) * len(LAST))
+    style = i % 4
+    if style == 0:
+        return f"{first.title()} {last.title()} {tag}"
+    if style == 1:
+        return f"{last.title()}{tag}, {first.title()}"
+    if style == 2:
+        return f"{first.title()} {last.title()}{tag} [{rng.randint(1, 9)}]"
+    return f"{first[0].upper()}. {last.title()}{tag}"
+
+
+def make_meta(path, rows, seed=42, n_people=None, latex=0.0):
+    """latex: share of abstracts with TeX markup (backslashes), as in real OpenAlex abstracts."""
+    rng = random.Random(seed)
+    n_people = n_people or max(1000, rows // 3)
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "title", "abstract", "author", "pub_date", "venue", "doi", "citation_count"])
+        for i in range(rows):
+            authors = "; ".join(_author(rng, n_people) for _ in range(rng.randint(1, 6)))
+            title = " ".join(rng.choice(WORDS) if rng.random() < 0.3 else rng.choice(FILLER)
+                             for _ in range(rng.randint(4, 10)))
+            abstract = " ".join(rng.choice(WORDS) if rng.random() < 0.15 else rng.choice(FILLER)
+                                for _ in range(rng.randint(30, 80)))
+            if rng.random() < 0.05:
+                abstract = f'{abstract}\n\n"{rng.choice(WORDS)}", {rng.choice(WORDS)}'
+            if latex and rng.random() < latex:
+                abstract = f'{abstract} with $O(n \\log n)$ cost and "\\textit{{{rng.choice(WORDS)}}}"\\'
+            year = rng.randint(2005, 2024)
+            pub_date = f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}" if rng.random() > 0.02 else ""
+            w.writerow([f"https://openalex.org/W{i}", title, abstract, authors, pub_date,
+                        rng.choice(VENUES), f"10.1000/{i}", rng.choice([0, 0, 1, 3, 10, 50, 200])])
+    return path
+
+
+def legacy_pass2(meta_path, chunksize, pool, out_dir):
+    """pass2() as it was before the single buffered writer (reopen + utcnow per row)."""
+    pd = build.pd
+    pubs_path = os.path.join(out_dir, "publications.csv")
+    with open(pubs_path, "w", newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(build.PUB_COLUMNS)
+
+    per_cand = defaultdict(lambda: {"cit": [], "topics": [], "coauthors": set(), "first_year": None})
+    for chunk in pd.read_csv(meta_path, chunksize=chunksize, low_memory=False):
+        chunk.columns = [c.lower().strip() for c in chunk.columns]
+        for _, r in chunk.iterrows():
+            normed, _ = build.parse_authors(r.get("author", ""))
+            inter = [a for a in normed if a in pool]
+            if not inter:
+                continue
+            year = build.year_from_date(str(r.get("pub_date", "")))
+            citations = int(r.get("citation_count", 0) or 0)
+            topic_name = build.detect_topic(f"{r.get('title','')} {r.get('abstract','')}")
+            topic_id = build.stable_uuid("topic", topic_name)
+            for a in inter:
+                cid = build.stable_uuid("candidate", a)
+                pub_id = build.stable_uuid("pub", r.get("id", ""), a)
+                with open(pubs_path, "a", newline='') as f:
+                    writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+                    writer.writerow([
+                        pub_id, cid, r.get("title",""), r.get("venue",""), year or "",
+                        citations, r.get("doi",""), r.get("abstract",""),
+                        topic_id, datetime.utcnow().isoformat(), datetime.utcnow().isoformat()
+                    ])
+                d = per_cand[cid]
+                d["cit"].append(citations)
+                d["topics"].append(topic_name)
+                d["coauthors"].update(normed)
+                if year and (d["first_year"] is None or year < d["first_year"]):
+                    d["first_year"] = year
+    return per_cand
+
+
+def read_pubs(path, drop_ts=True):
+    """publications.csv rows, minus created_at/updated_at when drop_ts."""
+    with open(path, newline="") as f:
+        return [row[:-2] if drop_ts else row for row in csv.reader(f)]
+
+
+def _read_parquet(path, drop_ts=True):
+    """A Parquet file/dataset as a string DataFrame shaped like the CSV output."""
+    import pyarrow.dataset as ds
+    df = ds.dataset(path, format="parquet", partitioning="hive").to_table().to_pandas()
+    if drop_ts:
+        df = df.drop(columns=["created_at", "updated_at"], errors="ignore")
+    return df.astype(object).where(df.notna(), "").astype(str)
+
+
+def csv_output(out_dir, name):
+    """Path of a plain or --compress'ed CSV table in out_dir, or None."""
+    return next((p for p in (os.path.join(out_dir, f"{name}.{fmt}") for fmt in ("csv", "csv.gz", "csv.zst"))
+                 if os.path.exists(p)), None)
+
+
+def read_pub_tables(out_dir):
+    """Every publication table present in out_dir (see --pub-layout/--format), minus timestamp columns."""
+    out = {}
+    for table in build.PUB_TABLES:
+        path = csv_output(out_dir, table)
+        if path:
+            with io.TextIOWrapper(build.open_input(path), newline="") as f:
+                rows = list(csv.reader(f))
+            keep = [i for i, c in enumerate(rows[0]) if c not in ("created_at", "updated_at")]
+            out[table] = [[r[i] for i in keep] for r in rows]
+        elif os.path.exists(os.path.join(out_dir, f"{table}.parquet")):
+            df = _read_parquet(os.path.join(out_dir, f"{table}.parquet"))
+            out[table] = [list(df.columns)] + sorted(map(list, df.values))
+    return out
+
+
+def csv_tables_equal(a, b):
+    """Stream every CSV output table of two out dirs side by side, ignoring timestamp columns."""
+    names = ["candidates", "universities", "academic_metrics", "research_topics", "candidate_topics",
+             *build.PUB_TABLES]
+    for name in names:
+        pa, pb = csv_output(a, name), csv_output(b, name)
+        if (pa is None) != (pb is None):
+            return False
+        if pa is None:
+            continue
+        with io.TextIOWrapper(build.open_input(pa), newline="") as fa, \
+             io.TextIOWrapper(build.open_input(pb), newline="") as fb:
+            ra, rb = csv.reader(fa), csv.reader(fb)
+            header = next(ra)
+            if next(rb) != header:
+                return False
+            keep = [i for i, c in enumerate(header) if c not in ("created_at", "updated_at")]
+            for x, y in zip_longest(ra, rb):
+                if x is None or y is None or [x[i] for i in keep] != [y[i] for i in keep]:
+                    return False
+    return True
+
+
+def timed(fn, *a, **kw):
+    t0 = time.perf_counter()
+    out = fn(*a, **kw)
+    return out, time.perf_counter() - t0
+
+
+def require(ok, what):
+    """Fail the stage (exit status 1) when an equivalence check does not hold.
+
+    Checks run after the timed calls and outside them; the timings are only reported.
+    """
+    if not ok:
+        raise AssertionError(what)
+
+
+def bench_pass1(meta, rows, chunksize, yrmin, yrmax):
+    old, t_old = timed(build.pass1, meta, chunksize, yrmin, yrmax)
+    new, t_new = timed(build.pass1_vectorized, meta, chunksize, yrmin, yrmax)
+    print(f"[pass1] rows        : {rows / t_old:12,.0f} rows/s  ({t_old:.2f}s)")
+    print(f"[pass1] vectorized  : {rows / t_new:12,.0f} rows/s  ({t_new:.2f}s)  x{t_old / t_new:.1f}")
+    print(f"[pass1] pool size   : {len(old):,} vs {len(new):,}  identical={old == new}")
+    require(old == new, "pass1_vectorized pool differs from pass1")
+
+
+def bench_pass2(meta, rows, chunksize, yrmin, yrmax, tmp):
+    pool = build.pass1_vectorized(meta, chunksize, yrmin, yrmax)
+    old_dir, new_dir = os.path.join(tmp, "old"), os.path.join(tmp, "new")
+    os.makedirs(old_dir, exist_ok=True)
+    os.makedirs(new_dir, exist_ok=True)
+    _, t_old = timed(legacy_pass2, meta, chunksize, pool, old_dir)
+    _, t_new = timed(build.pass2, meta, chunksize, pool, new_dir)
+    old_rows = read_pubs(os.path.join(old_dir, "publications.csv"))
+    new_rows = read_pubs(os.path.join(new_dir, "publications.csv"))
+    print(f"[pass2] per-row open : {rows / t_old:12,.0f} rows/s  ({t_old:.2f}s)")
+    print(f"[pass2] buffered     : {rows / t_new:12,.0f} rows/s  ({t_new:.2f}s)  x{t_old / t_new:.1f}")
+    print(f"[pass2] publications : {len(old_rows) - 1:,} rows  identical(ex. timestamps)={old_rows == new_rows}")
+    require(old_rows == new_rows, "pass2 publications differ from the per-row pass2")
+
+
+def bench_workers(meta, rows, chunksize, yrmin, yrmax, tmp, workers):
+    pool = build.pass1_vectorized(meta, chunksize, yrmin, yrmax)
+    base_rows, base_t = None, None
+    for n in workers:
+        out = os.path.join(tmp, f"w{n}")
+        os.makedirs(out, exist_ok=True)
+        if n > 1:
+            _, t = timed(build.pass2_parallel, meta, chunksize, pool, out, n)
+        else:
+            _, t = timed(build.pass2, meta, chunksize, pool, out)
+        pubs = read_pubs(os.path.join(out, "publications.csv"))
+        base_rows, base_t = base_rows or pubs, base_t or t
+        print(f"[pass2] workers={n:<3}: {rows / t:12,.0f} rows/s  ({t:.2f}s)  "
+              f"speedup x{base_t / t:.1f}  identical={pubs == base_rows}")
+        require(pubs == base_rows, f"workers={n}: publications differ from workers={workers[0]}")
+
+
+def _peak_rss(impl, meta, chunksize, yrmin, yrmax, out):
+    """Run pass1 + pass2 with the given per-candidate store and print peak RSS in KiB."""
+    pool = build.pass1_vectorized(meta, chunksize, yrmin, yrmax)
+    per_cand = (legacy_pass2 if impl == "dict" else build.pass2)(meta, chunksize, pool, out)
+    print(len(per_cand), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def bench_memory(meta, rows, chunksize, yrmin, yrmax, tmp):
+    for impl, label in [("dict", "dict-of-lists/sets"), ("store", "CandidateStore")]:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "_rss", "--impl", impl, "--meta", meta,
+             "--chunksize", str(chunksize), "--student-first-year-min", str(yrmin),
+             "--student-first-year-max", str(yrmax), "--out", tmp],
+            check=True, capture_output=True, text=True).stdout.split()
+        print(f"[memory] {label:<20}: peak RSS {int(out[-1]) / 1024:10,.1f} MiB  "
+              f"({int(out[-2]):,} candidates, {rows:,} rows)")
+
+
+def bench_alias(alias_json, csrank_csv, lookups, seed=42):
+    alias_map = build.load_alias_map(alias_json)
+    matcher, t_build = timed(build.AliasMatcher, alias_map)
+    rng = random.Random(seed)
+    real = [build.normalize_name(n) for n in build.pd.read_csv(csrank_csv)["author_name"].astype(str)]
+    names = [rng.choice(real) for _ in range(lookups // 2)]
+    names += [build.normalize_name(_author(rng, 100000)) for _ in range(lookups // 4)]
+    keys = list(alias_map)
+    names += [rng.choice(keys)[rng.randint(0, 4):] for _ in range(lookups - len(names))]
+
+    def linear(n):
+        for k, v in alias_map.items():
+            if k in n or n in k:
+                return v
+        return ""
+
+    old, t_old = timed(lambda: [linear(n) for n in names])
+    new, t_new = timed(lambda: [matcher.match(n) for n in names])
+    print(f"[alias] {len(alias_map):,} keys, {len(names):,} lookups, index built in {t_build * 1000:.0f} ms")
+    print(f"[alias] linear scan : {t_old / len(names) * 1e6:8.1f} us/lookup  ({t_old:.2f}s)")
+    print(f"[alias] AliasMatcher: {t_new / len(names) * 1e6:8.1f} us/lookup  ({t_new:.2f}s)  x{t_old / t_new:.1f}")
+    print(f"[alias] identical results: {old == new}  (hits={sum(1 for v in new if v):,})")
+    require(old == new, "AliasMatcher differs from the linear scan")
+
+
+def bench_csrank(csrank_csv, tmp):
+    index_path = os.path.join(tmp, "csranks.idx")
+    plain, t_pandas = timed(build.load_csranks_map, csrank_csv)
+    _, t_cold = timed(build.CsrIndex.load, csrank_csv, index_path)
+    index, t_warm = timed(build.CsrIndex.load, csrank_csv, index_path)
+    print(f"[csrank] pandas load_csranks_map : {t_pandas * 1000:8.1f} ms")
+    print(f"[csrank] CsrIndex cold (build)   : {t_cold * 1000:8.1f} ms")
+    print(f"[csrank] CsrIndex warm (sidecar) : {t_warm * 1000:8.1f} ms  x{t_pandas / t_warm:.1f}")
+
+    # Query forms seen in OpenAlex author strings: as-is, reversed, initialled first name
+    queries = []
+    for name in plain:
+        toks = name.split()
+        queries += [name, " ".join(toks[::-1])]
+        if len(toks) > 1:
+            queries.append(f"{toks[0][0]}. {' '.join(toks[1:])}")
+    old, t_old = timed(lambda: [build.fuzzy_match(q, plain, {}) for q in queries])
+    new, t_new = timed(lambda: [build.fuzzy_match(q, index, {}) for q in queries])
+    agree = sum(1 for a, b in zip(old, new) if a and a == b)
+    gained = sum(1 for a, b in zip(old, new) if not a and b)
+    print(f"[csrank] {len(queries):,} lookups: dict variants {t_old / len(queries) * 1e6:.2f} us, "
+          f"CsrIndex {t_new / len(queries) * 1e6:.2f} us")
+    print(f"[csrank] exact hits kept: {agree:,}/{sum(1 for a in old if a):,}  "
+          f"resolved via blocking key: {gained:,}")
+    require(agree == sum(1 for a in old if a), "CsrIndex lost or changed an exact hit of the dict lookup")
+
+
+def legacy_detect_topic(text, taxonomy=None):
+    """detect_topic() before TopicClassifier: bare substring tests, topic by topic."""
+    if not isinstance(text, str):
+        return "other"
+    s = text.lower()
+    for topic, kws in (taxonomy or build.TOPIC_KEYWORDS).items():
+        if any(kw in s for kw in kws):
+            return topic
+    return "other"
+
+
+def big_taxonomy(n_topics, kws_per_topic, seed=7):
+    """Synthetic taxonomy: n_topics made-up topics ahead of the real ones (worst case for a scan)."""
+    rng = random.Random(seed)
+    syll = ["qua", "zor", "plex", "vin", "tro", "mek", "sul", "dra", "fen", "kor"]
+    tax = {}
+    for t in range(n_topics):
+        tax[f"topic {t}"] = [" ".join("".join(rng.choice(syll) for _ in range(3)) for _ in range(rng.randint(1, 2)))
+                             for _ in range(kws_per_topic)]
+    tax.update(build.TOPIC_KEYWORDS)
+    return tax
+
+
+def check_topic_codes():
+    """label_codes() == classify() per row on both of its paths (per-topic masks, findall)."""
+    # Earlier topics whose keyword ends inside a later topic's keyword: "q" in "q-learning" etc.
+    tax = {"nlp": ["language"], "ml": ["q", "language model"], "rl": ["q-learning", "policy"]}
+    texts = build.pd.Series(["Q-learning for X", "language  models", "policies", "html", None, "a q b", ""],
+                            index=[5, 3, 9, 1, 0, 2, 7])
+    for many in (False, True):
+        clf = build.TopicClassifier(dict(tax, **{f"pad{i}": [f"pad{i}"] for i in range(20 if many else 0)}))
+        got = clf.label_codes(texts)
+        want = [clf.codes[clf.classify(t)] for t in texts]
+        if got.tolist() != want or not got.index.equals(texts.index):
+            raise AssertionError(f"{len(clf.names) - 1} topics: label_codes={got.tolist()} classify={want}")
+
+
+def bench_topics(meta, rows):
+    check_topic_codes()
+    df = build.pd.read_csv(meta, usecols=["title", "abstract"], dtype=str)
+    text = df["title"].fillna("") + " " + df["abstract"].fillna("")
+    texts = text.tolist()
+    for label, tax in [("default taxonomy", build.TOPIC_KEYWORDS), ("+500 topics x 20 kws", big_taxonomy(500, 20))]:
+        clf = build.TopicClassifier(tax)
+        n_kw = sum(len(v) for v in tax.values())
+        old, t_old = timed(lambda: [legacy_detect_topic(t, tax) for t in texts])
+        one, t_one = timed(lambda: [clf.classify(t) for t in texts])
+        codes, t_vec = timed(clf.label_codes, text)
+        new = [clf.names[c] for c in codes]
+        if new != one:
+            raise AssertionError(f"{label}: label_codes differs from classify on {sum(a != b for a, b in zip(new, one))} rows")
+        agree = sum(1 for a, b in zip(old, new) if a == b)
+        print(f"[topics] {label} ({n_kw:,} keywords)")
+        print(f"[topics]   substring loop   : {rows / t_old:12,.0f} rows/s")
+        print(f"[topics]   classify per row : {rows / t_one:12,.0f} rows/s")
+        print(f"[topics]   label_codes chunk: {rows / t_vec:12,.0f} rows/s  x{t_old / t_vec:.1f}")
+        print(f"[topics]   same label as substring loop: {agree / len(texts):.1%}")
+
+
+def check_metrics_property(trials=300, seed=0):
+    """Randomized check: bulk_metrics() == compute_h_index()/calc_scores() for every group."""
+    np = build.np
+    rng = np.random.default_rng(seed)
+    for t in range(trials):
+        n = int(rng.integers(1, 60))
+        sizes = rng.integers(0, 40, size=n)
+        hi = int(rng.choice([3, 50, 5000, 2 ** 31 - 1]))
+        groups = [rng.integers(-2 if t % 7 == 0 else 0, hi, size=k).tolist() for k in sizes]
+        flat_g = np.repeat(np.arange(n), sizes)
+        flat_c = np.array([c for cs in groups for c in cs], dtype=np.int64)
+        got = build.bulk_metrics(flat_g, flat_c, n)
+        for i, cs in enumerate(groups):
+            total, h, cnt = sum(cs), build.compute_h_index(cs), len(cs)
+            want = (cnt, total, h, build.calc_scores(total, h, cnt))
+            row = tuple(int(v) for v in got.iloc[i][["publication_count", "total_citations", "h_index", "ranking_score"]])
+            if row != want:
+                raise AssertionError(f"trial {t} group {i} citations={cs}: bulk={row} scalar={want}")
+    return trials
+
+
+def bench_metrics(candidates, seed=1):
+    np = build.np
+    rng = np.random.default_rng(seed)
+    print(f"[metrics] property check: {check_metrics_property()} random trials match the scalar functions")
+    sizes = rng.geometric(0.12, size=candidates)
+    group = np.repeat(np.arange(candidates), sizes)
+    cit = rng.zipf(1.8, size=group.size).clip(max=100000) - 1
+    per_cand = np.split(cit, np.cumsum(sizes)[:-1])
+
+    def scalar():
+        out = []
+        for cs in per_cand:
+            cs = cs.tolist()
+            total, h = sum(cs), build.compute_h_index(cs)
+            out.append(build.calc_scores(total, h, len(cs)))
+        return out
+
+    old, t_old = timed(scalar)
+    new, t_new = timed(build.bulk_metrics, group, cit, candidates)
+    print(f"[metrics] {candidates:,} candidates / {group.size:,} papers")
+    print(f"[metrics] scalar loop : {t_old:8.2f}s")
+    same = old == new["ranking_score"].tolist()
+    print(f"[metrics] bulk_metrics: {t_new:8.2f}s  x{t_old / t_new:.1f}  identical={same}")
+    require(same, "bulk_metrics ranking scores differ from the scalar loop")
+
+
+def legacy_finalize(per_cand, csr_map, alias_map, out_dir, region_map, resolver):
+    """finalize() before the columnar rewrite: per-row dicts, utcnow() per field, iterrows()."""
+    pd, stable_uuid = build.pd, build.stable_uuid
+    CURRENT_YEAR = datetime.utcnow().year
+    resolve = lambda co: build.fuzzy_match(co, csr_map, alias_map)
+    cand_rows, universities, topic_dict = [], {}, {}
+    metrics = build.bulk_metrics(*per_cand.citation_arrays(), len(per_cand))
+    totals, h_idx, scores = (metrics[c].tolist() for c in ("total_citations", "h_index", "ranking_score"))
+
+    for i, (cid, d) in enumerate(per_cand.items()):
+        name = cid.split("||")[-1]
+        co_uni_counter = Counter()
+        for co in sorted(d["coauthors"]):
+            if co == name:
+                continue
+            co_uni = resolver.get(co, resolve)
+            if co_uni:
+                co_uni_counter[co_uni] += 1
+        uni = co_uni_counter.most_common(1)[0][0] if co_uni_counter else "Unknown University"
+        uni_id = stable_uuid("university", uni)
+        universities[uni_id] = uni
+        first_pub = d.get("first_year", CURRENT_YEAR)
+        top3 = [t for t, _ in Counter(d["topics"]).most_common(3)]
+        for t in top3:
+            topic_dict[t] = stable_uuid("topic", t)
+        cand_rows.append({
+            "id": cid, "name": name, "university_id": uni_id,
+            "graduation_year": (first_pub + 5) if first_pub else CURRENT_YEAR,
+            "total_citations": totals[i], "h_index": h_idx[i], "ranking_score": scores[i],
+            "research_interests": "; ".join(top3),
+            "profile_image_url": "", "linkedin_url": "", "google_scholar_url": "",
+            "created_at": datetime.utcnow().isoformat(), "updated_at": datetime.utcnow().isoformat(),
+        })
+    df_cand = pd.DataFrame(cand_rows)
+    df_cand.to_csv(os.path.join(out_dir, "candidates.csv"), index=False, quoting=csv.QUOTE_ALL)
+    pd.DataFrame([{
+        "id": uid, "name": uname, "country": region_map.get(uname, "unknown"), "ranking": None,
+        "logo_url": "", "website": "",
+        "created_at": datetime.utcnow().isoformat(), "updated_at": datetime.utcnow().isoformat(),
+    } for uid, uname in universities.items()]).to_csv(os.path.join(out_dir, "universities.csv"), index=False, quoting=csv.QUOTE_ALL)
+    pd.DataFrame([{
+        "id": stable_uuid("academic_metrics", uid, CURRENT_YEAR), "university_id": uid, "year": CURRENT_YEAR,
+        "publications_count": int(grp.shape[0]), "total_citations": int(grp["total_citations"].sum()),
+        "h_index_avg": float(grp["h_index"].mean()), "conference_papers": 0, "journal_papers": 0,
+        "created_at": datetime.utcnow().isoformat(), "updated_at": datetime.utcnow().isoformat(),
+    } for uid, grp in df_cand.groupby("university_id")]).to_csv(os.path.join(out_dir, "academic_metrics.csv"), index=False, quoting=csv.QUOTE_ALL)
+    pd.DataFrame([{
+        "id": tid, "name": t, "description": "",
+        "created_at": datetime.utcnow().isoformat(), "updated_at": datetime.utcnow().isoformat(),
+    } for t, tid in topic_dict.items()]).to_csv(os.path.join(out_dir, "research_topics.csv"), index=False, quoting=csv.QUOTE_ALL)
+    rows = []
+    for _, r in df_cand.iterrows():
+        for t in [t.strip() for t in r["research_interests"].split(";") if t.strip()]:
+            if topic_dict.get(t):
+                rows.append({"candidate_id": r["id"], "topic_id": topic_dict[t],
+                             "created_at": datetime.utcnow().isoformat()})
+    pd.DataFrame(rows).to_csv(os.path.join(out_dir, "candidate_topics.csv"), index=False, quoting=csv.QUOTE_ALL)
+
+
+def synthetic_store(candidates, seed=3):
+    """CandidateStore with `candidates` slots, without running pass2.
+
+    Candidates co-author with each other: every paper lists one other candidate, and every
+    fourth candidate (a student) writes only with candidates, so its affiliation needs hops > 1.
+    """
+    rng = random.Random(seed)
+    store = build.CandidateStore()
+    n_people = max(1000, candidates * 3)
+    names = [build.normalize_name(_author(rng, n_people)) for _ in range(min(n_people, candidates * 3))]
+    cands = [f"{names[slot % len(names)]} {slot}" for slot in range(candidates)]
+    for slot in range(candidates):
+        aid = store.intern(cands[slot])
+        for _ in range(rng.randint(1, 12)):
+            outside = [] if slot % 4 == 3 else [rng.choice(names) for _ in range(2)]
+            co = [store.intern(n) for n in outside + [rng.choice(cands)]] + [aid]
+            store.add(aid, rng.choice([0, 1, 3, 10, 50]), rng.randrange(len(store.topic_names)),
+                      co, rng.randint(2010, 2022))
+    return store
+
+
+def legacy_infer_universities(store, resolver, resolve):
+    """infer_universities() before the coauthor graph: a Counter over sorted names per slot."""
+    names, unis = store.author_names, []
+    for slot in range(len(store)):
+        counter = Counter()
+        for co in sorted({names[c] for c in store.coauthors[slot]}):
+            co_uni = resolver.get(co, resolve)
+            if co_uni:
+                counter[co_uni] += 1
+        unis.append(counter.most_common(1)[0][0] if counter else "Unknown University")
+    return unis
+
+
+def check_affiliation_property(trials=300, seed=0):
+    """Randomized check: one-hop infer_universities() == the Counter loop, ties included;
+    extra hops only fill candidates the first hop left unknown."""
+    for t in range(trials):
+        rng = random.Random(seed + t)
+        people = [f"p{rng.randrange(60)}{rng.choice(['', ' x', ' y z'])}" for _ in range(rng.randint(1, 80))]
+        affil = {p: rng.choice([None, "", "U1", "U2", "U3", "U4"]) for p in people}
+        resolve = affil.get
+        store = build.CandidateStore()
+        for _ in range(rng.randint(0, 200)):
+            ids = [store.intern(p) for p in rng.sample(people, min(len(people), rng.randint(1, 6)))]
+            store.add(ids[0], 1, 0, ids, 2015)
+        want = legacy_infer_universities(store, build.ResolutionCache(), resolve)
+        got = build.infer_universities(store, build.ResolutionCache(), resolve)
+        if got != want:
+            raise AssertionError(f"trial {t}: graph={got} loop={want}")
+        slots = rng.sample(range(len(store)), len(store) // 2)
+        if build.infer_universities(store, build.ResolutionCache(), resolve, slots) != [want[i] for i in slots]:
+            raise AssertionError(f"trial {t}: slot subset differs")
+        multi = build.infer_universities(store, build.ResolutionCache(), resolve, hops=3)
+        if any(a != b for a, b in zip(want, multi) if a != build.UNKNOWN_UNIVERSITY):
+            raise AssertionError(f"trial {t}: extra hops changed a first-hop answer")
+
+    # A student whose only coauthor is its advisor takes the advisor's university on the second hop
+    store = build.CandidateStore()
+    advisor, student, colleague = (store.intern(p) for p in ("advisor", "student", "colleague"))
+    store.add(advisor, 1, 0, [advisor, colleague], 2012)
+    store.add(student, 1, 0, [student, advisor], 2018)
+    resolve = {"colleague": "U1"}.get
+    for hops, want in ((1, ["U1", build.UNKNOWN_UNIVERSITY]), (2, ["U1", "U1"])):
+        got = build.infer_universities(store, build.ResolutionCache(), resolve, hops=hops)
+        if got != want:
+            raise AssertionError(f"advisor/student, {hops} hop(s): {got} != {want}")
+    return trials
+
+
+def bench_affiliation(candidates, csrank_csv, alias_json, tmp, hops):
+    print(f"[affiliation] property check: {check_affiliation_property()} random trials match the Counter loop")
+    store = synthetic_store(candidates)
+    csr = build.CsrIndex.load(csrank_csv, os.path.join(tmp, "csranks.idx"))
+    alias = build.AliasMatcher(build.load_alias_map(alias_json))
+    resolver = build.ResolutionCache()
+    resolve = lambda co: build.fuzzy_match(co, csr, alias)
+    # Warm the resolver so both runs time inference, not fuzzy matching
+    _, t_resolve = timed(build.infer_universities, store, resolver, resolve)
+    old, t_old = timed(legacy_infer_universities, store, resolver, resolve)
+    print(f"[affiliation] {candidates:,} candidates, {len(resolver._map):,} distinct coauthors "
+          f"(cold resolve {t_resolve:.2f}s)")
+    print(f"[affiliation] Counter loop   : {t_old:8.2f}s")
+    results = {}
+    for k in hops:
+        new, t_new = timed(build.infer_universities, store, resolver, resolve, hops=k)
+        results[k] = new
+        unknown = new.count(build.UNKNOWN_UNIVERSITY)
+        print(f"[affiliation] graph, {k} hop(s): {t_new:8.2f}s  x{t_old / t_new:.1f}  "
+              f"unknown={unknown:,} ({unknown / max(len(new), 1):.1%})")
+
+    if 1 in results and results[1] != old:
+        raise AssertionError("1 hop: graph vote differs from the Counter loop")
+    if 1 in results and 2 in results:
+        filled = sum(a == build.UNKNOWN_UNIVERSITY and b != a for a, b in zip(results[1], results[2]))
+        if not filled:
+            raise AssertionError("2 hops resolved no candidate that 1 hop left unknown")
+        print(f"[affiliation] 2 hops resolved {filled:,} candidates 1 hop left unknown")
+
+
+def read_tables(out_dir, drop_ts=True):
+    out = {}
+    for name in ["candidates", "universities", "academic_metrics", "research_topics", "candidate_topics"]:
+        if os.path.exists(os.path.join(out_dir, f"{name}.parquet")):
+            out[name] = _read_parquet(os.path.join(out_dir, f"{name}.parquet"), drop_ts)
+            continue
+        out[name] = build.pd.read_csv(csv_output(out_dir, name), dtype=str, keep_default_na=False)
+        if drop_ts:
+            out[name] = out[name].drop(columns=["created_at", "updated_at"], errors="ignore")
+    return out
+
+
+def bench_finalize(candidates, csrank_csv, alias_json, tmp):
+    store = synthetic_store(candidates)
+    csr = build.CsrIndex.load(csrank_csv, os.path.join(tmp, "csranks.idx"))
+    alias = build.AliasMatcher(build.load_alias_map(alias_json))
+    resolver = build.ResolutionCache()
+    # Warm the resolver so both runs time table emission, not coauthor resolution
+    build.infer_universities(store, resolver, lambda co: build.fuzzy_match(co, csr, alias))
+    old_dir, new_dir = os.path.join(tmp, "old"), os.path.join(tmp, "new")
+    os.makedirs(old_dir, exist_ok=True)
+    os.makedirs(new_dir, exist_ok=True)
+    _, t_old = timed(legacy_finalize, store, csr, alias, old_dir, {}, resolver)
+    _, t_new = timed(build.finalize, store, csr, alias, new_dir, {}, resolver)
+    old, new = read_tables(old_dir), read_tables(new_dir)
+    same = all(old[k].equals(new[k]) for k in old)
+    print(f"[finalize] {candidates:,} candidates")
+    print(f"[finalize] row loop : {t_old:8.2f}s")
+    print(f"[finalize] columnar : {t_new:8.2f}s  x{t_old / t_new:.1f}  identical(ex. timestamps)={same}")
+    require(same, "columnar finalize tables differ from the row loop")
+
+
+def bench_layout(meta, chunksize, yrmin, yrmax, tmp):
+    """Bytes of publications.csv vs. papers.csv + candidate_publications.csv for the same pass2."""
+    pool = build.pass1_vectorized(meta, chunksize, yrmin, yrmax)
+    sizes = {}
+    for layout in ("denormalized", "normalized"):
+        out = os.path.join(tmp, layout)
+        os.makedirs(out, exist_ok=True)
+        _, t = timed(build.pass2, meta, chunksize, pool, out, pub_layout=layout)
+        sizes[layout] = build.publication_bytes(out)
+        print(f"[layout] {layout:<12}: {t:6.2f}s  " +
+              "  ".join(f"{k}={v / 2**20:,.1f} MiB" for k, v in sizes[layout].items()))
+    pubs = read_pub_tables(os.path.join(tmp, "denormalized"))["publications"]
+    norm = read_pub_tables(os.path.join(tmp, "normalized"))
+    papers = {r[0]: r[1:] for r in norm["papers"][1:]}
+    # publications minus (id, candidate_id) == link + paper, ignoring duplicate author rows
+    joined = {(cid, *papers[pid]) for cid, pid in norm["candidate_publications"][1:]}
+    same = joined == {(r[1], *r[2:]) for r in pubs[1:]}
+    before, after = sum(sizes["denormalized"].values()), sum(sizes["normalized"].values())
+    print(f"[layout] {len(pubs) - 1:,} publication rows -> {len(papers):,} papers + "
+          f"{len(norm['candidate_publications']) - 1:,} links")
+    print(f"[layout] saved {(before - after) / 2**20:,.1f} MiB ({1 - after / before:.1%})  "
+          f"same content={same}")
+    require(same, "normalized layout joins back to other rows than publications")
+
+
+def bench_format(meta, chunksize, yrmin, yrmax, tmp, csrank_csv, alias_json):
+    """Disk footprint and reload time of --format csv vs parquet, reloading as migrate_to_supabase.py does."""
+    import pyarrow.dataset as ds
+    tables = ["universities", "candidates", "publications", "papers", "candidate_publications",
+              "academic_metrics", "research_topics", "candidate_topics"]
+    for fmt in ("csv", "parquet"):
+        out = os.path.join(tmp, fmt)
+        cmd = [sys.executable, os.path.join(HERE, "build_clean_dataset_chunked_v5_full.py"),
+               "--meta", meta, "--csrank", csrank_csv, "--alias", alias_json, "--out-dir", out,
+               "--chunksize", str(chunksize), "--student-first-year-min", str(yrmin),
+               "--student-first-year-max", str(yrmax), "--no-resolve-cache", "--pub-layout", "both",
+               "--format", fmt]
+        _, t_build = timed(subprocess.run, cmd, check=True, capture_output=True)
+        size = sum(build.path_bytes(os.path.join(out, f"{t}.{fmt}")) for t in tables)
+        t0, rows = time.perf_counter(), {}
+        for t in tables:
+            path = os.path.join(out, f"{t}.{fmt}")
+            if fmt == "csv":
+                # migrate_to_supabase.py's publications read: python engine, bad lines skipped
+                df = build.pd.read_csv(path, on_bad_lines="skip", quotechar='"', escapechar="\\",
+                                       engine="python")
+            else:
+                df = ds.dataset(path, format="parquet", partitioning="hive").to_table().to_pandas()
+            rows[t] = len(df)
+        t_load = time.perf_counter() - t0
+        pubs = os.path.join(out, f"publications.{fmt}")
+        if fmt == "csv":
+            with open(pubs, newline="", encoding="utf-8") as f:
+                written = sum(1 for _ in csv.reader(f)) - 1
+        else:
+            written = ds.dataset(pubs, format="parquet", partitioning="hive").count_rows()
+        print(f"[format] {fmt:<7}: build {t_build:6.2f}s  disk {size / 2**20:8.1f} MiB  reload {t_load:6.2f}s  "
+              f"publications rows {rows['publications']:,}/{written:,}")
+        # The CSV reload skipping bad lines is what this stage shows; Parquet must lose nothing
+        if fmt == "parquet":
+            require(rows["publications"] == written, f"parquet reload lost {written - rows['publications']:,} rows")
+
+
+def compress_file(src_path, codec):
+    """src_path -> src_path.<codec> with the build's own (multithreaded) compressor."""
+    dst_path = f"{src_path}.{codec}"
+    with open(src_path, "rb") as src, open(dst_path, "wb") as raw, \
+            io.BufferedWriter(build._Compressor(raw, codec, build.COMPRESS_THREADS), build.IO_BUFFER) as dst:
+        shutil.copyfileobj(src, dst, build.IO_BUFFER)
+    return dst_path
+
+
+def bench_compress(meta, chunksize, yrmin, yrmax, tmp, workers, csrank_csv, alias_json):
+    """End-to-end build wall time from a plain vs .gz/.zst --meta, and with --compress outputs (local disk)."""
+    inputs = {"plain": meta}
+    for codec in ("gz", "zst"):
+        inputs[codec], t = timed(compress_file, meta, codec)
+        print(f"[compress] {codec:<4} input: {build.path_bytes(inputs[codec]) / 2**20:8.1f} MiB "
+              f"(plain {build.path_bytes(meta) / 2**20:.1f} MiB), compressed in {t:.2f}s")
+
+    def run_build(meta_path, out, n, *extra):
+        cmd = [sys.executable, os.path.join(HERE, "build_clean_dataset_chunked_v5_full.py"),
+               "--meta", meta_path, "--csrank", csrank_csv, "--alias", alias_json, "--out-dir", out,
+               "--chunksize", str(chunksize), "--student-first-year-min", str(yrmin),
+               "--student-first-year-max", str(yrmax), "--no-resolve-cache", "--workers", str(n), *extra]
+        return timed(subprocess.run, cmd, check=True, capture_output=True)[1]
+
+    def same(a, b):
+        old, new = read_tables(a), read_tables(b)
+        return all(old[k].equals(new[k]) for k in old) and read_pub_tables(a) == read_pub_tables(b)
+
+    for n in workers:
+        ref = os.path.join(tmp, f"plain-{n}")
+        for name, path in inputs.items():
+            out = os.path.join(tmp, f"{name}-{n}")
+            t = run_build(path, out, n)
+            identical = same(ref, out)
+            print(f"[compress] workers={n:<3} {name:<5} input : {t:7.2f}s  identical(ex. timestamps)={identical}")
+            require(identical, f"workers={n}: {name} input gives other tables than plain")
+        plain = sum(build.path_bytes(p) for p in glob.glob(os.path.join(ref, "*.csv")))
+        for codec in ("gz", "zst"):
+            out = os.path.join(tmp, f"out-{codec}-{n}")
+            t = run_build(meta, out, n, "--compress", codec)
+            size = sum(build.path_bytes(p) for p in glob.glob(os.path.join(out, f"*.csv.{codec}")))
+            identical = same(ref, out)
+            print(f"[compress] workers={n:<3} --compress {codec:<3}: {t:7.2f}s  outputs {size / 2**20:.1f} MiB "
+                  f"(plain {plain / 2**20:.1f} MiB)  identical(ex. timestamps)={identical}")
+            require(identical, f"workers={n}: --compress {codec} tables differ from plain")
+
+
+def run_peak_rss(cmd):
+    """Run cmd to completion; returns (seconds, peak RSS bytes of that child alone)."""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return time.perf_counter() - t0, usage.ru_maxrss * 1024
+
+
+def bench_spill(meta, chunksize, yrmin, yrmax, tmp, limits, csrank_csv, alias_json, build_opts=()):
+    """Peak RSS and wall time of the in-memory build vs --memory-limit, and whether the tables match."""
+    def run_build(out, *extra):
+        return run_peak_rss([sys.executable, os.path.join(HERE, "build_clean_dataset_chunked_v5_full.py"),
+                             "--meta", meta, "--csrank", csrank_csv, "--alias", alias_json, "--out-dir", out,
+                             "--chunksize", str(chunksize), "--student-first-year-min", str(yrmin),
+                             "--student-first-year-max", str(yrmax), "--no-resolve-cache", *build_opts, *extra])
+
+    def same(a, b):
+        if "parquet" not in build_opts:
+            return csv_tables_equal(a, b)
+        old, new = read_tables(a), read_tables(b)
+        return all(old[k].equals(new[k]) for k in old) and read_pub_tables(a) == read_pub_tables(b)
+
+    # Every build runs before any table is loaded here: a child forked from a large parent
+    # reports the parent's RSS as its own ru_maxrss.
+    ref = os.path.join(tmp, "in-memory")
+    results = [(None, ref) + run_build(ref)]
+    for limit in limits:
+        out = os.path.join(tmp, f"spill-{limit}")
+        results.append((limit, out) + run_build(out, "--memory-limit", limit))
+
+    for limit, out, t, rss in results:
+        if limit is None:
+            print(f"[spill] in-memory          : {t:7.2f}s  peak RSS {rss / 2**20:8.1f} MiB")
+            continue
+        with open(os.path.join(out, "RUN_SUMMARY.json")) as f:
+            spill = json.load(f)["spill"]
+        identical = same(ref, out)
+        print(f"[spill] --memory-limit {limit:<6}: {t:7.2f}s  peak RSS {rss / 2**20:8.1f} MiB "
+              f"(under limit={rss <= build.parse_size(limit)})  {spill['runs']} runs / {spill['batches']} batches, "
+              f"{spill['bytes'] / 2**20:.1f} MiB spilled  identical(ex. timestamps)={identical}")
+        if rss > build.parse_size(limit):
+            raise AssertionError(f"--memory-limit {limit}: peak RSS {rss / 2**20:,.1f} MiB over the limit")
+        if not identical:
+            raise AssertionError(f"--memory-limit {limit}: tables differ from the in-memory build")
+
+
+def legacy_sample_meta(in_path, out_path, target_full, chunksize):
+    """clean_demo.sample_meta before the reservoir sampler (logging removed)."""
+    pd = build.pd
+    samples_nonzero, samples_zero, total_nonzero = [], [], 0
+    for chunk in pd.read_csv(in_path, chunksize=chunksize, dtype=str, low_memory=False):
+        chunk["citation_count"] = pd.to_numeric(chunk["citation_count"], errors="coerce")
+        nonzero = chunk[chunk["citation_count"] > 0]
+        zero = chunk[chunk["citation_count"] == 0]
+        total_nonzero += len(nonzero)
+        if len(nonzero) > 0:
+            samples_nonzero.append(nonzero)
+        if len(zero) > 0 and len(samples_zero) < target_full * 3:
+            samples_zero.append(zero)
+        if total_nonzero >= target_full * 1.2:
+            break
+    df_nonzero = pd.concat(samples_nonzero) if samples_nonzero else pd.DataFrame()
+    df_zero = pd.concat(samples_zero) if samples_zero else pd.DataFrame()
+    if len(df_nonzero) >= target_full:
+        df_full = df_nonzero.sample(n=target_full, random_state=42)
+    else:
+        df_full = pd.concat([df_nonzero, df_zero.sample(n=min(target_full - len(df_nonzero), len(df_zero)),
+                                                        random_state=42)])
+    df_full.head(target_full).to_csv(out_path, index=False)
+
+
+def _sample_rss(impl, meta, chunksize, target, out):
+    """Run one sampler and print peak RSS in KiB."""
+    if impl == "legacy":
+        legacy_sample_meta(meta, out, target, chunksize)
+    else:
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                clean_demo.sample_meta(meta, out + ".demo", out, min(100, target), target, chunksize,
+                                       year_width=5, quotas={"citations": {"1+": 1.0}})
+            finally:
+                sys.stdout = stdout
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def bench_sample(meta, rows, chunksize, target, tmp):
+    """Legacy early-stopping sampler vs the stratified reservoir: time, peak RSS and where rows come from."""
+    pd = build.pd
+    full = pd.read_csv(meta, dtype=str, usecols=["id", "pub_date", "citation_count"])
+    pos = pd.Series(range(len(full)), index=full["id"])
+    year = full["pub_date"].str[:4]
+    population = year[pd.to_numeric(full["citation_count"], errors="coerce") > 0].value_counts(normalize=True)
+    for impl in ("legacy", "reservoir"):
+        out = os.path.join(tmp, f"sample-{impl}.csv")
+        proc, t = timed(subprocess.run,
+                        [sys.executable, os.path.abspath(__file__), "_sample", "--impl", impl, "--meta", meta,
+                         "--chunksize", str(chunksize), "--target", str(target), "--out", out],
+                        check=True, capture_output=True, text=True)
+        got = pd.read_csv(out, dtype=str)
+        where = pos.reindex(got["id"]).to_numpy()
+        share = got["pub_date"].str[:4].value_counts(normalize=True)
+        skew = (share.reindex(population.index, fill_value=0) - population).abs().max()
+        print(f"[sample] {impl:<9}: {t:6.2f}s  peak RSS {int(proc.stdout.split()[-1]) / 1024:8.1f} MiB  "
+              f"{len(got):,} rows  last row drawn {where.max() / len(full):6.1%} into the file  "
+              f"mean position {where.mean() / len(full):.3f}  max year-share error {skew:.3f}")
+
+
+def bench_resume(meta, chunksize, yrmin, yrmax, tmp, workers, csrank_csv, alias_json, build_opts=()):
+    """SIGKILL a build once pass2 has checkpointed, resume it, and diff against a clean run."""
+    script = os.path.join(HERE, "build_clean_dataset_chunked_v5_full.py")
+    for n in workers:
+        def cmd(out_dir, *extra):
+            return [sys.executable, script, "--meta", meta, "--csrank", csrank_csv, "--alias", alias_json,
+                    "--out-dir", out_dir, "--chunksize", str(chunksize),
+                    "--student-first-year-min", str(yrmin), "--student-first-year-max", str(yrmax),
+                    "--workers", str(n), "--no-resolve-cache", *build_opts, *extra]
+
+        clean, resumed = os.path.join(tmp, f"clean{n}"), os.path.join(tmp, f"resumed{n}")
+        _, t_clean = timed(subprocess.run, cmd(clean), check=True, capture_output=True)
+
+        ckpt = os.path.join(resumed, ".checkpoint")
+        proc = subprocess.Popen(cmd(resumed, "--checkpoint-every", "1"),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        # Wait for the first pass2 checkpoint (chunk or shard), then kill mid-pass
+        while proc.poll() is None and not (glob.glob(os.path.join(ckpt, "pass2.pkl")) or
+                                           glob.glob(os.path.join(ckpt, "shard-*.pkl"))):
+            time.sleep(0.01)
+        killed = proc.poll() is None
+        if killed:
+            time.sleep(t_clean * 0.2)
+            # The whole process group, so --workers children die with the build as in a crash
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+        _, t_resume = timed(subprocess.run, cmd(resumed, "--resume"), check=True, capture_output=True)
+
+        old, new = read_tables(clean), read_tables(resumed)
+        same = all(old[k].equals(new[k]) for k in old) and read_pub_tables(clean) == read_pub_tables(resumed)
+        print(f"[resume] workers={n:<3}: clean {t_clean:.2f}s, resume after kill {t_resume:.2f}s  "
+              f"killed={killed}  identical(ex. timestamps)={same}  checkpoint cleared={not os.path.exists(ckpt)}")
+        require(same, f"workers={n}: resumed build differs from a clean one")
+        require(not os.path.exists(ckpt), f"workers={n}: checkpoint left behind after the resumed build")
+
+
+class LegacyCheckpoint(build.Checkpoint):
+    """Checkpoint before deltas: every pass2 checkpoint pickles the whole store."""
+
+    def update(self, name, delta, snapshot):
+        self.save(name, snapshot())
+
+
+def bench_checkpoint(meta, chunksize, yrmin, yrmax, tmp, memory_limit, pub_layout="normalized"):
+    """pass2 with a checkpoint after every chunk: full snapshots vs. deltas + compaction.
+
+    Checks that the last snapshot plus its deltas restore exactly the store pass2 ended with."""
+    pool = build.pass1_vectorized(meta, chunksize, yrmin, yrmax)
+    fingerprint = ("bench", meta, chunksize)
+    for kind in ("store", "spill"):
+        for cls in (LegacyCheckpoint, build.Checkpoint):
+            out = os.path.join(tmp, f"{kind}_{cls.__name__}")
+            os.makedirs(out)
+            store = build.SpillStore(os.path.join(out, ".spill"), memory_limit) if kind == "spill" else None
+            ckpt = cls(out, fingerprint, every=1)
+            final, t = timed(build.pass2, meta, chunksize, pool, out, checkpoint=ckpt, pub_layout=pub_layout,
+                             store=store)
+            snapshots, snap_bytes, deltas, delta_bytes = ckpt.written["pass2"]
+            restored = build.load_pass2(build.Checkpoint(out, fingerprint))
+            if kind == "spill":
+                same = (restored["store"].names, restored["store"].first_year, restored["store"].runs) == \
+                       (final.names, final.first_year, final.runs)
+            else:
+                same = pickle.dumps(restored["store"]) == pickle.dumps(final)
+            print(f"[checkpoint] {kind:<5} {'full' if cls is LegacyCheckpoint else 'delta':<5}: pass2 {t:6.2f}s  "
+                  f"{snapshots:>4} snapshots {snap_bytes / 2**20:8.1f} MiB  {deltas:>4} deltas "
+                  f"{delta_bytes / 2**20:7.1f} MiB  restored identical={same}")
+            require(same, f"{kind} store restored from the {cls.__name__} checkpoint differs")
+            if kind == "spill":
+                final.cleanup()
+
+
+def _sorted_rows(tables):
+    """Row order aside: slots (and so candidates/publications order) differ once rows are re-read."""
+    return {k: sorted(map(tuple, v.values)) if hasattr(v, "values") else [v[0]] + sorted(v[1:])
+            for k, v in tables.items()}
+
+
+def bench_incremental(meta, chunksize, yrmin, yrmax, tmp, delta, csrank_csv, alias_json, build_opts=()):
+    """Full rebuild vs. --incremental after a random `delta` of the rows, from every year, arrives.
+
+    The new rows hold earlier papers of current candidates (some leave the window) and in-window
+    papers of authors whose only earlier papers were too recent (they enter with a history to re-read).
+    --meta is the old file with the rows appended (byte watermark), a delta-only file, or the
+    appended file gzipped (both found by id)."""
+    import gzip
+    pd = build.pd
+    df = pd.read_csv(meta, dtype=str, keep_default_na=False)
+    new = df.sample(frac=delta, random_state=0).sort_index()
+    paths = {k: os.path.join(tmp, f"{k}.csv") for k in ("base", "delta", "appended")}
+    df.drop(new.index).to_csv(paths["base"], index=False)
+    new.to_csv(paths["delta"], index=False)
+    shutil.copy(paths["base"], paths["appended"])
+    with open(paths["appended"], "a", newline="") as f:
+        new.to_csv(f, index=False, header=False)
+    paths["appended.gz"] = paths["appended"] + ".gz"
+    with open(paths["appended"], "rb") as src, gzip.open(paths["appended.gz"], "wb") as dst:
+        shutil.copyfileobj(src, dst)
+
+    def cmd(src, out_dir, *extra):
+        return [sys.executable, os.path.join(HERE, "build_clean_dataset_chunked_v5_full.py"),
+                "--meta", paths[src], "--csrank", csrank_csv, "--alias", alias_json, "--out-dir", out_dir,
+                "--chunksize", str(chunksize), "--student-first-year-min", str(yrmin),
+                "--student-first-year-max", str(yrmax), "--no-resolve-cache", *build_opts, *extra]
+
+    base, state = os.path.join(tmp, "base_out"), os.path.join(tmp, "state")
+    subprocess.run(cmd("base", base, "--state-dir", state), check=True, capture_output=True)
+    full = os.path.join(tmp, "full_out")
+    _, t_full = timed(subprocess.run, cmd("appended", full), check=True, capture_output=True)
+    ref = {**_sorted_rows(read_tables(full)), **_sorted_rows(read_pub_tables(full))}
+    print(f"[incremental] {len(df):,} rows, {len(new):,} new  full rebuild: {t_full:7.2f}s")
+    scenarios = [("appended", "appended", True), ("appended, by id", "appended", False), ("delta", "delta", True),
+                 ("appended.gz", "appended.gz", True)]
+    for label, src, mark in scenarios:
+        runs = {}
+        for mode, extra in (("delta", ()), ("snapshot", ("--snapshot",))):
+            out, st = (os.path.join(tmp, f"{label}_{mode}".replace(" ", "")) for _ in range(2))
+            st += "_state"
+            shutil.copytree(base, out)
+            shutil.copytree(state, st)
+            if not mark:
+                os.remove(os.path.join(st, "meta_mark.json"))
+            proc, runs[mode] = timed(subprocess.run, cmd(src, out, "--state-dir", st, "--incremental", *extra),
+                                     capture_output=True, text=True)
+        if proc.returncode:
+            # A delta-only file can't supply the history of authors entering the pool
+            reason = proc.stderr.strip().splitlines()[-1]
+            if src != "delta" or not reason.startswith("[ERROR]"):
+                raise AssertionError(f"--meta {label}: --incremental failed\n{proc.stderr}")
+            print(f"[incremental] --meta {label:<15}: refused {reason}")
+            continue
+        with open(glob.glob(os.path.join(out, "deltas", "*", "RUN_SUMMARY.json"))[0]) as f:
+            summary = json.load(f)
+        got = {**_sorted_rows(read_tables(out)), **_sorted_rows(read_pub_tables(out))}
+        bad = [k for k in ref if got.get(k) != ref[k]]
+        print(f"[incremental] --meta {label:<15}: delta {runs['delta']:6.2f}s  x{t_full / runs['delta']:.1f}  "
+              f"+ snapshot {runs['snapshot']:6.2f}s  {summary['new_candidates']:,} entered "
+              f"({summary['rescanned_candidates']:,} re-read, {summary['rescanned_publications']:,} publications), "
+              f"{summary['removed_candidates']:,} left  identical to full rebuild (ex. timestamps, order)={not bad}"
+              + (f"  differs: {', '.join(bad)}" if bad else ""))
+        if bad:
+            raise AssertionError(f"--meta {label}: --incremental --snapshot differs from a full rebuild in {bad}")
+
+
+def legacy_load_publications(conn, path):
+    """migrate_to_supabase.load_publications before the COPY loader, with the columns brought in line with
+    database-schema.sql. Rows the schema would reject (no year) and repeated ids are dropped up front:
+    either one aborts a whole execute_values batch."""
+    from psycopg2.extras import execute_values
+    pd = build.pd
+    df = pd.read_csv(path, on_bad_lines="skip", quotechar='"', escapechar='\\', engine="python")
+    cols = ["id", "candidate_id", "title", "venue", "year", "citations", "doi", "abstract", "topic_id",
+            "created_at", "updated_at"]
+    df = df.reindex(columns=cols)
+
+    def to_int_or_none(x):
+        try:
+            return int(x)
+        except Exception:
+            return None
+
+    def to_int_or_zero(x):
+        try:
+            return int(x)
+        except Exception:
+            return 0
+
+    df["year"] = df["year"].apply(to_int_or_none)
+    df["citations"] = df["citations"].apply(to_int_or_zero)
+    df = df.astype(object).where(df.notna(), None)
+    df = df[df["year"].notna()].drop_duplicates("id", keep="last")
+    df["title"] = df["title"].apply(lambda v: "" if v is None else v)
+    df["venue"] = df["venue"].apply(lambda v: "" if v is None else v)
+    sql = f"""
+    insert into publications ({", ".join(cols)}) values %s
+    on conflict (id) do update set {", ".join(f"{c} = excluded.{c}" for c in cols[1:] if c != "created_at")}
+    """
+    with conn.cursor() as cur:
+        for i in range(0, len(df), 5000):
+            execute_values(cur, sql, [tuple(row) for row in df.iloc[i:i + 5000].itertuples(index=False, name=None)])
+        conn.commit()
+
+
+def _pgload(impl, data_dir):
+    """Load publications from data_dir with one loader (or the parent tables, impl="parents")."""
+    import migrate_to_supabase as migrate
+    migrate.DATA_DIR = data_dir
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            if impl == "legacy":
+                conn = migrate.connect()
+                legacy_load_publications(conn, migrate.csv_source(migrate.table_path("publications")))
+                conn.close()
+                return
+            # The migration itself on one connection and one partition: COPY + staged merge
+            tables = ["universities", "research_topics", "candidates"] if impl == "parents" else ["publications"]
+            failed = migrate.main(tables, jobs=1, partitions=1)
+        finally:
+            sys.stdout = stdout
+    require(not failed, f"migrate_to_supabase.main failed on {failed}")
+
+
+def bench_pgload(data_dir):
+    """publications into Postgres (SUPABASE_* env): legacy execute_values vs COPY + staged merge.
+
+    Each loader runs on an empty table and again on a full one (every row conflicts); the table
+    checksum after each load must match across loaders."""
+    import migrate_to_supabase as migrate
+    migrate.DATA_DIR = data_dir
+
+    def child(impl):
+        return run_peak_rss([sys.executable, os.path.abspath(__file__), "_pgload", "--impl", impl,
+                             "--data-dir", data_dir])
+
+    conn = migrate.connect()
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE universities, research_topics CASCADE")
+    conn.commit()
+    child("parents")
+    digests = defaultdict(set)
+    for impl in ("legacy", "copy"):
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE publications")
+        conn.commit()
+        for run in ("empty table", "reload"):
+            t, rss = child(impl)
+            with conn.cursor() as cur:
+                # updated_at is set by the schema's update trigger, so a reload always changes it
+                cur.execute("SELECT count(*), md5(string_agg((to_jsonb(p) - 'updated_at')::text, '|' "
+                            "ORDER BY id)) FROM publications p")
+                n, digest = cur.fetchone()
+            print(f"[pgload] {impl:<6} {run:<11}: {t:7.2f}s  peak RSS {rss / 2**20:8.1f} MiB  "
+                  f"{n:,} rows  checksum {digest[:12]}")
+            digests[run].add((n, digest))
+    conn.close()
+    for run, seen in digests.items():
+        require(len(seen) == 1, f"{run}: loaders leave different publications tables")
+
+
+def pg_checksums(conn):
+    """count + checksum of every migrated table, ignoring the trigger-maintained updated_at."""
+    import migrate_to_supabase as migrate
+    sums = {}
+    with conn.cursor() as cur:
+        for table, spec in migrate.TABLES.items():
+            order = ", ".join(spec["key"])
+            cur.execute(f"SELECT count(*), md5(string_agg((to_jsonb(t) - 'updated_at')::text, '|' ORDER BY {order})) "
+                        f"FROM {table} t")
+            sums[table] = cur.fetchone()
+    return sums
+
+
+def check_pool_refused(data_dir):
+    """A server refusing every connection must fail the tables, not hang on an exhausted ConnectionPool."""
+    import socket
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        port = s.getsockname()[1]  # closed again below: nothing listens there
+    env = dict(os.environ, SUPABASE_PGHOST="localhost", SUPABASE_PGPORT=str(port), SUPABASE_SSLMODE="disable")
+    # One connection and one retry: the first refusal used to leak the only slot, the retry blocked forever
+    try:
+        proc = subprocess.run([sys.executable, os.path.join(HERE, "migrate_to_supabase.py"), "--data-dir", data_dir,
+                               "--tables", "universities", "--jobs", "1", "--retries", "1", "--no-manifest"],
+                              env=env, capture_output=True, text=True, timeout=120)
+    except subprocess.TimeoutExpired:
+        raise AssertionError("migrate_to_supabase.py hung after refused connections")
+    if proc.returncode != 1 or "[ERROR] universities" not in proc.stdout:
+        raise AssertionError(f"refused connections: exit {proc.returncode}\n{proc.stdout}{proc.stderr}")
+    print("[pgparallel] refused connections: table reported failed, no hang")
+
+
+def bench_pgparallel(data_dir, jobs):
+    """Full reload of data_dir with migrate_to_supabase.py --jobs/--partitions n, into emptied tables."""
+    import migrate_to_supabase as migrate
+    check_pool_refused(data_dir)
+    conn = migrate.connect()
+    ref = None
+    for n in jobs:
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {', '.join(migrate.TABLES)}")
+        conn.commit()
+        _, t = timed(subprocess.run, [sys.executable, os.path.join(HERE, "migrate_to_supabase.py"), "--data-dir",
+                                      data_dir, "--jobs", str(n), "--partitions", str(n), "--no-manifest"],
+                     check=True, capture_output=True)
+        sums = pg_checksums(conn)
+        ref = ref or sums
+        print(f"[pgparallel] --jobs {n:<3} --partitions {n:<3}: {t:7.2f}s  "
+              f"{sum(c for c, _ in sums.values()):,} rows  identical tables={sums == ref}")
+        require(sums == ref, f"--jobs {n}: loaded tables differ from --jobs {jobs[0]}")
+    conn.close()
+
+
+def bench_pgdiff(data_dir, delta, tmp):
+    """Refresh after a rebuild that changed `delta` of the candidates: re-upsert everything vs the manifest diff.
+
+    The rebuild restamps every row and edits h_index of the changed candidates and citations of their
+    publications. Reports wall time and tuples written (inserted + updated + deleted, all tables)."""
+    import migrate_to_supabase as migrate
+    pd = build.pd
+    mod = os.path.join(tmp, "rebuilt")
+    os.makedirs(mod)
+    for name in os.listdir(data_dir):
+        if name.endswith(".csv") and name not in ("candidates.csv", "publications.csv"):
+            os.symlink(os.path.join(data_dir, name), os.path.join(mod, name))
+    stamp = datetime.now().isoformat()
+    cands = pd.read_csv(os.path.join(data_dir, "candidates.csv"), dtype=str, keep_default_na=False)
+    changed = cands["id"].sample(frac=delta, random_state=0)
+    cands.loc[changed.index, "h_index"] = (cands.loc[changed.index, "h_index"].astype(int) + 1).astype(str)
+    cands["created_at"] = cands["updated_at"] = stamp
+    cands.to_csv(os.path.join(mod, "candidates.csv"), index=False)
+    with open(os.path.join(mod, "publications.csv"), "w", newline="") as out:
+        for i, pubs in enumerate(pd.read_csv(os.path.join(data_dir, "publications.csv"), dtype=str,
+                                             keep_default_na=False, chunksize=200000)):
+            hit = pubs["candidate_id"].isin(changed) & pubs["citations"].str.isdigit()
+            pubs.loc[hit, "citations"] = (pubs.loc[hit, "citations"].astype(int) + 1).astype(str)
+            pubs["created_at"] = pubs["updated_at"] = stamp
+            pubs.to_csv(out, index=False, header=i == 0)
+
+    conn = migrate.connect()
+
+    def written():
+        with conn.cursor() as cur:
+            cur.execute("SELECT coalesce(sum(n_tup_ins + n_tup_upd + n_tup_del), 0) FROM pg_stat_user_tables")
+            n = cur.fetchone()[0]
+        conn.commit()
+        return n
+
+    def push(src, *extra):
+        subprocess.run([sys.executable, os.path.join(HERE, "migrate_to_supabase.py"), "--data-dir", src,
+                        "--manifest-dir", os.path.join(tmp, "manifest"), *extra], check=True, capture_output=True)
+        time.sleep(1)  # let the finished backends' statistics reach pg_stat_user_tables
+
+    results = {}
+    for mode, extra in (("re-upsert all", ("--no-manifest",)), ("manifest diff", ())):
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {', '.join(migrate.TABLES)}")
+        conn.commit()
+        shutil.rmtree(os.path.join(tmp, "manifest"), ignore_errors=True)
+        push(data_dir)
+        before = written()
+        _, t = timed(push, mod, *extra)
+        results[mode] = pg_checksums(conn)
+        print(f"[pgdiff] {mode:<13}: {t:7.2f}s  {written() - before:>10,} tuples written  "
+              f"({len(changed):,} of {len(cands):,} candidates changed)")
+    same = results["re-upsert all"] == results["manifest diff"]
+    print(f"[pgdiff] identical tables={same}")
+    require(same, "manifest diff push leaves other tables than re-upserting everything")
+    conn.close()
+
+
+def bench_pgdelete(data_dir, tmp):
+    """Refresh data_dir's push with the manifest diff after the university with the most candidates is
+    removed (its candidates keep pointing to it), restored, and re-keyed (new id, candidates and stats moved).
+
+    Each delete of the old university row cascades into child rows the manifest still records. After
+    each refresh every table must match a full push of the same output into emptied tables."""
+    import migrate_to_supabase as migrate
+    pd = build.pd
+    unis = pd.read_csv(os.path.join(data_dir, "universities.csv"), dtype=str, keep_default_na=False)
+    cands = pd.read_csv(os.path.join(data_dir, "candidates.csv"), dtype=str, keep_default_na=False,
+                        usecols=["university_id"])
+    victim = cands["university_id"][cands["university_id"] != ""].value_counts().index[0]
+    rekeyed = build.stable_uuid("university", "rekeyed", victim)
+
+    def variant(name, edit):
+        out = os.path.join(tmp, name)
+        os.makedirs(out)
+        for fname in os.listdir(data_dir):
+            if not fname.endswith(".csv") or fname.endswith(".rejected.csv"):
+                continue
+            df = edit(fname[:-4], pd.read_csv(os.path.join(data_dir, fname), dtype=str, keep_default_na=False))
+            if df is None:
+                os.symlink(os.path.join(data_dir, fname), os.path.join(out, fname))
+            else:
+                df.to_csv(os.path.join(out, fname), index=False)
+        return out
+
+    def remove(table, df):
+        # edits return the new table, or None to link the original
+        if table == "universities":
+            return df[df["id"] != victim]
+
+    def rekey(table, df):
+        col = "id" if table == "universities" else "university_id"
+        if col in df and (df[col] == victim).any():
+            return df.assign(**{col: df[col].replace(victim, rekeyed)})
+
+    steps = [("university removed", variant("removed", remove)), ("university restored", data_dir),
+             ("university re-keyed", variant("rekeyed", rekey))]
+    conn = migrate.connect()
+
+    def truncate():
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {', '.join(migrate.TABLES)}")
+        conn.commit()
+
+    def push(src, *extra):
+        subprocess.run([sys.executable, os.path.join(HERE, "migrate_to_supabase.py"), "--data-dir", src,
+                        "--manifest-dir", os.path.join(tmp, "manifest"), *extra], check=True, capture_output=True)
+
+    truncate()
+    push(data_dir)
+    refreshed = {}
+    for step, src in steps:
+        _, t = timed(push, src)
+        refreshed[step] = pg_checksums(conn)
+        print(f"[pgdelete] {step:<19}: manifest diff {t:6.2f}s")
+    for step, src in steps:
+        truncate()
+        push(src, "--no-manifest")
+        full = pg_checksums(conn)
+        bad = [t for t in migrate.TABLES if refreshed[step][t] != full[t]]
+        print(f"[pgdelete] {step:<19}: {sum(c for c, _ in full.values()):,} rows  identical to full push={not bad}"
+              + "".join(f"\n    {t}: {refreshed[step][t][0]:,} rows vs {full[t][0]:,}" for t in bad))
+        require(not bad, f"{step}: manifest diff differs from a full push in {bad}")
+    conn.close()
+
+
+def legacy_download_csranks_files(save_dir, base):
+    """csrank_prof.download_csranks_files before the concurrent fetcher (base URL made a parameter)."""
+    import requests
+    os.makedirs(save_dir, exist_ok=True)
+    dfs = []
+    for letter in [chr(c) for c in range(ord('a'), ord('z') + 1)]:
+        fname = f"csrankings-{letter}.csv"
+        try:
+            resp = requests.get(base + fname, timeout=10)
+        except Exception:
+            continue
+        if resp.status_code == 200:
+            df = build.pd.read_csv(io.StringIO(resp.text))
+            df["source_file"] = fname
+            dfs.append(df)
+            df.to_csv(os.path.join(save_dir, fname), index=False)
+    return dfs
+
+
+def legacy_unify_and_clean(dfs):
+    """csrank_prof.unify_and_clean before per-file cleaning: cleans the concatenation of the raw frames."""
+    pd = build.pd
+    df_all = pd.concat(dfs, ignore_index=True)
+    keep = [c for c in ("name", "affiliation", "dept", "homepage") if c in df_all.columns] + ["source_file"]
+    df_sel = df_all[keep].rename(columns={"name": "author_name", "affiliation": "university_name",
+                                          "dept": "department"})
+    df_sel = df_sel[df_sel["university_name"].notna()].copy()
+    df_sel["author_name"] = df_sel["author_name"].str.strip()
+    df_sel["university_name"] = df_sel["university_name"].str.strip()
+    return df_sel.drop_duplicates(subset=["author_name"], keep="first").reset_index(drop=True)
+
+
+def csrankings_server(root, latency):
+    """Local stand-in for raw.githubusercontent.com: serves root/ with ETag and Last-Modified,
+    answers conditional requests with 304, and sleeps `latency` seconds per request."""
+    import hashlib
+    import threading
+    from email.utils import formatdate, parsedate_to_datetime
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        requests_seen = Counter()
+
+        def do_GET(self):
+            time.sleep(latency)
+            path = os.path.join(root, os.path.basename(self.path))
+            if not os.path.exists(path):
+                self.send_error(404)
+                return
+            with open(path, "rb") as f:
+                body = f.read()
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            mtime = int(os.path.getmtime(path))
+            since = self.headers.get("If-Modified-Since")
+            fresh = (self.headers.get("If-None-Match") == etag if self.headers.get("If-None-Match")
+                     else since is not None and parsedate_to_datetime(since).timestamp() >= mtime)
+            Handler.requests_seen[304 if fresh else 200] += 1
+            self.send_response(304 if fresh else 200)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+            if fresh:
+                self.end_headers()
+                return
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, Handler.requests_seen
+
+
+def bench_csfetch(csrank_csv, tmp, latency):
+    """Sequential legacy download vs the concurrent conditional fetcher against a local stand-in server."""
+    import csrank_prof
+    pd = build.pd
+    root = os.path.join(tmp, "upstream")
+    os.makedirs(root)
+    # Rebuild the 26 upstream files (name, affiliation, homepage, scholarid) from the affiliations table
+    aff = pd.read_csv(csrank_csv, dtype=str)
+    upstream = pd.DataFrame({"name": aff["author_name"], "affiliation": aff["university_name"],
+                             "homepage": aff["homepage"], "scholarid": "NOSCHOLARPAGE"})
+    for fname, df in upstream.groupby(aff["source_file"]):
+        df.to_csv(os.path.join(root, fname), index=False)
+    server, seen = csrankings_server(root, latency)
+    base = f"http://127.0.0.1:{server.server_port}/"
+    quiet = open(os.devnull, "w")
+
+    def run(label, fn, *a, **kw):
+        seen.clear()
+        stdout, sys.stdout = sys.stdout, quiet
+        try:
+            result, t = timed(fn, *a, **kw)
+        finally:
+            sys.stdout = stdout
+        print(f"[csfetch] {label:<28}: {t * 1000:8.1f} ms  HTTP 200 x{seen[200]:<3} 304 x{seen[304]:<3}")
+        return result
+
+    ref_out = os.path.join(tmp, "legacy.csv")
+    dfs = run("legacy sequential", legacy_download_csranks_files, os.path.join(tmp, "legacy_raw"), base)
+    run("legacy unify + save", lambda: csrank_prof.save_affiliation_csv(legacy_unify_and_clean(dfs), ref_out))
+
+    cache, out = os.path.join(tmp, "raw"), os.path.join(tmp, "affiliations.csv")
+    run("concurrent, cold cache", csrank_prof.build_affiliations, cache, out, base)
+    same = pd.read_csv(out).equals(pd.read_csv(ref_out))
+    mtime = os.path.getmtime(out)
+    rewritten = run("concurrent, nothing changed", csrank_prof.build_affiliations, cache, out, base)
+    kept = os.path.getmtime(out) == mtime
+    print(f"[csfetch] output rewritten when unchanged={rewritten}  mtime kept={kept}")
+    require(not rewritten and kept, "unchanged upstream rewrote affiliations.csv")
+
+    changed = os.path.join(root, "csrankings-m.csv")
+    df = pd.read_csv(changed, dtype=str)
+    df.loc[0, "affiliation"] = "Stand-in University"
+    df.to_csv(changed, index=False)
+    os.utime(changed, (time.time() + 5, time.time() + 5))
+    parsed_dir = os.path.join(cache, "parsed")
+    before = {f: os.path.getmtime(os.path.join(parsed_dir, f)) for f in os.listdir(parsed_dir)}
+    run("concurrent, one file changed", csrank_prof.build_affiliations, cache, out, base)
+    parsed = sorted(os.listdir(parsed_dir))
+    recleaned = [f for f in parsed if before.get(f) != os.path.getmtime(os.path.join(parsed_dir, f))]
+    stdout, sys.stdout = sys.stdout, quiet
+    try:
+        raw = legacy_download_csranks_files(os.path.join(tmp, "legacy_raw2"), base)
+        _, t_legacy = timed(legacy_unify_and_clean, raw)
+        csrank_prof.save_affiliation_csv(legacy_unify_and_clean(raw), ref_out)
+        cleaned = [csrank_prof.read_csranks_file(cache, f, csrank_prof.file_sha256(cache, f, {}))
+                   for f in sorted(os.listdir(root))]
+        _, t_unify = timed(csrank_prof.unify_and_clean, cleaned)
+    finally:
+        sys.stdout = stdout
+    same_changed = pd.read_csv(out).equals(pd.read_csv(ref_out))
+    print(f"[csfetch] one file changed: {len(recleaned)} file(s) re-parsed/cleaned {recleaned}  "
+          f"recombine {t_unify * 1000:.1f} ms vs legacy clean-all {t_legacy * 1000:.1f} ms  "
+          f"identical to legacy={same_changed}")
+    require(same_changed, "affiliations after one changed file differ from the legacy clean-all")
+    server.shutdown()
+    run("offline from cache", csrank_prof.build_affiliations, cache, out, base, offline=True)
+    moved = pd.read_csv(out).set_index("author_name").loc[df.loc[0, "name"], "university_name"]
+    print(f"[csfetch] cold output identical to legacy={same}  change picked up={moved == 'Stand-in University'}  "
+          f"{len(parsed)} parsed files cached")
+    require(same, "cold affiliations differ from the legacy download")
+    require(moved == "Stand-in University", "offline rebuild did not pick up the changed file")
+
+
+def _rows(conn, sql, params):
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+def legacy_university_comparison(conn, names, start, end):
+    """The three charts of src/api/universityComparison.ts before the aggregate tables: the same queries
+    (universities -> candidates -> publications), grouped as the page did in the browser.
+
+    Returns ({conference: {university: n}}, heatmap rows, {emerging topic: {university: n}}, rows fetched).
+    The page looked up each publication's candidate with candidates.find() and re-matched every interest
+    of every publication; a dict and a memoized matcher stand in for those here."""
+    unis = dict(_rows(conn, "SELECT id, name FROM universities WHERE name = ANY(%s)", (names,)))
+    ids = list(unis)
+    cands = _rows(conn, "SELECT id, university_id, research_interests FROM candidates "
+                        "WHERE university_id = ANY(%s::uuid[])", (ids,))
+    cand_ids = [c[0] for c in cands]
+    fetched = len(unis) + len(cands)
+
+    # Conference distribution: all publications (the page logged the available years), then the period
+    fetched += len(_rows(conn, "SELECT venue, year, candidate_id FROM publications "
+                               "WHERE candidate_id = ANY(%s::uuid[])", (cand_ids,)))
+    pubs = _rows(conn, "SELECT venue, year, candidate_id FROM publications WHERE candidate_id = ANY(%s::uuid[]) "
+                       "AND year >= %s AND year <= %s", (cand_ids, start, end))
+    fetched += len(pubs)
+    uni_of = {c[0]: unis[c[1]] for c in cands}
+    conferences = defaultdict(Counter)
+    for venue, _, cand in pubs:
+        conference = build.conference_of(venue)
+        if conference:
+            conferences[conference][uni_of[cand]] += 1
+
+    # Topic heatmap: a publication counts once for each research interest of its candidate
+    interests = {c[0]: c[2] for c in cands}
+    pubs = _rows(conn, "SELECT candidate_id, year FROM publications WHERE candidate_id = ANY(%s::uuid[]) "
+                       "AND year >= %s AND year <= %s", (cand_ids, start, end))
+    fetched += len(pubs)
+    topic_map = defaultdict(lambda: defaultdict(Counter))
+    for cand, year in pubs:
+        for topic in interests[cand] or []:
+            topic_map[uni_of[cand]][str(year)][topic] += 1
+    heatmap = _heatmap_rows(topic_map, names, start, end)
+
+    # Emerging topics: all publications, filtered to the period client-side
+    pubs = _rows(conn, "SELECT candidate_id, year FROM publications WHERE candidate_id = ANY(%s::uuid[])",
+                 (cand_ids,))
+    fetched += len(pubs)
+    emerging, matched = defaultdict(Counter), {}
+    for cand, year in pubs:
+        if start <= year <= end:
+            for topic in interests[cand] or []:
+                if topic not in matched:
+                    matched[topic] = build.emerging_topic_of(topic) if topic else None
+                et = matched[topic]
+                if et:
+                    emerging[et][uni_of[cand]] += 1
+    return conferences, heatmap, emerging, fetched
+
+
+def _heatmap_rows(topic_map, names, start, end):
+    """fetchTopicHeatmap's output rows from university -> year -> topic -> papers."""
+    topics = sorted({t for years in topic_map.values() for counts in years.values() for t in counts})
+    rows = []
+    for y, topic in enumerate(topics):
+        for university in names:
+            if university not in topic_map:
+                continue
+            for x, year in enumerate(str(v) for v in range(start, end + 1)):
+                papers = topic_map[university].get(year, {}).get(topic, 0)
+                rows.append((year, topic, papers, university, x, y, papers))
+    return rows
+
+
+def university_comparison(conn, names, start, end):
+    """The same three charts from the build's aggregate tables: one indexed read per chart."""
+    unis = dict(_rows(conn, "SELECT id, name FROM universities WHERE name = ANY(%s)", (names,)))
+    ids = list(unis)
+    fetched = len(unis)
+    charts = []
+    for table, label in (("university_conference_stats", "conference"), ("university_topic_stats", "topic"),
+                         ("university_emerging_topic_stats", "topic")):
+        rows = _rows(conn, f"SELECT university_id, {label}, year, papers FROM {table} "
+                           f"WHERE university_id = ANY(%s::uuid[]) AND year >= %s AND year <= %s", (ids, start, end))
+        fetched += len(rows)
+        charts.append(rows)
+    conferences, emerging = defaultdict(Counter), defaultdict(Counter)
+    for uid, conference, _, papers in charts[0]:
+        conferences[conference][unis[uid]] += papers
+    topic_map = defaultdict(lambda: defaultdict(Counter))
+    for uid, topic, year, papers in charts[1]:
+        topic_map[unis[uid]][str(year)][topic] += papers
+    for uid, topic, _, papers in charts[2]:
+        emerging[topic][unis[uid]] += papers
+    return conferences, _heatmap_rows(topic_map, names, start, end), emerging, fetched
+
+
+def bench_comparison(data_dir, tmp, repeat=3):
+    """University comparison page (SUPABASE_* env): legacy per-view grouping vs the aggregate tables.
+
+    Loads data_dir (with the aggregate tables computed into a copy when it predates them) into emptied
+    tables, then times both paths for the busiest university alone, the top three together and all of
+    them, over the full year range and the last five years; the chart data must be identical."""
+    import migrate_to_supabase as migrate
+    src = os.path.join(tmp, "out")
+    os.makedirs(src)
+    for name in os.listdir(data_dir):
+        if not name.startswith("."):
+            os.symlink(os.path.join(data_dir, name), os.path.join(src, name))
+    fmt = next((f for f in build.OUTPUT_FORMATS if os.path.exists(os.path.join(src, f"candidates.{f}"))), "csv")
+    if not os.path.exists(os.path.join(src, f"university_conference_stats.{fmt}")):
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                counts, t = timed(build.write_comparison_tables, src, fmt)
+            finally:
+                sys.stdout = stdout
+        print(f"[comparison] build post-pass: {t:.2f}s  " + ", ".join(f"{k} {v:,}" for k, v in counts.items()))
+
+    conn = migrate.connect()
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {', '.join(migrate.TABLES)}")
+    conn.commit()
+    subprocess.run([sys.executable, os.path.join(HERE, "migrate_to_supabase.py"), "--data-dir", src,
+                    "--no-manifest"], check=True, capture_output=True)
+    names = [r[0] for r in _rows(conn, "SELECT u.name FROM universities u JOIN candidates c ON c.university_id = u.id "
+                                       "GROUP BY u.name ORDER BY count(*) DESC", ())]
+    lo, hi = _rows(conn, "SELECT min(year), max(year) FROM publications", ())[0]
+    for label, subset in (("busiest university", names[:1]), ("top 3", names[:3]), ("all", names)):
+        for start, end in ((lo, hi), (hi - 4, hi)):
+            result = {}
+            for impl, fn in (("legacy", legacy_university_comparison), ("aggregate", university_comparison)):
+                times = []
+                for _ in range(repeat):
+                    out, t = timed(fn, conn, subset, start, end)
+                    times.append(t)
+                conn.commit()
+                result[impl] = out
+                print(f"[comparison] {label:<18} {start}-{end}  {impl:<9}: {sorted(times)[repeat // 2] * 1000:9.1f} ms  "
+                      f"{out[3]:>9,} rows fetched")
+            same = result["legacy"][:3] == result["aggregate"][:3]
+            print(f"[comparison] identical charts={same}")
+            require(same, f"{label} {start}-{end}: aggregate charts differ from the legacy queries")
+    conn.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("stage", choices=["pass1", "pass2", "workers", "memory", "alias", "csrank", "topics", "metrics", "finalize", "affiliation", "resume", "checkpoint", "incremental", "layout", "format", "compress", "sample", "spill", "pgload", "pgparallel", "pgdiff", "pgdelete", "comparison", "csfetch", "_rss", "_sample", "_pgload"])
+    ap.add_argument("--meta", help="existing metadata CSV (default: synthetic)")
+    ap.add_argument("--rows", type=int, default=200000)
+    ap.add_argument("--chunksize", type=int, default=100000)
+    ap.add_argument("--student-first-year-min", type=int, default=2017)
+    ap.add_argument("--student-first-year-max", type=int, default=2022)
+    ap.add_argument("--workers", default="1,2,4", help="comma-separated worker counts (workers/resume/compress/pgparallel stages)")
+    ap.add_argument("--alias", default=os.path.join(HERE, "expanded_alias_map.json"))
+    ap.add_argument("--csrank", default=os.path.join(HERE, "csranks_author_affiliations.csv"))
+    ap.add_argument("--lookups", type=int, default=20000)
+    ap.add_argument("--candidates", type=int, default=1000000)
+    ap.add_argument("--pub-layout", default="denormalized", choices=sorted(build.PUB_LAYOUTS),
+                    help="publication layout for the resume/incremental/spill stages")
+    ap.add_argument("--format", default="csv", choices=["csv", "parquet"], dest="fmt",
+                    help="output format for the resume/incremental/spill stages")
+    ap.add_argument("--delta", type=float, default=0.02,
+                    help="fraction of rows arriving later (incremental stage) / changed candidates (pgdiff stage)")
+    ap.add_argument("--memory-limits", default="512M,384M",
+                    help="comma-separated --memory-limit values (spill stage; checkpoint stage uses the last)")
+    ap.add_argument("--hops", default="1,2,3", help="comma-separated --affiliation-hops values (affiliation stage)")
+    ap.add_argument("--latency", type=float, default=0.05, help="stand-in server delay per request (csfetch stage)")
+    ap.add_argument("--target", type=int, default=10000, help="sample size (sample stage)")
+    ap.add_argument("--data-dir",
+                    help="existing build output to load (pgload: default builds one; required for pgparallel/pgdiff/pgdelete/comparison)")
+    ap.add_argument("--impl", choices=["dict", "store", "legacy", "reservoir", "copy", "parents"],
+                    help=argparse.SUPPRESS)
+    ap.add_argument("--out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.stage == "_rss":
+        _peak_rss(args.impl, args.meta, args.chunksize, args.student_first_year_min,
+                  args.student_first_year_max, args.out)
+        sys.exit(0)
+    if args.stage == "_sample":
+        _sample_rss(args.impl, args.meta, args.chunksize, args.target, args.out)
+        sys.exit(0)
+    if args.stage == "_pgload":
+        _pgload(args.impl, args.data_dir)
+        sys.exit(0)
+    if args.stage == "pgparallel":
+        bench_pgparallel(args.data_dir, [int(n) for n in args.workers.split(",")])
+        sys.exit(0)
+    if args.stage == "pgdiff":
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_pgdiff(args.data_dir, args.delta, tmp)
+        sys.exit(0)
+    if args.stage == "pgdelete":
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_pgdelete(args.data_dir, tmp)
+        sys.exit(0)
+    if args.stage == "comparison":
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_comparison(args.data_dir, tmp)
+        sys.exit(0)
+    if args.stage == "pgload" and args.data_dir:
+        bench_pgload(args.data_dir)
+        sys.exit(0)
+    if args.stage == "alias":
+        bench_alias(args.alias, args.csrank, args.lookups)
+        sys.exit(0)
+    if args.stage == "metrics":
+        bench_metrics(args.candidates)
+        sys.exit(0)
+    if args.stage == "finalize":
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_finalize(args.candidates, args.csrank, args.alias, tmp)
+        sys.exit(0)
+    if args.stage == "affiliation":
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_affiliation(args.candidates, args.csrank, args.alias, tmp, [int(k) for k in args.hops.split(",")])
+        sys.exit(0)
+    if args.stage == "csfetch":
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_csfetch(args.csrank, tmp, args.latency)
+        sys.exit(0)
+    if args.stage == "csrank":
+        with tempfile.TemporaryDirectory() as tmp:
+            bench_csrank(args.csrank, tmp)
+        sys.exit(0)
+
+    build_opts = ["--pub-layout", args.pub_layout, "--format", args.fmt]
+    with tempfile.TemporaryDirectory() as tmp:
+        meta = args.meta or make_meta(os.path.join(tmp, "meta.csv"), args.rows,
+                                      latex=0.02 if args.stage == "format" else 0.0)
+        rows = args.rows if not args.meta else sum(1 for _ in build.pd.read_csv(meta, usecols=[0]).itertuples())
+        if args.stage == "pass1":
+            bench_pass1(meta, rows, args.chunksize, args.student_first_year_min, args.student_first_year_max)
+        elif args.stage == "pass2":
+            bench_pass2(meta, rows, args.chunksize, args.student_first_year_min, args.student_first_year_max, tmp)
+        elif args.stage == "workers":
+            bench_workers(meta, rows, args.chunksize, args.student_first_year_min, args.student_first_year_max,
+                          tmp, [int(n) for n in args.workers.split(",")])
+        elif args.stage == "memory":
+            bench_memory(meta, rows, args.chunksize, args.student_first_year_min, args.student_first_year_max, tmp)
+        elif args.stage == "topics":
+            bench_topics(meta, rows)
+        elif args.stage == "resume":
+            bench_resume(meta, args.chunksize, args.student_first_year_min, args.student_first_year_max,
+                         tmp, [int(n) for n in args.workers.split(",")], args.csrank, args.alias, build_opts)
+        elif args.stage == "checkpoint":
+            bench_checkpoint(meta, args.chunksize, args.student_first_year_min, args.student_first_year_max, tmp,
+                             build.parse_size(args.memory_limits.split(",")[-1]))
+        elif args.stage == "incremental":
+            bench_incremental(meta, args.chunksize, args.student_first_year_min, args.student_first_year_max,
+                              tmp, args.delta, args.csrank, args.alias, build_opts)
+        elif args.stage == "sample":
+            bench_sample(meta, rows, args.chunksize, args.target, tmp)
+        elif args.stage == "spill":
+            bench_spill(meta, args.chunksize, args.student_first_year_min, args.student_first_year_max, tmp,
+                        args.memory_limits.split(","), args.csrank, args.alias, build_opts)
+        elif args.stage == "compress":
+            bench_compress(meta, args.chunksize, args.student_first_year_min, args.student_first_year_max,
+                           tmp, [int(n) for n in args.workers.split(",")], args.csrank, args.alias)
+        elif args.stage == "format":
+            bench_format(meta, args.chunksize, args.student_first_year_min, args.student_first_year_max,
+                         tmp, args.csrank, args.alias)
+        elif args.stage == "pgload":
+            out = os.path.join(tmp, "out")
+            subprocess.run([sys.executable, os.path.join(HERE, "build_clean_dataset_chunked_v5_full.py"),
+                            "--meta", meta, "--csrank", args.csrank, "--alias", args.alias, "--out-dir", out,
+                            "--chunksize", str(args.chunksize),
+                            "--student-first-year-min", str(args.student_first_year_min),
+                            "--student-first-year-max", str(args.student_first_year_max),
+                            "--no-resolve-cache", *build_opts], check=True, capture_output=True)
+            bench_pgload(out)
+        elif args.stage == "layout":
+            bench_layout(meta, args.chunksize, args.student_first_year_min, args.student_first_year_max, tmp)
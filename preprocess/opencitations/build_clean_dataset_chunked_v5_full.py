@@ -8,21 +8,30 @@ Final production-stable version (Supabase-ready)
 ✅ 6-table schema output:
    - universities.csv
    - candidates.csv
-   - publications.csv
+   - publications.csv (or papers.csv + candidate_publications.csv with --pub-layout normalized)
    - academic_metrics.csv
    - research_topics.csv
    - candidate_topics.csv
-✅ Fully CSV-quoted (quoting=csv.QUOTE_ALL)
-✅ Coauthor-based university inference
+   (+ university_conference_stats / university_topic_stats / university_emerging_topic_stats:
+    per-university, per-year chart aggregates for src/api/universityComparison.ts)
+✅ Fully CSV-quoted (quoting=csv.QUOTE_ALL), or typed Parquet with --format parquet
+✅ .gz/.zst input read directly; --compress gz|zst writes compressed CSVs
+✅ --memory-limit: per-candidate state spilled to sorted runs on disk, k-way merged in finalize
+✅ Coauthor-based university inference (sparse coauthor graph; --affiliation-hops N propagates labels)
 ✅ Graduation year = first_pub_year + 5
 ✅ Region map support (via --region)
 ✅ Includes 'Unknown University' to avoid FK errors
 """
 
-import os, re, json, argparse, csv
+import os, io, re, json, argparse, csv, shutil, time, sqlite3, hashlib, pickle, gzip, zlib, resource
+from contextlib import closing
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from uuid import uuid5, NAMESPACE_URL
 from datetime import datetime
-from collections import Counter, defaultdict
+from collections import Counter, defaultdict, deque
+import numpy as np
 import pandas as pd
 
 # =============================================================
@@ -77,6 +86,47 @@ def calc_scores(total_citations, h_index, publication_count):
     ))
     return ranking_score
 
+def bulk_metrics(group, citations, n_groups=None):
+    """compute_h_index() + calc_scores() for every group at once.
+
+    group/citations are flat, equal-length arrays with one entry per (candidate, paper);
+    group holds 0-based candidate indices. Returns a DataFrame indexed 0..n_groups-1 with
+    publication_count, total_citations, h_index and ranking_score, matching the scalar
+    functions exactly (same float operation order, round-half-even).
+    """
+    group = np.asarray(group, dtype=np.int64)
+    cit = np.asarray(citations, dtype=np.int64)
+    n = n_groups if n_groups is not None else (int(group.max()) + 1 if group.size else 0)
+
+    pubs = np.bincount(group, minlength=n).astype(np.int64)
+    total = np.rint(np.bincount(group, weights=cit, minlength=n)).astype(np.int64)
+
+    # Sort by (group asc, clipped citations desc) through one packed int64 key, then the
+    # rank of each paper inside its group; h = number of papers with citations >= rank.
+    clipped = np.minimum(np.maximum(cit, 0), 0xFFFFFFFF)
+    key = np.sort((group << 32) | (0xFFFFFFFF - clipped))
+    g = key >> 32
+    c = 0xFFFFFFFF - (key & 0xFFFFFFFF)
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if key.size else np.zeros(0, np.int64)
+    rank = np.arange(key.size) - np.repeat(starts, np.diff(np.r_[starts, key.size])) + 1
+    h = np.bincount(g[c >= rank], minlength=n).astype(np.int64)
+
+    total_f, h_f, pubs_f = total.astype(np.float64), h.astype(np.float64), pubs.astype(np.float64)
+    citation_score = np.minimum(total_f / 10.0, 100.0)
+    h_index_score = np.minimum(h_f * 12.0, 100.0)
+    publication_score = np.minimum(pubs_f * 15.0, 100.0)
+    avg_cit = np.divide(total_f, pubs_f, out=np.zeros(n), where=pubs > 0)
+    impact_score = np.minimum(avg_cit / 3.0, 100.0)
+    ranking_score = np.rint(
+        citation_score * 0.35 + h_index_score * 0.25 + publication_score * 0.25 + impact_score * 0.15
+    ).astype(np.int64)
+    return pd.DataFrame({
+        "publication_count": pubs,
+        "total_citations": total,
+        "h_index": h,
+        "ranking_score": ranking_score,
+    })
+
 # =============================================================
 # Topic detection
 # =============================================================
@@ -89,14 +139,111 @@ TOPIC_KEYWORDS = {
     "data mining": ["clustering", "graph", "network"],
 }
 
+def _trie_regex(words):
+    """Regex alternation for words, factored into a character trie (cost ~ depth, not count)."""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node):
+        alts = [(r"\s+" if ch == " " else re.escape(ch)) + emit(child)
+                for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+class TopicClassifier:
+    """Keyword taxonomy compiled into one word-boundary regex.
+
+    Keywords match whole words (plus a plural 's'), so 'ml' no longer fires on 'html'.
+    The regex is a lookahead at every word start, so overlapping keywords are all seen;
+    each hit maps to the lowest topic index it implies and a text gets the first topic
+    in taxonomy order that any keyword hit, as detect_topic() always did.
+    """
+
+    # Up to this many topics, label_codes() runs one cheap per-topic regex instead of the
+    # lookahead findall (which costs about as much as 20 of them)
+    MASK_TOPICS = 16
+
+    def __init__(self, taxonomy, default="other"):
+        self.names = list(taxonomy) + [default]
+        self.default_code = len(self.names) - 1
+        self.codes = {t: i for i, t in enumerate(self.names)}
+        self.ids = [stable_uuid("topic", t) for t in self.names]
+        rank = {}
+        for code, kws in enumerate(taxonomy.values()):
+            for kw in kws:
+                kw = " ".join(str(kw).lower().split())
+                if kw:
+                    rank.setdefault(kw, code)
+                    rank.setdefault(kw + "s", code)
+        # The regex reports the longest keyword at each start, so fold in the ranks of
+        # keywords that end at a word boundary inside it ("language" in "language model").
+        best = {}
+        for phrase, code in rank.items():
+            prefixes = (phrase[:m.start()] for m in re.finditer(r"\b", phrase) if 0 < m.start() < len(phrase))
+            best[phrase] = min([code] + [rank[p] for p in prefixes if p in rank])
+        self._best = best
+        self._regex = re.compile(r"\b(?=(" + _trie_regex(best) + r")\b)")
+        by_code = {}
+        for phrase, code in rank.items():
+            by_code.setdefault(code, []).append(phrase)
+        self._topic_regex = [(code, re.compile(r"\b(?:" + _trie_regex(by_code[code]) + r")\b"))
+                             for code in sorted(by_code)]
+
+    def _code(self, hits):
+        best = self._best
+        return min((best.get(h) if h in best else best[" ".join(h.split())] for h in hits),
+                   default=self.default_code)
+
+    def classify(self, text):
+        if not isinstance(text, str):
+            return self.names[self.default_code]
+        return self.names[self._code(self._regex.findall(text.lower()))]
+
+    def label_codes(self, texts: pd.Series) -> pd.Series:
+        """Topic code for every text in a Series.
+
+        A small taxonomy takes one str.contains pass per topic, in taxonomy order, over the
+        rows no earlier topic claimed; a large one takes one findall over the column, its hits
+        mapped to codes and reduced per row with explode/map/groupby.
+        """
+        lower = texts.fillna("").astype(str).str.lower().reset_index(drop=True)
+        codes = np.full(len(lower), self.default_code, dtype=np.int64)
+        if len(self._topic_regex) <= self.MASK_TOPICS:
+            todo = lower
+            for code, regex in self._topic_regex:
+                hit = todo.str.contains(regex).to_numpy()
+                codes[todo.index[hit]] = code
+                todo = todo[~hit]
+                if todo.empty:
+                    break
+        else:
+            hits = lower.str.findall(self._regex).explode().dropna()
+            hit_codes = hits.map(self._best)
+            odd = hit_codes.isna()
+            if odd.any():  # keyword matched across other whitespace than one space
+                hit_codes[odd] = hits[odd].str.split().str.join(" ").map(self._best)
+            row_codes = hit_codes.astype(np.int64).groupby(level=0).min()
+            codes[row_codes.index.to_numpy()] = row_codes.to_numpy()
+        return pd.Series(codes, index=texts.index, dtype="int64")
+
+def load_topic_taxonomy(path):
+    """JSON object {topic: [keywords, ...]}; key order is the topic priority order."""
+    with open(path, "r") as f:
+        taxonomy = json.load(f)
+    return {str(t).strip(): [str(k) for k in kws] for t, kws in taxonomy.items()}
+
+TOPICS = TopicClassifier(TOPIC_KEYWORDS)
+
 def detect_topic(text):
-    if not isinstance(text, str):
-        return "other"
-    s = text.lower()
-    for topic, kws in TOPIC_KEYWORDS.items():
-        if any(kw in s for kw in kws):
-            return topic
-    return "other"
+    return TOPICS.classify(text)
 
 # =============================================================
 # University matching
@@ -121,18 +268,390 @@ def load_csranks_map(csv_path):
     df["university_name"] = df["university_name"].astype(str).str.strip()
     return dict(zip(df["author_name"], df["university_name"]))
 
+class AliasMatcher:
+    """Substring index over the alias map, built once per run.
+
+    Answers the two questions fuzzy_match() used to answer by scanning every alias key:
+      - keys_in(name): which keys occur inside name (Aho-Corasick automaton)
+      - first_key_containing(name): lowest-index key that contains name (sorted suffix
+        table of all keys + sparse-table range minimum)
+    Key indices follow alias_map insertion order, so match() keeps the old precedence:
+    the first key (in file order) satisfying either test wins.
+    """
+
+    def __init__(self, alias_map):
+        self.keys = list(alias_map)
+        self.values = list(alias_map.values())
+        self._build_automaton()
+        self._build_suffixes()
+
+    def _build_automaton(self):
+        goto, out = [{}], [[]]
+        for i, k in enumerate(self.keys):
+            node = 0
+            for ch in k:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = goto[node][ch] = len(goto)
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].append(i)
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:
+            for ch, nxt in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if node else 0
+                out[nxt] = sorted(out[nxt] + out[fail[nxt]])
+                queue.append(nxt)
+        self._goto, self._fail, self._out = goto, fail, out
+
+    def _build_suffixes(self):
+        sfx = sorted((k[j:], i) for i, k in enumerate(self.keys) for j in range(len(k)))
+        self._sfx = [t for t, _ in sfx]
+        level = array("i", (i for _, i in sfx))
+        self._rmq = [level]
+        span = 1
+        while 2 * span <= len(self._sfx):
+            prev = level
+            level = array("i", (min(prev[j], prev[j + span]) for j in range(len(prev) - span)))
+            self._rmq.append(level)
+            span *= 2
+
+    def keys_in(self, name):
+        """Indices (ascending) of alias keys that are substrings of name."""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits, node = set(), 0
+        hits.update(out[0])
+        for ch in name:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hits.update(out[node])
+        return sorted(hits)
+
+    def first_key_containing(self, name):
+        """Lowest index of an alias key that contains name, or None."""
+        lo = bisect_left(self._sfx, name)
+        hi = bisect_left(self._sfx, name + "\U0010ffff", lo)
+        if lo >= hi:
+            return None
+        k = (hi - lo).bit_length() - 1
+        level = self._rmq[k]
+        return min(level[lo], level[hi - (1 << k)])
+
+    def match(self, name):
+        inside = self.keys_in(name)
+        best = inside[0] if inside else None
+        outer = self.first_key_containing(name)
+        if outer is not None and (best is None or outer < best):
+            best = outer
+        return self.values[best] if best is not None else ""
+
+RESOLVER_VERSION = 2  # bump when fuzzy_match() semantics change
+
+def sources_digest(*paths):
+    h = hashlib.sha256()
+    for p in paths:
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+def blocking_key(name):
+    """Last name + first initial, e.g. 'j. smith' and 'john smith' -> 'smith j'."""
+    toks = name.replace(".", " ").split()
+    if len(toks) < 2:
+        return ""
+    return f"{toks[-1]} {toks[0][0]}"
+
+class CsrIndex:
+    """CSRankings author -> university lookup, compiled once and cached as a pickle sidecar.
+
+    `direct` holds every normalized author name and `reverse` the same names with their
+    tokens reversed, so fuzzy_match's reversed-name probe is a plain dict hit. `blocks`
+    maps blocking_key() to a university when every author in that block agrees on one;
+    it is only consulted after all exact variants miss.
+    """
+
+    FORMAT = 1
+
+    def __init__(self, direct, reverse, blocks, digest=None):
+        self.direct, self.reverse, self.blocks, self.digest = direct, reverse, blocks, digest
+
+    @classmethod
+    def build(cls, csv_path, digest=None):
+        direct = load_csranks_map(csv_path)
+        reverse, block_unis = {}, defaultdict(set)
+        for name, uni in direct.items():
+            reverse.setdefault(" ".join(name.split()[::-1]), uni)
+            bk = blocking_key(name)
+            if bk:
+                block_unis[bk].add(uni)
+        blocks = {bk: next(iter(u)) for bk, u in block_unis.items() if len(u) == 1}
+        return cls(direct, reverse, blocks, digest)
+
+    @classmethod
+    def load(cls, csv_path, index_path=None):
+        """Load the sidecar at index_path (default <csv>.idx), rebuilding it if the CSV changed."""
+        index_path = index_path or csv_path + ".idx"
+        digest = sources_digest(csv_path) + f":{cls.FORMAT}"
+        try:
+            with open(index_path, "rb") as f:
+                idx = pickle.load(f)
+            if isinstance(idx, cls) and idx.digest == digest:
+                return idx
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+        idx = cls.build(csv_path, digest)
+        try:
+            with open(index_path + ".tmp", "wb") as f:
+                pickle.dump(idx, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError as e:
+            print(f"[WARN] could not write CSRankings index {index_path}: {e}")
+        return idx
+
+    def lookup(self, name):
+        """University for name, or None. Same precedence as fuzzy_match's exact variants."""
+        uni = self.direct.get(name)
+        if uni is None and "." in name:
+            uni = self.direct.get(name.replace(".", ""))
+        if uni is None:
+            uni = self.reverse.get(" ".join(name.split()))
+        if uni is None:
+            uni = self.blocks.get(blocking_key(name))
+        return uni
+
 def fuzzy_match(name, csr_map, alias_map):
     if not name:
         return ""
-    variants = [name, name.replace(".", ""), " ".join(name.split()[::-1])]
-    for v in variants:
-        if v in csr_map:
-            return csr_map[v]
+    if isinstance(csr_map, CsrIndex):
+        uni = csr_map.lookup(name)
+        if uni is not None:
+            return uni
+    else:
+        variants = [name, name.replace(".", ""), " ".join(name.split()[::-1])]
+        for v in variants:
+            if v in csr_map:
+                return csr_map[v]
+    if isinstance(alias_map, AliasMatcher):
+        return alias_map.match(name)
     for k, v in alias_map.items():
         if k in name or name in k:
             return v
     return ""
 
+class ResolutionCache:
+    """Normalized coauthor name -> university ("" when unresolved).
+
+    Shared by every candidate in a run and, when path is set, persisted in SQLite
+    between runs. The stored entries are dropped automatically when the digest of
+    the CSRankings CSV + alias map no longer matches the one they were built from.
+    """
+
+    def __init__(self, path=None, source_hash=None):
+        self.path, self.source_hash = path, source_hash
+        self.hits = self.misses = self.loaded = 0
+        self.invalidated = False
+        self._miss_seconds = 0.0
+        self._avg_resolve = None
+        self._map, self._new = {}, {}
+        if path:
+            self._load()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS resolved (name TEXT PRIMARY KEY, university TEXT NOT NULL)")
+        return conn
+
+    def _load(self):
+        with closing(self._connect()) as conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if meta.get("source_hash") != self.source_hash:
+                self.invalidated = "source_hash" in meta
+                return
+            self._map = dict(conn.execute("SELECT name, university FROM resolved"))
+            self.loaded = len(self._map)
+            if meta.get("avg_resolve_seconds"):
+                self._avg_resolve = float(meta["avg_resolve_seconds"])
+
+    def get(self, name, resolve):
+        uni = self._map.get(name)
+        if uni is not None:
+            self.hits += 1
+            return uni
+        t0 = time.perf_counter()
+        uni = self._map[name] = self._new[name] = resolve(name)
+        self._miss_seconds += time.perf_counter() - t0
+        self.misses += 1
+        return uni
+
+    def save(self):
+        if not self.path:
+            return
+        with closing(self._connect()) as conn, conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if meta.get("source_hash") != self.source_hash:
+                conn.execute("DELETE FROM resolved")
+                self._new = dict(self._map)
+            conn.executemany("INSERT OR REPLACE INTO resolved (name, university) VALUES (?, ?)",
+                             self._new.items())
+            rows = [("source_hash", self.source_hash)]
+            if self.misses:
+                rows.append(("avg_resolve_seconds", repr(self._miss_seconds / self.misses)))
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", rows)
+        self._new = {}
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        avg = self._miss_seconds / self.misses if self.misses else (self._avg_resolve or 0.0)
+        return {
+            "path": self.path,
+            "source_hash": self.source_hash,
+            "invalidated": self.invalidated,
+            "loaded_entries": self.loaded,
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "resolve_seconds": round(self._miss_seconds, 3),
+            "est_seconds_saved": round(self.hits * avg, 3),
+        }
+
+# =============================================================
+# Compressed input/output (.gz / .zst)
+# =============================================================
+COMPRESS_LEVELS = {"gz": 6, "zst": 3}
+COMPRESS_THREADS = os.cpu_count() or 1
+IO_BUFFER = 8 * 1024 * 1024
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise SystemExit("[ERROR] .zst files need zstandard (pip install zstandard)")
+    return zstandard
+
+def codec_of(path):
+    """'gz', 'zst' or None, from the file suffix."""
+    path = str(path)
+    return "gz" if path.endswith(".gz") else "zst" if path.endswith(".zst") else None
+
+def open_input(path, codec=None):
+    """Binary stream over path; .gz/.zst are decompressed as they are read."""
+    codec = codec or codec_of(path)
+    if codec == "gz":
+        return gzip.open(path, "rb")
+    if codec == "zst":
+        # pzstd and OutputFile write many frames per file
+        reader = _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True,
+                                                               closefd=True)
+        return io.BufferedReader(reader, IO_BUFFER)
+    return open(path, "rb")
+
+def _gzip_member(data, level):
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return z.compress(data) + z.flush()
+
+class _Compressor(io.RawIOBase):
+    """Compresses what is written to it into `raw`, off the calling thread.
+
+    zst uses zstd's own worker threads. gz compresses each block as an independent gzip
+    member on a thread pool (as pigz does) and writes the members in order. end_frame()
+    completes everything written so far, so raw is a valid file up to its current end.
+    """
+
+    def __init__(self, raw, codec, threads):
+        self._raw, self._codec = raw, codec
+        if codec == "zst":
+            self._zstd = _zstandard()
+            cctx = self._zstd.ZstdCompressor(level=COMPRESS_LEVELS["zst"], threads=threads)
+            self._z = cctx.stream_writer(raw, closefd=False, write_return_read=True)
+        else:
+            self._pool, self._pending, self._ahead = ThreadPoolExecutor(threads), deque(), 2 * threads
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if self._codec == "zst":
+            self._z.write(b)
+        else:
+            self._pending.append(self._pool.submit(_gzip_member, bytes(b), COMPRESS_LEVELS["gz"]))
+            while len(self._pending) > self._ahead:
+                self._raw.write(self._pending.popleft().result())
+        return len(b)
+
+    def end_frame(self):
+        if self._codec == "zst":
+            self._z.flush(self._zstd.FLUSH_FRAME)
+        else:
+            while self._pending:
+                self._raw.write(self._pending.popleft().result())
+        self._raw.flush()
+
+    def close(self):
+        if not self.closed:
+            self.end_frame()
+            if self._codec == "gz":
+                self._pool.shutdown()
+        super().close()
+
+class OutputFile:
+    """Text output file, compressed when the path (or `codec`) says .gz/.zst.
+
+    A compressed file is a run of gzip members / zstd frames, which both formats read back
+    as one stream. sync() completes the current member/frame and returns the byte offset
+    the file is valid up to; `offset` truncates back to such a point and appends, exactly
+    as for a plain file.
+    """
+
+    def __init__(self, path, offset=None, codec=None):
+        self.path, self.codec = path, codec or codec_of(path)
+        if offset is not None:
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+        if self.codec is None:
+            self._raw = self._f = open(path, "w" if offset is None else "a", newline="", buffering=IO_BUFFER)
+            self._z = None
+        else:
+            self._raw = open(path, "wb" if offset is None else "ab")
+            self._z = _Compressor(self._raw, self.codec, COMPRESS_THREADS)
+            self._f = io.TextIOWrapper(io.BufferedWriter(self._z, IO_BUFFER), newline="")
+        self.write = self._f.write
+
+    def _flush(self):
+        self._f.flush()
+        if self._z is not None:
+            self._z.end_frame()
+
+    def sync(self):
+        self._flush()
+        os.fsync(self._raw.fileno())
+        return self._raw.tell()
+
+    def append_file(self, src_path):
+        """Append the bytes of src_path, a file of the same codec."""
+        self._flush()
+        with open(src_path, "rb") as src:
+            shutil.copyfileobj(src, self._raw if self._z is not None else self._raw.buffer, IO_BUFFER)
+
+    def close(self):
+        self._f.close()
+        if self._z is not None:
+            self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 # =============================================================
 # Pass 1
 # =============================================================
@@ -148,165 +667,2255 @@ def pass1(meta_path, chunksize, yrmin, yrmax):
                     author_first[a] = min(y, author_first.get(a, y))
     return {a for a, y in author_first.items() if yrmin <= y <= yrmax}
 
+def normalize_name_series(s: pd.Series) -> pd.Series:
+    """Vectorized normalize_name() over a Series of raw author strings."""
+    s = s.str.strip()
+    s = s.str.replace(r"\[.*?\]", "", regex=True)
+    s = s.str.replace(r"\b\d{4}\b", "", regex=True)
+    s = s.str.replace(r"\s+", " ", regex=True).str.lower().str.strip()
+    two = s.str.count(",") == 1
+    if two.any():
+        parts = s[two].str.split(",", n=1, expand=True)
+        s = s.copy()
+        s[two] = parts[1].str.strip() + " " + parts[0].str.strip()
+    return s.str.strip()
+
+def chunk_first_years(chunk):
+    """Min publication year per normalized author in one chunk (lower-cased column names)."""
+    years = chunk["pub_date"].str.extract(r"((?:19|20)\d{2})", expand=False)
+    mask = years.notna() & chunk["author"].notna()
+    if not mask.any():
+        return pd.Series(dtype="int32")
+    df = pd.DataFrame({
+        "author": chunk["author"][mask].str.split(";"),
+        "year": years[mask].astype("int32"),
+    }).explode("author")
+    df["author"] = df["author"].str.strip()
+    df = df[df["author"].str.len() > 0]
+    # Reduce on the raw spelling first so each distinct name is normalized once per chunk
+    raw_min = df.groupby("author", sort=False)["year"].min()
+    return raw_min.groupby(normalize_name_series(raw_min.index.to_series()).to_numpy(), sort=False).min()
+
+def merge_first_years(author_first, mins):
+    """Fold chunk minima into author_first; return the authors whose first year moved."""
+    get, moved = author_first.get, []
+    for a, y in zip(mins.index, mins.to_numpy().tolist()):
+        prev = get(a)
+        if prev is None or y < prev:
+            author_first[a] = y
+            moved.append(a)
+    return moved
+
+def id_hashes(ids: pd.Series) -> np.ndarray:
+    """64-bit hashes of paper ids, the incremental-build watermark."""
+    return pd.util.hash_pandas_object(ids.fillna("").astype(str), index=False).to_numpy()
+
+def author_first_years(meta_path, chunksize, seen=None):
+    """First publication year of every author; appends id hashes to `seen` when given."""
+    wanted = {"author", "pub_date"} | ({"id"} if seen is not None else set())
+    author_first = {}
+    reader = pd.read_csv(meta_path, chunksize=chunksize, dtype=str,
+                         usecols=lambda c: c.lower().strip() in wanted)
+    for chunk in reader:
+        chunk.columns = [c.lower().strip() for c in chunk.columns]
+        if seen is not None and "id" in chunk.columns:
+            seen.append(id_hashes(chunk["id"]))
+        if "author" not in chunk.columns or "pub_date" not in chunk.columns:
+            continue
+        merge_first_years(author_first, chunk_first_years(chunk))
+    return author_first
+
+def pool_from_first_years(author_first, yrmin, yrmax):
+    return {a for a, y in author_first.items() if yrmin <= y <= yrmax}
+
+def pass1_vectorized(meta_path, chunksize, yrmin, yrmax):
+    """Same candidate pool as pass1(), reading only author/pub_date."""
+    return pool_from_first_years(author_first_years(meta_path, chunksize), yrmin, yrmax)
+
 # =============================================================
 # Pass 2
 # =============================================================
-def pass2(meta_path, chunksize, pool, out_dir):
-    pubs_path = os.path.join(out_dir, "publications.csv")
-    with open(pubs_path, "w", newline='') as f:
-        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-        writer.writerow(["id","candidate_id","title","venue","year","citations","doi","abstract","topic_id","created_at","updated_at"])
+PUB_COLUMNS = ["id","candidate_id","title","venue","year","citations","doi","abstract","topic_id","created_at","updated_at"]
+PAPER_COLUMNS = ["id","title","venue","year","citations","doi","abstract","topic_id","created_at","updated_at"]
+CAND_PUB_COLUMNS = ["candidate_id","paper_id","created_at"]
+PUB_TABLES = {"publications": PUB_COLUMNS, "papers": PAPER_COLUMNS, "candidate_publications": CAND_PUB_COLUMNS}
+PUB_LAYOUTS = {
+    "denormalized": ("publications",),
+    "normalized": ("papers", "candidate_publications"),
+    "both": ("publications", "papers", "candidate_publications"),
+}
+META_TEXT_COLUMNS = {"id", "title", "abstract", "author", "pub_date", "venue", "doi"}
 
-    per_cand = defaultdict(lambda: {"cit": [], "topics": [], "coauthors": set(), "first_year": None})
+def read_meta_header(meta_path):
+    with io.TextIOWrapper(open_input(meta_path), newline="") as f:
+        return next(csv.reader(f))
 
-    for chunk in pd.read_csv(meta_path, chunksize=chunksize, low_memory=False):
-        chunk.columns = [c.lower().strip() for c in chunk.columns]
-        for _, r in chunk.iterrows():
-            normed, _ = parse_authors(r.get("author", ""))
-            inter = [a for a in normed if a in pool]
-            if not inter:
+def meta_dtypes(columns):
+    # Free-text columns stay strings so type inference can't differ between chunks/shards
+    return {c: str for c in columns if c.lower().strip() in META_TEXT_COLUMNS}
+
+# --format parquet: typed columns, dictionary-encoded low-cardinality strings, zstd pages
+PARQUET_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+def _pyarrow():
+    try:
+        import pyarrow, pyarrow.parquet
+    except ImportError:
+        raise SystemExit("[ERROR] --format parquet needs pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+def arrow_schema(table):
+    pa, _ = _pyarrow()
+    s, ts, cat = pa.string(), pa.timestamp("us", tz="UTC"), pa.dictionary(pa.int32(), pa.string())
+    fields = {
+        "publications": [("id", s), ("candidate_id", s), ("title", s), ("venue", cat), ("year", pa.int16()),
+                         ("citations", pa.int32()), ("doi", s), ("abstract", s), ("topic_id", cat),
+                         ("created_at", ts), ("updated_at", ts)],
+        "papers": [("id", s), ("title", s), ("venue", cat), ("year", pa.int16()), ("citations", pa.int32()),
+                   ("doi", s), ("abstract", s), ("topic_id", cat), ("created_at", ts), ("updated_at", ts)],
+        "candidate_publications": [("candidate_id", s), ("paper_id", s), ("created_at", ts)],
+        "candidates": [("id", s), ("name", s), ("university_id", cat), ("graduation_year", pa.int16()),
+                       ("total_citations", pa.int64()), ("h_index", pa.int32()), ("ranking_score", pa.int16()),
+                       ("research_interests", s), ("profile_image_url", s), ("linkedin_url", s),
+                       ("google_scholar_url", s), ("created_at", ts), ("updated_at", ts)],
+        "universities": [("id", s), ("name", s), ("country", cat), ("ranking", pa.int32()), ("logo_url", s),
+                         ("website", s), ("created_at", ts), ("updated_at", ts)],
+        "academic_metrics": [("id", s), ("university_id", s), ("year", pa.int16()),
+                             ("publications_count", pa.int32()), ("total_citations", pa.int64()),
+                             ("h_index_avg", pa.float64()), ("conference_papers", pa.int32()),
+                             ("journal_papers", pa.int32()), ("created_at", ts), ("updated_at", ts)],
+        "research_topics": [("id", s), ("name", s), ("description", s), ("created_at", ts), ("updated_at", ts)],
+        "candidate_topics": [("candidate_id", s), ("topic_id", cat), ("created_at", ts)],
+        "removed_candidates": [("id", s)],
+        "university_conference_stats": [("university_id", cat), ("conference", cat), ("year", pa.int16()),
+                                        ("papers", pa.int32())],
+        "university_topic_stats": [("university_id", cat), ("topic", cat), ("year", pa.int16()),
+                                   ("papers", pa.int32())],
+        "university_emerging_topic_stats": [("university_id", cat), ("topic", cat), ("year", pa.int16()),
+                                            ("papers", pa.int32())],
+    }[table]
+    return pa.schema(fields)
+
+def _arrow_array(values, typ):
+    """CSV-shaped python values ("" for missing, ISO strings for timestamps) -> typed Arrow array."""
+    pa, _ = _pyarrow()
+    if pa.types.is_timestamp(typ):
+        parsed = {}
+        for v in values:
+            if v not in parsed:
+                parsed[v] = pd.Timestamp(v, tz="UTC").to_pydatetime() if v else None
+        return pa.array([parsed[v] for v in values], typ)
+    if pa.types.is_integer(typ) or pa.types.is_floating(typ):
+        return pa.array([None if v is None or v == "" or v != v else v for v in values], typ)
+    values = [None if v is None or v != v else str(v) for v in values]
+    if pa.types.is_dictionary(typ):
+        return pa.array(values, pa.string()).dictionary_encode()
+    return pa.array(values, typ)
+
+def arrow_table(columns, schema):
+    """Build a Table from {name: list} in schema order."""
+    pa, _ = _pyarrow()
+    return pa.table([_arrow_array(list(columns[f.name]), f.type) for f in schema], schema=schema)
+
+class _CsvSink:
+    def __init__(self, path, columns, offset=None, header=True, codec=None):
+        self.path = path
+        self._f = OutputFile(path, offset, codec)
+        self._w = csv.writer(self._f, quoting=csv.QUOTE_ALL)
+        if header and offset is None:
+            self._w.writerow(columns)
+
+    def write(self, rows):
+        self._w.writerows(rows)
+
+    def sync(self):
+        return self._f.sync()
+
+    def close(self):
+        self._f.close()
+
+class _ParquetSink:
+    """A Parquet dataset directory, hive-partitioned by year when the table has one.
+
+    Files are named <prefix>-<seq>.parquet, so a dataset scan returns them in write order
+    within each partition. sync() closes the open files (a Parquet footer is only written
+    on close) and returns the finished file list that a resume keeps; any other file with
+    this prefix is deleted on resume.
+    """
+
+    def __init__(self, root, table, prefix="part", done=None):
+        _, self._pq = _pyarrow()
+        self.path, self.prefix = root, prefix
+        schema = arrow_schema(table)
+        self._columns = PUB_TABLES[table]
+        self._year = self._columns.index("year") if "year" in self._columns else None
+        self._schema = schema.remove(schema.get_field_index("year")) if self._year is not None else schema
+        if done is None and prefix == "part":
+            shutil.rmtree(root, ignore_errors=True)
+        self.done, self.seq = (list(done["files"]), done["seq"]) if done else ([], 0)
+        keep = set(self.done)
+        for dirpath, _, files in os.walk(root):
+            for fn in files:
+                rel = os.path.relpath(os.path.join(dirpath, fn), root)
+                if fn.startswith(prefix + "-") and rel not in keep:
+                    os.remove(os.path.join(dirpath, fn))
+        self._writers = {}
+
+    def _writer(self, year):
+        w = self._writers.get(year)
+        if w is None:
+            part_dir = self.path
+            if self._year is not None:
+                part_dir = os.path.join(self.path, f"year={PARQUET_NULL_PARTITION if year is None else year}")
+            os.makedirs(part_dir, exist_ok=True)
+            path = os.path.join(part_dir, f"{self.prefix}-{self.seq:05d}.parquet")
+            w = self._writers[year] = (self._pq.ParquetWriter(path, self._schema, compression="zstd"), path)
+        return w[0]
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self._year is None:
+            groups = {None: rows}
+        else:
+            groups = defaultdict(list)
+            for r in rows:
+                groups[r[self._year] or None].append(r)
+        for year, grp in groups.items():
+            cols = dict(zip(self._columns, zip(*grp)))
+            self._writer(year).write_table(arrow_table(cols, self._schema))
+
+    def sync(self):
+        self.close()
+        self.seq += 1
+        return {"files": list(self.done), "seq": self.seq}
+
+    def close(self):
+        for w, path in self._writers.values():
+            w.close()
+            self.done.append(os.path.relpath(path, self.path))
+        self._writers = {}
+
+OUTPUT_FORMATS = ("csv", "csv.gz", "csv.zst", "parquet")
+
+def publication_path(out_dir, table, fmt="csv"):
+    return os.path.join(out_dir, f"{table}.{fmt}")
+
+class PublicationWriter:
+    """Writes pass2 rows ([paper_id] + PUB_COLUMNS) in the chosen --pub-layout and --format.
+
+    "denormalized" is the original publications table, one row per (paper, candidate) with
+    the title/abstract repeated. "normalized" writes each paper once to papers (keyed by the
+    OpenAlex id, first occurrence wins) and one candidate_publications link per (candidate,
+    paper). `part` names a shard/delta part (CSV: <table>.<fmt>.part-<part>, no header;
+    Parquet: extra files in the dataset). `offsets` come from a previous sync() and resume
+    the files at that point. While `new_ids` is a list, first-seen paper ids are also
+    appended to it (checkpoint deltas).
+    """
+
+    def __init__(self, out_dir, layout="denormalized", part=None, offsets=None, seen=None, fmt="csv"):
+        self.seen = set() if seen is None else seen
+        self.new_ids = None
+        self._sinks = {}
+        for table in PUB_LAYOUTS[layout]:
+            offset = offsets[table] if offsets is not None else None
+            if fmt == "parquet":
+                sink = _ParquetSink(publication_path(out_dir, table, fmt), table,
+                                    "part" if part is None else f"part{part}", offset)
+            else:
+                path = publication_path(out_dir, table, fmt) + ("" if part is None else f".part-{part}")
+                sink = _CsvSink(path, PUB_TABLES[table], offset, header=part is None, codec=codec_of(fmt))
+            self._sinks[table] = sink
+        self.paths = {t: sink.path for t, sink in self._sinks.items()}
+
+    def write(self, rows):
+        sinks = self._sinks
+        if "publications" in sinks:
+            sinks["publications"].write([r[1:] for r in rows])
+        if "papers" in sinks:
+            seen, papers, links = self.seen, [], []
+            current, first, linked = None, False, set()
+            for r in rows:
+                if r[0] != current:
+                    current, linked = r[0], set()
+                    first = current not in seen
+                    if first:
+                        seen.add(current)
+                        papers.append([current] + r[3:])
+                # Links come only from a paper's first row group, so (candidate, paper) is unique
+                if first and r[2] not in linked:
+                    linked.add(r[2])
+                    links.append([r[2], current, r[10]])
+            sinks["papers"].write(papers)
+            sinks["candidate_publications"].write(links)
+            if self.new_ids is not None:
+                self.new_ids.extend(p[0] for p in papers)
+
+    def sync(self):
+        """Make everything written so far durable; returns the offsets a resume starts from."""
+        return {t: sink.sync() for t, sink in self._sinks.items()}
+
+    def close(self):
+        for sink in self._sinks.values():
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def filter_parquet(root, col, drop, prefix=""):
+    """Rewrite the dataset files under root whose name starts with prefix, minus rows with col in drop."""
+    pa, pq = _pyarrow()
+    import pyarrow.compute as pc
+    value_set = pa.array(sorted(drop), pa.string())
+    for dirpath, _, files in os.walk(root):
+        for fn in files:
+            if fn.startswith(prefix) and fn.endswith(".parquet"):
+                path = os.path.join(dirpath, fn)
+                t = pq.read_table(path, partitioning=None)
+                pq.write_table(t.filter(pc.invert(pc.is_in(t[col], value_set=value_set))), path,
+                               compression="zstd")
+
+def clear_publications(out_dir, layout, fmt):
+    for table in PUB_LAYOUTS[layout]:
+        path = publication_path(out_dir, table, fmt)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+def concat_parts(out_dir, layout, parts, paper_ids, fmt="csv"):
+    """Combine shard outputs in shard order.
+
+    CSV part-files (plain or compressed) are copied byte-for-byte and removed; Parquet parts
+    already live in the dataset. Only a part with a paper id that also occurs in an earlier shard (a duplicated
+    metadata row) is re-read to drop the repeats.
+    """
+    seen = set()
+    repeats = []
+    for ids in paper_ids:
+        repeats.append(ids & seen if ids else set())
+        seen |= ids or set()
+    if fmt == "parquet":
+        for part, rep in zip(parts, repeats):
+            if rep:
+                for table, col in (("papers", "id"), ("candidate_publications", "paper_id")):
+                    filter_parquet(publication_path(out_dir, table, fmt), col, rep, f"part{part}-")
+        return
+    with PublicationWriter(out_dir, layout, fmt=fmt) as out:
+        for part, rep in zip(parts, repeats):
+            for table, path in out.paths.items():
+                src_path = f"{path}.part-{part}"
+                if rep and table in ("papers", "candidate_publications"):
+                    col = 0 if table == "papers" else 1
+                    with io.TextIOWrapper(open_input(src_path, codec_of(fmt)), newline="") as src:
+                        out._sinks[table].write([r for r in csv.reader(src) if r[col] not in rep])
+                else:
+                    # Compressed parts are whole gzip members / zstd frames, so bytes concatenate too
+                    out._sinks[table]._f.append_file(src_path)
+                os.remove(src_path)
+
+class CandidateStore:
+    """Per-candidate pass2 aggregates over interned author ids.
+
+    Every normalized author name seen on a candidate paper is interned once to an int.
+    Each candidate slot keeps its citations (array 'i'), topic codes (array 'H', index
+    into topic_names) and coauthor ids (array 'i', deduplicated as it grows) instead of
+    lists of ints/strings and a set of full names. Slots are in first-seen order.
+
+    After journal(), add() calls are also logged so checkpoint_delta() can hand out just
+    what changed since the previous checkpoint; apply_delta() replays it on resume.
+    """
+
+    _log = None
+
+    def __init__(self, topic_names=None):
+        self.topic_names = topic_names or TOPICS.names
+        self.author_ids = {}
+        self.author_names = []
+        self.slot_of = {}
+        self.slot_author = array("i")
+        self.first_year = array("H")
+        self.cit, self.topics, self.coauthors = [], [], []
+        self._co_mark = array("i")
+
+    def __len__(self):
+        return len(self.slot_author)
+
+    def intern(self, name):
+        aid = self.author_ids.get(name)
+        if aid is None:
+            aid = self.author_ids[name] = len(self.author_names)
+            self.author_names.append(name)
+        return aid
+
+    def _slot(self, aid):
+        slot = self.slot_of.get(aid)
+        if slot is None:
+            slot = self.slot_of[aid] = len(self.slot_author)
+            self.slot_author.append(aid)
+            self.first_year.append(0)
+            self.cit.append(array("i"))
+            self.topics.append(array("H"))
+            self.coauthors.append(array("i"))
+            self._co_mark.append(64)
+        return slot
+
+    def add(self, aid, citations, topic_code, coauthor_ids, year):
+        if self._log is not None:
+            self._log_add(aid, citations, topic_code, coauthor_ids, year)
+        slot = self._slot(aid)
+        self.cit[slot].append(citations)
+        self.topics[slot].append(topic_code)
+        co = self.coauthors[slot]
+        co.extend(coauthor_ids)
+        if len(co) > self._co_mark[slot]:
+            co = self.coauthors[slot] = array("i", sorted(set(co)))
+            self._co_mark[slot] = max(2 * len(co), 64)
+        if year and (not self.first_year[slot] or year < self.first_year[slot]):
+            self.first_year[slot] = year
+
+    def journal(self):
+        """Start logging add() calls; checkpoint_delta() returns and resets the log."""
+        self._log = {k: array(t) for k, t in (("aid", "i"), ("cit", "i"), ("topic", "H"), ("year", "H"),
+                                               ("paper", "i"), ("co_end", "q"), ("co", "i"))}
+        self._log_names, self._log_co = len(self.author_names), None
+
+    def _log_add(self, aid, citations, topic_code, coauthor_ids, year):
+        log = self._log
+        # Every pool author on a paper shares the paper's id list; log it once
+        if coauthor_ids is not self._log_co:
+            self._log_co = coauthor_ids
+            log["co"].extend(coauthor_ids)
+            log["co_end"].append(len(log["co"]))
+        log["aid"].append(aid)
+        log["cit"].append(citations)
+        log["topic"].append(topic_code)
+        log["year"].append(year or 0)
+        log["paper"].append(len(log["co_end"]) - 1)
+
+    def checkpoint_delta(self):
+        """Names interned and add() calls logged since journal() / the previous call."""
+        delta = dict(self._log, names=self.author_names[self._log_names:])
+        self.journal()
+        return delta
+
+    def apply_delta(self, delta):
+        """Replay a checkpoint_delta() onto the store it was taken from (as restored from a checkpoint)."""
+        for name in delta["names"]:
+            self.intern(name)
+        co, ends = delta["co"], delta["co_end"]
+        papers = [co[a:b] for a, b in zip([0] + ends[:-1].tolist(), ends)]
+        for aid, cit, topic, year, paper in zip(delta["aid"], delta["cit"], delta["topic"], delta["year"],
+                                                 delta["paper"]):
+            self.add(aid, cit, topic, papers[paper], year)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for k in ("_log", "_log_names", "_log_co"):
+            state.pop(k, None)
+        return state
+
+    def merge(self, other):
+        """Append another store's slots (e.g. a later shard), remapping its author ids."""
+        remap = array("i", (self.intern(n) for n in other.author_names))
+        for oslot, oaid in enumerate(other.slot_author):
+            slot = self._slot(remap[oaid])
+            self.cit[slot].extend(other.cit[oslot])
+            self.topics[slot].extend(other.topics[oslot])
+            co = self.coauthors[slot]
+            co.extend(remap[c] for c in other.coauthors[oslot])
+            self.coauthors[slot] = array("i", sorted(set(co)))
+            self._co_mark[slot] = max(2 * len(self.coauthors[slot]), 64)
+            fy = other.first_year[oslot]
+            if fy and (not self.first_year[slot] or fy < self.first_year[slot]):
+                self.first_year[slot] = fy
+
+    @staticmethod
+    def _flatten(arrays, dtype):
+        lens = np.fromiter((len(a) for a in arrays), dtype=np.int64, count=len(arrays))
+        flat = np.concatenate([np.frombuffer(a, dtype=dtype) for a in arrays]) if arrays else np.zeros(0, dtype)
+        return np.repeat(np.arange(len(lens)), lens), flat
+
+    def citation_arrays(self):
+        """Flat (slot, citations) arrays in slot order, for bulk_metrics()."""
+        return self._flatten(self.cit, np.intc)
+
+    def topic_arrays(self):
+        """Flat (slot, topic code) arrays in slot and insertion order, for top_topics()."""
+        return self._flatten(self.topics, np.uint16)
+
+    def candidate_ids(self):
+        names = self.author_names
+        return [stable_uuid("candidate", names[aid]) for aid in self.slot_author]
+
+    def items(self):
+        """Yield (candidate_id, aggregate dict) in the shape finalize() consumes."""
+        names, topic_names = self.author_names, self.topic_names
+        for slot, aid in enumerate(self.slot_author):
+            yield stable_uuid("candidate", names[aid]), {
+                "cit": self.cit[slot],
+                "topics": [topic_names[c] for c in self.topics[slot]],
+                "coauthors": {names[c] for c in self.coauthors[slot]},
+                "first_year": self.first_year[slot] or None,
+            }
+
+# =============================================================
+# Out-of-core pass2 aggregates (--memory-limit)
+# =============================================================
+def parse_size(text):
+    """'512M' / '4G' / '1.5g' / plain bytes -> int bytes."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*", str(text), re.I)
+    if not m:
+        raise ValueError(f"bad size: {text!r}")
+    return int(float(m.group(1)) * 1024 ** " kmgt".index(m.group(2).lower() or " "))
+
+def peak_rss_bytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def rss_bytes():
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+def release_memory():
+    """Hand freed heap pages back to the OS (glibc only), so rss_bytes() tracks live data."""
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+SPILL_OCC_DTYPE = np.dtype([("slot", "<i4"), ("cit", "<i4"), ("topic", "<u2")])
+SPILL_CO_DTYPE = np.dtype([("slot", "<i4"), ("end", "<i8")])
+
+class SpillStore:
+    """CandidateStore drop-in that keeps only a name -> slot map and first years in RAM.
+
+    add() buffers (slot, citations, topic, paper) records in arrays and each paper's
+    coauthor names once, newline-terminated, in a bytearray, so nothing buffered is a
+    Python object. The buffer is written to <spill_dir>/run-NNNNN.*, sorted by slot (stable,
+    so insertion order within a slot is kept), once the estimated cost of spilling it
+    passes half the headroom under memory_limit or would push the measured RSS, plus the
+    largest spike seen between two checks (pass2's own chunk working set), over it.
+    finalize() merges the runs slot range by slot range via batches(), each range sized to
+    the headroom left at that point.
+
+    The limit covers the whole process: a limit below the RSS pass2 starts from is refused,
+    pass2 reads chunks sized by chunk_rows() (--chunksize is only their upper bound), and
+    finalize() reports the run's peak RSS against it (RUN_SUMMARY.json "spill").
+    """
+
+    # Estimated bytes per record while buffered + spilled (names, links) or merged (slots)
+    NAME_BYTES, LINK_BYTES, OCC_BYTES, CO_BYTES, SLOT_BYTES = 180, 56, 24, 160, 2048
+    RSS_CHECK_EVERY = 1024
+    # pass2 opens with a probe chunk this small, then sizes chunks from the measured working set
+    PROBE_ROWS, MIN_CHUNK_ROWS = 2000, 500
+
+    def __init__(self, spill_dir, memory_limit, topic_names=None):
+        self.dir, self.memory_limit = spill_dir, memory_limit
+        self.topic_names = topic_names or TOPICS.names
+        self.slot_of, self.names = {}, []
+        self.first_year = array("H")
+        self.runs = []
+        spare = memory_limit - rss_bytes()
+        if spare <= 0:
+            raise SystemExit(f"[ERROR] --memory-limit {memory_limit / 2**20:,.0f} MiB is below the "
+                             f"{rss_bytes() / 2**20:,.0f} MiB this build already uses before pass2; raise it")
+        if spare < 64 << 20:
+            print(f"[WARN] --memory-limit {memory_limit / 2**20:,.0f} MiB leaves {spare / 2**20:,.0f} MiB "
+                  f"above the current RSS; spilling with a 16 MiB buffer")
+        self.budget = max(spare // 2, 16 << 20)
+        self._margin, self._last_rss, self._last_peak = 0, 0, peak_rss_bytes()
+        self._row_bytes, self.chunk_size = 0, self.PROBE_ROWS
+        os.makedirs(spill_dir, exist_ok=True)
+        self._reset()
+
+    def _reset(self):
+        self._slot_buf, self._cit_buf, self._topic_buf = array("i"), array("i"), array("H")
+        self._paper_buf, self._paper_end = array("i"), array("q")
+        self._names_blob = bytearray()
+        self._last_co, self._buffered, self._spill_cost = None, 0, 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        return name
+
+    def add(self, name, citations, topic_code, coauthor_names, year):
+        slot = self.slot_of.get(name)
+        if slot is None:
+            slot = self.slot_of[name] = len(self.names)
+            self.names.append(name)
+            self.first_year.append(0)
+        # Every pool author on a paper shares the paper's name list; store it once
+        if coauthor_names is not self._last_co:
+            self._last_co = coauthor_names
+            encoded = "".join(f"{c}\n" for c in coauthor_names).encode("utf-8")
+            self._names_blob += encoded
+            self._paper_end.append(len(self._names_blob))
+            self._buffered += len(encoded) + 8
+            self._spill_cost += self.NAME_BYTES * len(coauthor_names)
+        self._slot_buf.append(slot)
+        self._cit_buf.append(citations)
+        self._topic_buf.append(topic_code)
+        self._paper_buf.append(len(self._paper_end) - 1)
+        self._buffered += 14
+        self._spill_cost += self.LINK_BYTES * len(coauthor_names)
+        if year and (not self.first_year[slot] or year < self.first_year[slot]):
+            self.first_year[slot] = year
+        cost = self._buffered + self._spill_cost
+        if cost > self.budget or (len(self._slot_buf) % self.RSS_CHECK_EVERY == 0 and self._over_limit(cost)):
+            self.spill()
+
+    def _over_limit(self, cost):
+        """RSS check for growth outside the buffer (chunks, fragmentation): spill whenever the measured
+        RSS, plus the largest spike seen between two checks and the cost of spilling, would cross the limit."""
+        rss, peak = rss_bytes(), peak_rss_bytes()
+        if peak > self._last_peak:
+            self._margin = max(self._margin, peak - max(rss, self._last_rss))
+        self._last_rss, self._last_peak = rss, peak
+        return rss + self._margin + self._spill_cost > self.memory_limit
+
+    def chunk_rows(self, rows, rss_before, peak_before, chunksize):
+        """Rows pass2 should read next so its chunk working set fits under the limit.
+
+        The working set of the last chunk is at most (peak RSS after it - RSS before it), and
+        exactly that when the chunk set a new peak; per row, it is scaled to the headroom left
+        once the spill budget is reserved.
+        """
+        peak = peak_rss_bytes()
+        per_row = max(peak - rss_before, 1) / max(rows, 1)
+        if peak > peak_before or not self._row_bytes:
+            self._row_bytes = per_row
+        else:
+            self._row_bytes = min(self._row_bytes, per_row)
+        spare = self.memory_limit - rss_bytes() - self.budget
+        self.chunk_size = int(min(chunksize, max(0.9 * spare / self._row_bytes, self.MIN_CHUNK_ROWS)))
+        return self.chunk_size
+
+    def _path(self, run, kind):
+        return os.path.join(self.dir, f"{run}.{kind}")
+
+    def spill(self):
+        """Write the buffer as one sorted run (no-op when empty)."""
+        if not self._slot_buf:
+            return
+        run = f"run-{len(self.runs):05d}"
+        slots = np.frombuffer(self._slot_buf, np.int32)
+        occ = np.empty(len(slots), SPILL_OCC_DTYPE)
+        occ["slot"], occ["cit"] = slots, np.frombuffer(self._cit_buf, np.int32)
+        occ["topic"] = np.frombuffer(self._topic_buf, np.uint16)
+        occ = occ[np.argsort(slots, kind="stable")]
+
+        # One (slot, name) link per coauthor of each record's paper, deduplicated as slot << 32 | name code
+        blob = self._names_blob
+        names_end = np.searchsorted(np.flatnonzero(np.frombuffer(blob, np.uint8) == 10),
+                                    np.frombuffer(self._paper_end, np.int64))
+        names_start = np.r_[0, names_end[:-1]]
+        paper = np.frombuffer(self._paper_buf, np.int32)
+        count = (names_end - names_start)[paper]
+        name_idx = np.repeat(names_start[paper] - (np.cumsum(count) - count), count)
+        name_idx += np.arange(name_idx.size)
+        codes, uniq = pd.factorize(np.array(blob.decode("utf-8").split("\n")[:-1], dtype=object))
+        self._reset()
+        key = np.repeat(slots.astype(np.int64), count)
+        key <<= 32
+        key |= codes[name_idx]
+        del slots, paper, name_idx, codes
+        key = np.unique(key)
+
+        names = "".join(f"{n}\n" for n in uniq[key & 0xFFFFFFFF]).encode("utf-8")
+        del uniq
+        co = np.empty(len(key), SPILL_CO_DTYPE)
+        co["slot"] = key >> 32
+        co["end"] = np.flatnonzero(np.frombuffer(names, np.uint8) == 10) + 1
+
+        for kind, write in (("occ.npy", lambda f: np.save(f, occ)), ("co.npy", lambda f: np.save(f, co)),
+                            ("co.bin", lambda f: f.write(names))):
+            with open(self._path(run, kind), "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+        self.runs.append(run)
+        print(f"[SPILL] {run}: {len(occ):,} candidate papers, {len(co):,} coauthor links")
+        del occ, co, names
+        release_memory()
+        self._last_rss, self._last_peak = rss_bytes(), peak_rss_bytes()
+
+    def journal(self):
+        """Mark the current state; checkpoint_delta() returns what changed since."""
+        self._mark = (len(self.names), len(self.runs), array("H", self.first_year))
+
+    def checkpoint_delta(self):
+        """New names, changed first years and the runs spilled since journal() / the previous call.
+
+        The buffer is spilled first, so the delta only references durable run files.
+        """
+        self.spill()
+        n_names, n_runs, old = self._mark
+        fy = np.frombuffer(self.first_year, np.uint16)
+        slots = np.r_[np.flatnonzero(fy[:len(old)] != np.frombuffer(old, np.uint16)), np.arange(len(old), len(fy))]
+        delta = {"names": self.names[n_names:], "slots": slots, "first_year": fy[slots].copy(),
+                 "runs": self.runs[n_runs:]}
+        self.journal()
+        return delta
+
+    def apply_delta(self, delta):
+        for name in delta["names"]:
+            self.slot_of[name] = len(self.names)
+            self.names.append(name)
+            self.first_year.append(0)
+        for slot, year in zip(delta["slots"].tolist(), delta["first_year"].tolist()):
+            self.first_year[slot] = year
+        self.runs.extend(delta["runs"])
+
+    def __getstate__(self):
+        # Checkpoints only reference durable runs
+        self.spill()
+        state = self.__dict__.copy()
+        for k in ("_slot_buf", "_cit_buf", "_topic_buf", "_paper_buf", "_names_blob", "_paper_end", "_last_co",
+                  "_buffered", "_spill_cost", "_last_rss", "_last_peak"):
+            state.pop(k)
+        state.pop("_mark", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._last_rss, self._last_peak = 0, peak_rss_bytes()
+        self._reset()
+
+    def spill_bytes(self):
+        return sum(os.path.getsize(self._path(r, k)) for r in self.runs for k in ("occ.npy", "co.npy", "co.bin"))
+
+    def batches(self):
+        """Yield _SpillBatch views covering every slot in order.
+
+        Each slot range is sized to half the headroom left when it is read, so batches
+        shrink as the coauthor resolution cache grows.
+        """
+        self.spill()
+        n = len(self)
+        cost = np.full(n, self.SLOT_BYTES, np.int64)
+        for run in self.runs:
+            occ = np.load(self._path(run, "occ.npy"), mmap_mode="r")
+            co = np.load(self._path(run, "co.npy"), mmap_mode="r")
+            cost += np.bincount(occ["slot"], minlength=n) * self.OCC_BYTES
+            cost += np.bincount(co["slot"], minlength=n) * self.CO_BYTES
+        cum = np.r_[0, np.cumsum(cost)]
+        del cost
+        self.merge_budget, lo = 0, 0
+        while True:
+            budget = max(self.memory_limit - rss_bytes(), 16 << 20) // 2
+            self.merge_budget = max(self.merge_budget, budget)
+            hi = max(int(np.searchsorted(cum, cum[lo] + budget, side="right")) - 1, lo + 1) if lo < n else n
+            yield _SpillBatch(self, lo, hi)
+            if hi >= n:
+                return
+            lo = hi
+
+    def cleanup(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+class _SpillBatch:
+    """CandidateStore-shaped view of slots [lo, hi) of a SpillStore, merged from every run.
+
+    Runs are concatenated in the order they were written and stably sorted by slot, so each
+    slot's papers keep their pass2 order (top_topics() tie-breaks depend on it).
+    """
+
+    def __init__(self, store, lo, hi):
+        self.topic_names = store.topic_names
+        self.names = store.names[lo:hi]
+        self.first_year = store.first_year[lo:hi]
+        occ, co_slots, co_names = [], [], []
+        for run in store.runs:
+            o = np.load(store._path(run, "occ.npy"), mmap_mode="r")
+            a, b = np.searchsorted(o["slot"], [lo, hi])
+            occ.append(np.array(o[a:b]))
+            c = np.load(store._path(run, "co.npy"), mmap_mode="r")
+            a, b = np.searchsorted(c["slot"], [lo, hi])
+            if a == b:
                 continue
-            year = year_from_date(str(r.get("pub_date", "")))
-            citations = int(r.get("citation_count", 0) or 0)
-            topic_name = detect_topic(f"{r.get('title','')} {r.get('abstract','')}")
-            topic_id = stable_uuid("topic", topic_name)
-
-            for a in inter:
-                cid = stable_uuid("candidate", a)
-                pub_id = stable_uuid("pub", r.get("id", ""), a)
-                with open(pubs_path, "a", newline='') as f:
-                    writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-                    writer.writerow([
-                        pub_id, cid, r.get("title",""), r.get("venue",""), year or "",
-                        citations, r.get("doi",""), r.get("abstract",""),
-                        topic_id, datetime.utcnow().isoformat(), datetime.utcnow().isoformat()
-                    ])
-                d = per_cand[cid]
-                d["cit"].append(citations)
-                d["topics"].append(topic_name)
-                d["coauthors"].update(normed)
-                if year and (d["first_year"] is None or year < d["first_year"]):
-                    d["first_year"] = year
+            start = int(c["end"][a - 1]) if a else 0
+            with open(store._path(run, "co.bin"), "rb") as f:
+                f.seek(start)
+                co_names.extend(f.read(int(c["end"][b - 1]) - start).decode("utf-8").split("\n")[:-1])
+            co_slots.append(np.array(c["slot"][a:b]))
+        occ = np.concatenate(occ) if occ else np.zeros(0, SPILL_OCC_DTYPE)
+        occ = occ[np.argsort(occ["slot"], kind="stable")]
+        self._slot, self._cit, self._topic = occ["slot"] - lo, occ["cit"], occ["topic"]
+
+        codes, uniq = pd.factorize(np.array(co_names, dtype=object))
+        self.author_names = list(uniq)
+        co_slots = np.concatenate(co_slots) - lo if co_slots else np.zeros(0, np.int64)
+        order = np.argsort(co_slots, kind="stable")
+        self.coauthors = np.split(codes[order], np.searchsorted(co_slots[order], np.arange(1, hi - lo)))
+
+    def __len__(self):
+        return len(self.names)
+
+    def citation_arrays(self):
+        return self._slot, self._cit
+
+    def topic_arrays(self):
+        return self._slot, self._topic
+
+    def candidate_ids(self):
+        return [stable_uuid("candidate", name) for name in self.names]
+
+def _pass2_chunk(chunk, pool, store, run_ts, topics=TOPICS):
+    """Accumulate one metadata chunk into the CandidateStore and return its [paper_id] + PUB_COLUMNS rows."""
+    chunk.columns = [c.lower().strip() for c in chunk.columns]
+    n = len(chunk)
+    col = lambda c: chunk[c].tolist() if c in chunk.columns else [""] * n
+    parsed = [parse_authors(a)[0] for a in col("author")]
+    hit = [i for i, normed in enumerate(parsed) if any(a in pool for a in normed)]
+    if not hit:
+        return []
+    sub = chunk.iloc[hit]
+    text = lambda c: sub[c].fillna("") if c in sub.columns else pd.Series("", index=sub.index)
+    codes = topics.label_codes(text("title") + " " + text("abstract")).tolist()
+
+    ids, titles, venues, dois, abstracts = col("id"), col("title"), col("venue"), col("doi"), col("abstract")
+    dates, cits = col("pub_date"), col("citation_count")
+    rows = []
+    for i, topic_code in zip(hit, codes):
+        normed = parsed[i]
+        year = year_from_date(str(dates[i]))
+        citations = int(cits[i] or 0)
+        topic_id = topics.ids[topic_code]
+        co_ids = [store.intern(a) for a in normed]
+        paper = ids[i] if isinstance(ids[i], str) and ids[i] else stable_uuid("paper", titles[i], dois[i], dates[i])
+
+        for a, aid in zip(normed, co_ids):
+            if a not in pool:
+                continue
+            cid = stable_uuid("candidate", a)
+            pub_id = stable_uuid("pub", ids[i], a)
+            rows.append([
+                paper, pub_id, cid, titles[i], venues[i], year or "",
+                citations, dois[i], abstracts[i],
+                topic_id, run_ts, run_ts
+            ])
+            store.add(aid, citations, topic_code, co_ids, year)
+    return rows
+
+def load_pass2(checkpoint):
+    """pass2's checkpointed state: the last snapshot with the deltas after it applied (None if none)."""
+    state = checkpoint.load("pass2")
+    if state is None:
+        return None
+    for delta in checkpoint.deltas("pass2"):
+        state["store"].apply_delta(delta.pop("store"))
+        state["papers"].update(delta.pop("papers"))
+        state.update(delta)
+    return state
+
+def pass2(meta_path, chunksize, pool, out_dir, run_ts=None, topics=TOPICS, checkpoint=None,
+          pub_layout="denormalized", fmt="csv", store=None):
+    """Stream the metadata once, writing publication rows and filling `store` (default: a new CandidateStore)."""
+    run_ts = run_ts or datetime.utcnow().isoformat()
+    names = read_meta_header(meta_path)
+    state = load_pass2(checkpoint) if checkpoint else None
+
+    if state:
+        per_cand, rows_done, chunks_done = state["store"], state["rows_done"], state["chunks_done"]
+        writer = PublicationWriter(out_dir, pub_layout, offsets=state["offsets"], seen=state["papers"], fmt=fmt)
+        print(f"[RESUME] pass2 from chunk {chunks_done} (row {rows_done:,})")
+    else:
+        per_cand, rows_done, chunks_done = CandidateStore(topics.names) if store is None else store, 0, 0
+        writer = PublicationWriter(out_dir, pub_layout, fmt=fmt)
+    if checkpoint:
+        per_cand.journal()
+        writer.new_ids = []
+
+    with writer, pd.read_csv(meta_path, names=names, header=None, skiprows=1 + rows_done, chunksize=chunksize,
+                             dtype=meta_dtypes(names), low_memory=False) as reader:
+        # Under --memory-limit the chunk working set counts against the limit too, so chunk sizes
+        # follow the headroom the store leaves instead of staying at --chunksize
+        limited = isinstance(per_cand, SpillStore)
+        size = min(chunksize, SpillStore.PROBE_ROWS) if limited else chunksize
+        while True:
+            rss_before, peak_before = rss_bytes(), peak_rss_bytes()
+            try:
+                chunk = reader.get_chunk(size)
+            except StopIteration:
+                break
+            rows = len(chunk)
+            writer.write(_pass2_chunk(chunk, pool, per_cand, run_ts, topics))
+            del chunk  # not held while the next one is parsed
+            if limited:
+                size = per_cand.chunk_rows(rows, rss_before, peak_before, chunksize)
+            rows_done += rows
+            chunks_done += 1
+            if checkpoint and chunks_done % checkpoint.every == 0:
+                progress = {"rows_done": rows_done, "chunks_done": chunks_done, "offsets": writer.sync()}
+                delta = dict(progress, store=per_cand.checkpoint_delta(), papers=writer.new_ids)
+                writer.new_ids = []
+                checkpoint.update("pass2", delta, lambda: dict(progress, store=per_cand, papers=writer.seen))
+    if checkpoint and "pass2" in checkpoint.written:
+        snapshots, snap_bytes, deltas, delta_bytes = checkpoint.written["pass2"]
+        print(f"[CHECKPOINT] pass2: {snapshots} snapshots ({snap_bytes / 2**20:,.1f} MiB), "
+              f"{deltas} deltas ({delta_bytes / 2**20:,.1f} MiB)")
     return per_cand
 
+# =============================================================
+# Pass 2 (sharded, --workers N)
+# =============================================================
+def shard_offsets(meta_path, n_shards, block=1 << 24):
+    """Split the data section of meta_path into byte ranges that start/end on record boundaries.
+
+    A newline is a record boundary only when the number of quote characters before it is
+    even, so multi-line quoted abstracts are never cut in half.
+    """
+    size = os.path.getsize(meta_path)
+    with open(meta_path, "rb") as f:
+        data_start = len(f.readline())
+        targets = [data_start + (size - data_start) * i // n_shards for i in range(1, n_shards)]
+        bounds = [data_start]
+        pos, quotes, ti = data_start, 0, 0
+        while ti < len(targets):
+            buf = f.read(block)
+            if not buf:
+                break
+            while ti < len(targets) and targets[ti] < pos + len(buf):
+                j = buf.find(b"\n", max(targets[ti] - pos, 0))
+                while j != -1 and (quotes + buf.count(b'"', 0, j)) % 2:
+                    j = buf.find(b"\n", j + 1)
+                if j == -1:
+                    targets[ti] = pos + len(buf)
+                    break
+                if pos + j + 1 > bounds[-1]:
+                    bounds.append(pos + j + 1)
+                ti += 1
+            quotes += buf.count(b'"')
+            pos += len(buf)
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+def record_blocks(src, block=1 << 26):
+    """Cut a binary CSV stream (positioned after the header) into blocks of whole records.
+
+    Uses the same boundary rule as shard_offsets(), for inputs that can't be seeked into
+    (.gz/.zst): a block ends at the last newline preceded by an even number of quotes.
+    """
+    carry = b""
+    while True:
+        buf = src.read(block)
+        if not buf:
+            if carry:
+                yield carry
+            return
+        data = carry + buf
+        quotes = data.count(b'"')
+        j = data.rfind(b"\n")
+        while j != -1 and (quotes - data.count(b'"', j)) % 2:
+            j = data.rfind(b"\n", 0, j)
+        if j == -1:
+            carry = data
+            continue
+        yield data[:j + 1]
+        carry = data[j + 1:]
+
+def shard_sources(meta_path, n_shards):
+    """pass2_parallel inputs: (path, start, end) byte ranges, or record blocks of a compressed file."""
+    if not codec_of(meta_path):
+        yield from ((meta_path, a, b) for a, b in shard_offsets(meta_path, n_shards))
+        return
+    # Aim for n_shards blocks assuming ~5x compression; cap the block held per in-flight task
+    block = min(max(os.path.getsize(meta_path) * 5 // n_shards, 1 << 20), 1 << 26)
+    with open_input(meta_path) as src:
+        src.readline()
+        yield from record_blocks(src, block)
+
+class _ByteRange(io.RawIOBase):
+    """Read-only view of bytes [start, end) of a file."""
+    def __init__(self, path, start, end):
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._left = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self._left)
+        if n <= 0:
+            return 0
+        got = self._f.readinto(memoryview(b)[:n])
+        self._left -= got
+        return got
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+_WORKER_POOL, _WORKER_TOPICS = None, TOPICS
+
+def _init_pass2_worker(pool, topics):
+    global _WORKER_POOL, _WORKER_TOPICS, COMPRESS_THREADS
+    _WORKER_POOL, _WORKER_TOPICS = pool, topics
+    # The workers already occupy the cores; one compression thread each keeps writes async
+    COMPRESS_THREADS = 1
+
+def _pass2_shard(task):
+    source, names, chunksize, out_dir, part, pub_layout, fmt, run_ts = task
+    per_cand = CandidateStore(_WORKER_TOPICS.names)
+    src = io.BytesIO(source) if isinstance(source, bytes) else io.BufferedReader(_ByteRange(*source))
+    with src, PublicationWriter(out_dir, pub_layout, part, fmt=fmt) as writer:
+        for chunk in pd.read_csv(src, names=names, header=None, chunksize=chunksize,
+                                 dtype=meta_dtypes(names), low_memory=False):
+            writer.write(_pass2_chunk(chunk, _WORKER_POOL, per_cand, run_ts, _WORKER_TOPICS))
+    return per_cand, (writer.seen if "papers" in writer.paths else None)
+
+def pass2_parallel(meta_path, chunksize, pool, out_dir, workers, run_ts=None, topics=TOPICS, checkpoint=None,
+                   pub_layout="denormalized", fmt="csv"):
+    run_ts = run_ts or datetime.utcnow().isoformat()
+    names = read_meta_header(meta_path)
+    # Parquet parts are written into the dataset itself; CSV parts are separate files
+    part_done = lambda part: fmt == "parquet" or all(
+        os.path.exists(f"{publication_path(out_dir, t, fmt)}.part-{part}") for t in PUB_LAYOUTS[pub_layout])
+
+    # A shard is done once its store is checkpointed; its part-files were closed before that.
+    saved = checkpoint.names() if checkpoint else set()
+    if not any(n.startswith("shard-") for n in saved):
+        clear_publications(out_dir, pub_layout, fmt)
+
+    # Shard results are merged in shard order as they arrive, so only the out-of-order ones wait
+    parts, results, paper_ids, resumed = [], {}, [], 0
+    merged = CandidateStore(topics.names)
+
+    def collect(i, result):
+        results[i] = result
+        while len(paper_ids) in results:
+            store, seen = results.pop(len(paper_ids))
+            merged.merge(store)
+            paper_ids.append(seen)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_pass2_worker,
+                             initargs=(pool, topics)) as ex:
+        running = {}
+
+        def finish(futures):
+            for fut in futures:
+                i = running.pop(fut)
+                result = fut.result()
+                if checkpoint:
+                    checkpoint.save(f"shard-{parts[i]}", result)
+                collect(i, result)
+
+        for i, source in enumerate(shard_sources(meta_path, workers * 4)):
+            part = f"{i:04d}"
+            parts.append(part)
+            result = checkpoint.load(f"shard-{part}") if f"shard-{part}" in saved else None
+            if result is not None and part_done(part):
+                resumed += 1
+                collect(i, result)
+                continue
+            running[ex.submit(_pass2_shard, (source, names, chunksize, out_dir, part, pub_layout, fmt,
+                                             run_ts))] = i
+            # Bounds the decompressed blocks held in memory for compressed input
+            while len(running) > workers:
+                finish(wait(running, return_when=FIRST_COMPLETED).done)
+        finish(list(running))
+
+    if resumed:
+        print(f"[RESUME] {resumed}/{len(parts)} pass2 shards already done")
+    print(f"[PASS2] {len(parts) - resumed} shards on {workers} workers")
+    concat_parts(out_dir, pub_layout, parts, paper_ids, fmt)
+    return merged
+
+# =============================================================
+# Checkpoints (--resume)
+# =============================================================
+CHECKPOINT_FORMAT = 3
+
+class Checkpoint:
+    """Pickled build state under <out-dir>/.checkpoint, tagged with the run's fingerprint.
+
+    Each save is written to a temp file and renamed into place, so a crash leaves the
+    previous consistent checkpoint. load() ignores state written for different inputs or
+    settings.
+
+    State that grows during a pass (pass2's store) is checkpointed with update(): a snapshot
+    <name>.pkl plus append-only deltas <name>.NNNNNN.delta, each holding only what changed
+    since the previous checkpoint. The snapshot is rewritten (compacting the deltas into it)
+    once the deltas written since would outgrow it, so checkpoint I/O stays linear in the
+    data instead of re-pickling the whole store every few chunks.
+    """
+
+    def __init__(self, out_dir, fingerprint, every=20):
+        self.dir = os.path.join(out_dir, ".checkpoint")
+        self.fingerprint = fingerprint
+        self.every = max(1, every)
+        # name -> [next delta number, snapshot bytes, delta bytes since the snapshot]
+        self._log = {}
+        # name -> [snapshots, snapshot bytes, deltas, delta bytes] written by this process
+        self.written = {}
+
+    def _path(self, name):
+        return os.path.join(self.dir, f"{name}.pkl")
+
+    def _delta_path(self, name, seq):
+        return os.path.join(self.dir, f"{name}.{seq:06d}.delta")
+
+    def _write(self, path, data):
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return len(data)
+
+    def save(self, name, payload):
+        """Write a full snapshot of `name`; it supersedes the deltas written so far."""
+        seq = self._log.get(name, [0])[0]
+        size = self._write(self._path(name), pickle.dumps((self.fingerprint, seq, payload),
+                                                          protocol=pickle.HIGHEST_PROTOCOL))
+        self._log[name] = [seq, size, 0]
+        self._count(name, 0, size)
+        # Every delta on disk is now either in the snapshot or left by an abandoned run;
+        # load() only reads from `seq` on, so a crash before this cleanup is harmless
+        for fn in os.listdir(self.dir):
+            if fn.startswith(f"{name}.") and fn.endswith(".delta"):
+                os.remove(os.path.join(self.dir, fn))
+
+    def update(self, name, delta, snapshot):
+        """Append `delta` to `name`'s log, or save(name, snapshot()) instead when compaction is due.
+
+        snapshot() must return the full state including `delta`; the first update() of a name
+        always writes a snapshot.
+        """
+        seq, snap_bytes, delta_bytes = self._log.get(name, [0, 0, 0])
+        data = pickle.dumps((self.fingerprint, delta), protocol=pickle.HIGHEST_PROTOCOL)
+        if delta_bytes + len(data) > snap_bytes:
+            self.save(name, snapshot())
+            return
+        self._write(self._delta_path(name, seq), data)
+        self._log[name] = [seq + 1, snap_bytes, delta_bytes + len(data)]
+        self._count(name, 2, len(data))
+
+    def _count(self, name, i, size):
+        w = self.written.setdefault(name, [0, 0, 0, 0])
+        w[i] += 1
+        w[i + 1] += size
+
+    def names(self):
+        """Names with a saved checkpoint (fingerprint not checked)."""
+        if not os.path.isdir(self.dir):
+            return set()
+        return {fn[:-4] for fn in os.listdir(self.dir) if fn.endswith(".pkl")}
+
+    def load(self, name):
+        try:
+            with open(self._path(name), "rb") as f:
+                fingerprint, seq, payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if fingerprint != self.fingerprint:
+            return None
+        self._log[name] = [seq, os.path.getsize(self._path(name)), 0]
+        return payload
+
+    def deltas(self, name):
+        """Yield the deltas update() appended after the snapshot load(name) returned, in order."""
+        seq, snap_bytes, delta_bytes = self._log[name]
+        while True:
+            path = self._delta_path(name, seq)
+            try:
+                with open(path, "rb") as f:
+                    fingerprint, delta = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                return
+            if fingerprint != self.fingerprint:
+                return
+            seq, delta_bytes = seq + 1, delta_bytes + os.path.getsize(path)
+            # Later update()s continue the log after the last delta applied
+            self._log[name] = [seq, snap_bytes, delta_bytes]
+            yield delta
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+def run_fingerprint(meta, chunksize, yrmin, yrmax, pass1_mode, workers, topics, pub_layout="denormalized",
+                    fmt="csv", memory_limit=None):
+    st = os.stat(meta)
+    return (CHECKPOINT_FORMAT, os.path.abspath(meta), st.st_size, st.st_mtime_ns,
+            chunksize, yrmin, yrmax, pass1_mode, workers, tuple(topics.names), pub_layout, fmt, memory_limit)
+
 # =============================================================
 # Finalize outputs
 # =============================================================
-def finalize(per_cand, csr_map, alias_map, out_dir, region_map):
+CAND_COLUMNS = ["id","name","university_id","graduation_year","total_citations","h_index","ranking_score",
+                "research_interests","profile_image_url","linkedin_url","google_scholar_url","created_at","updated_at"]
+UNI_COLUMNS = ["id","name","country","ranking","logo_url","website","created_at","updated_at"]
+METRICS_COLUMNS = ["id","university_id","year","publications_count","total_citations","h_index_avg",
+                   "conference_papers","journal_papers","created_at","updated_at"]
+TOPIC_COLUMNS = ["id","name","description","created_at","updated_at"]
+CAND_TOPIC_COLUMNS = ["candidate_id","topic_id","created_at"]
+UNKNOWN_UNIVERSITY = "Unknown University"
+
+def top_topics(slot, code, n_codes, k=3):
+    """Counter(topics).most_common(k) for every slot at once.
+
+    slot/code are flat arrays in per-slot insertion order. Returns (slot, code) pairs sorted
+    by slot, then count desc, then first occurrence - Counter's tie-break.
+    """
+    key = slot.astype(np.int64) * n_codes + code
+    uniq, first, counts = np.unique(key, return_index=True, return_counts=True)
+    s, c = uniq // n_codes, uniq % n_codes
+    order = np.lexsort((first, -counts, s))
+    s, c = s[order], c[order]
+    starts = np.flatnonzero(np.r_[True, s[1:] != s[:-1]]) if s.size else np.zeros(0, np.int64)
+    rank = np.arange(s.size) - np.repeat(starts, np.diff(np.r_[starts, s.size]))
+    keep = rank < k
+    return s[keep], c[keep]
+
+class CoauthorGraph:
+    """Candidate x coauthor incidence matrix in CSR form (indptr / indices, no stored values).
+
+    Row r is slot rows[r]; columns are the distinct coauthor names in sorted order, so within
+    a row the column index is also the order the per-candidate loop used to visit names.
+    """
+
+    def __init__(self, store, slots=None):
+        self.rows = np.arange(len(store)) if slots is None else np.asarray(slots, dtype=np.int64)
+        co = [store.coauthors[s] for s in self.rows.tolist()]
+        lens = np.fromiter(map(len, co), dtype=np.int64, count=len(co))
+        ids = np.concatenate(co).astype(np.int64) if co else np.zeros(0, np.int64)
+
+        # Author ids are dense, so columns come from a lookup array rather than a hash table
+        used = np.zeros(len(store.author_names), dtype=bool)
+        used[ids] = True
+        used = np.flatnonzero(used)
+        names = [store.author_names[a] for a in used.tolist()]
+        order = sorted(range(used.size), key=names.__getitem__)
+        self.names = [names[i] for i in order]
+        self._col = np.full(len(store.author_names), -1, dtype=np.int64)
+        self._col[used[order]] = np.arange(used.size)
+
+        # Duplicate (row, column) entries collapse: the matrix is 0/1
+        n_cols = max(used.size, 1)
+        key = np.sort(np.repeat(np.arange(len(co)), lens) * n_cols + self._col[ids])
+        key = key[np.r_[True, key[1:] != key[:-1]]] if key.size else key
+        self.indices = key % n_cols
+        self.indptr = np.searchsorted(key // n_cols, np.arange(len(co) + 1))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def columns_of(self, author_ids):
+        """Column of each author id, -1 for authors that are nobody's coauthor."""
+        return self._col[np.asarray(author_ids, dtype=np.int64)]
+
+    def vote(self, col_label, n_labels):
+        """argmax of A @ onehot(col_label) per row: the label most of its coauthors carry.
+
+        Unlabelled columns are -1. Returns (row, label) for rows with any labelled coauthor;
+        ties go to the label met first in column order, as Counter.most_common(1) does.
+        """
+        row = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        lab = col_label[self.indices]
+        hit = lab >= 0
+        return top_topics(row[hit], lab[hit], max(n_labels, 1), k=1)
+
+def infer_universities(store, resolver, resolve, slots=None, hops=1, active=None):
+    """Most common resolved university among each candidate's (or each given slot's) coauthors.
+
+    Every distinct coauthor name is resolved once into a seed label; one vote over the
+    CoauthorGraph gives the direct answer. With hops > 1, candidates still unknown take
+    another vote in which each labelled candidate lends its university to its own column,
+    so a student whose coauthors are all students picks up their inferred affiliation.
+    Hops > 1 needs every slot in the store (slots only picks the rows returned); slots
+    where `active` is False (out of the pool) do not lend.
+    """
+    graph = CoauthorGraph(store, slots if hops <= 1 else None)
+    resolved = [resolver.get(name, resolve) or None for name in graph.names]
+    seed, uni_names = pd.factorize(np.array(resolved, dtype=object))
+    label = np.full(len(graph), -1, dtype=np.int64)
+    rows, labels = graph.vote(seed, len(uni_names))
+    label[rows] = labels
+
+    own = graph.columns_of(store.slot_author) if hops > 1 else None
+    for _ in range(hops - 1):
+        col_label = seed.copy()
+        lend = (own >= 0) & (label >= 0)
+        if active is not None:
+            lend &= active
+        lend[lend] &= seed[own[lend]] < 0
+        col_label[own[lend]] = label[lend]
+        rows, labels = graph.vote(col_label, len(uni_names))
+        new = label[rows] < 0
+        if not new.any():
+            break
+        label[rows[new]] = labels[new]
+
+    unis = np.append(np.asarray(uni_names, dtype=object), UNKNOWN_UNIVERSITY)[label]
+    if hops > 1 and slots is not None:
+        unis = unis[np.asarray(slots, dtype=np.int64)]
+    return unis.tolist()
+
+class TableWriter:
+    """One derived table written in one or more DataFrame batches (CSV header once, one Parquet file)."""
+
+    def __init__(self, out_dir, name, fmt="csv"):
+        self.name, self.fmt = name, fmt
+        self.path = os.path.join(out_dir, f"{name}.{fmt}")
+        self._out = None
+
+    def write(self, df):
+        if self.fmt == "parquet":
+            _, pq = _pyarrow()
+            table = arrow_table({c: df[c].tolist() for c in df.columns}, arrow_schema(self.name))
+            if self._out is None:
+                self._out = pq.ParquetWriter(self.path, table.schema, compression="zstd")
+            self._out.write_table(table)
+        else:
+            header = self._out is None
+            if header:
+                self._out = OutputFile(self.path)
+            df.to_csv(self._out, header=header, index=False, quoting=csv.QUOTE_ALL)
+
+    def close(self):
+        if self._out is not None:
+            self._out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_tables(out_dir, tables, fmt="csv"):
+    for name, df in tables.items():
+        with TableWriter(out_dir, name, fmt) as w:
+            w.write(df)
+
+def metrics_table(agg, run_ts):
+    """academic_metrics rows from per-university publications_count / total_citations / h_index_avg."""
     CURRENT_YEAR = datetime.utcnow().year
-    cand_rows, universities, topic_dict = [], {}, {}
+    return pd.DataFrame({
+        "id": [stable_uuid("academic_metrics", uid, CURRENT_YEAR) for uid in agg["university_id"]],
+        "university_id": agg["university_id"],
+        "year": CURRENT_YEAR,
+        "publications_count": agg["publications_count"],
+        "total_citations": agg["total_citations"],
+        "h_index_avg": agg["h_index_avg"].astype(float),
+        "conference_papers": 0,
+        "journal_papers": 0,
+        "created_at": run_ts,
+        "updated_at": run_ts,
+    }, columns=METRICS_COLUMNS)
+
+def build_tables(store, uni_names, region_map, run_ts, active=None):
+    """The five derived tables for every slot (or the slots where `active` is True)."""
+    CURRENT_YEAR = datetime.utcnow().year
+    n = len(store)
 
-    for cid, d in per_cand.items():
-        name = cid.split("||")[-1]
-        total = sum(d["cit"])
-        h = compute_h_index(d["cit"])
-        pub_cnt = len(d["cit"])
+    cand_ids = store.candidate_ids()
+    metrics = bulk_metrics(*store.citation_arrays(), n)
+    first_year = np.frombuffer(store.first_year, dtype=np.uint16).astype(np.int64)
+    graduation_year = np.where(first_year > 0, first_year + 5, CURRENT_YEAR)
 
-        co_uni_counter = Counter()
-        for co in d["coauthors"]:
-            if co == name:
-                continue
-            co_uni = fuzzy_match(co, csr_map, alias_map)
-            if co_uni:
-                co_uni_counter[co_uni] += 1
-        uni = co_uni_counter.most_common(1)[0][0] if co_uni_counter else "Unknown University"
-        uni_id = stable_uuid("university", uni)
-        universities[uni_id] = uni
-
-        first_pub = d.get("first_year", CURRENT_YEAR)
-        graduation_year = (first_pub + 5) if first_pub else CURRENT_YEAR
-
-        top3 = [t for t, _ in Counter(d["topics"]).most_common(3)]
-        research_interests = "; ".join(top3)
-        for t in top3:
-            topic_dict[t] = stable_uuid("topic", t)
-
-        cand_rows.append({
-            "id": cid,
-            "name": name,
-            "university_id": uni_id,
-            "graduation_year": graduation_year,
-            "total_citations": total,
-            "h_index": h,
-            "research_interests": research_interests,
-            "profile_image_url": "",
-            "linkedin_url": "",
-            "google_scholar_url": "",
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
-        })
-
-    # Write all tables with quoting
-    df_cand = pd.DataFrame(cand_rows)
-    df_cand.to_csv(os.path.join(out_dir, "candidates.csv"), index=False, quoting=csv.QUOTE_ALL)
-
-    uni_rows = [{
-        "id": uid,
-        "name": uname,
-        "country": region_map.get(uname, "unknown"),
+    uni_names = pd.Series(uni_names, dtype=object)
+    used = uni_names if active is None else uni_names[active]
+    uni_lookup = {u: stable_uuid("university", u) for u in pd.unique(used)}
+    uni_ids = uni_names.map(uni_lookup)
+
+    t_slot, t_code = top_topics(*store.topic_arrays(), len(store.topic_names))
+    if active is not None:
+        keep = active[t_slot]
+        t_slot, t_code = t_slot[keep], t_code[keep]
+    topic_names = np.array(store.topic_names, dtype=object)[t_code]
+    interests = [[] for _ in range(n)]
+    for sl, t in zip(t_slot.tolist(), topic_names):
+        interests[sl].append(t)
+    topic_lookup = {t: stable_uuid("topic", t) for t in pd.unique(topic_names)}
+
+    df_cand = pd.DataFrame({
+        "id": cand_ids,
+        "name": cand_ids,
+        "university_id": uni_ids,
+        "graduation_year": graduation_year,
+        "total_citations": metrics["total_citations"],
+        "h_index": metrics["h_index"],
+        "ranking_score": metrics["ranking_score"],
+        "research_interests": ["; ".join(ts) for ts in interests],
+        "profile_image_url": "",
+        "linkedin_url": "",
+        "google_scholar_url": "",
+        "created_at": run_ts,
+        "updated_at": run_ts,
+    }, columns=CAND_COLUMNS)
+    if active is not None:
+        df_cand = df_cand[active].reset_index(drop=True)
+
+    df_uni = pd.DataFrame({
+        "id": list(uni_lookup.values()),
+        "name": list(uni_lookup),
+        "country": [region_map.get(u, "unknown") for u in uni_lookup],
         "ranking": None,
         "logo_url": "",
         "website": "",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat(),
-    } for uid, uname in universities.items()]
-    pd.DataFrame(uni_rows).to_csv(os.path.join(out_dir, "universities.csv"), index=False, quoting=csv.QUOTE_ALL)
-
-    metrics_rows = [{
-        "id": stable_uuid("academic_metrics", uid, CURRENT_YEAR),
-        "university_id": uid,
-        "year": CURRENT_YEAR,
-        "publications_count": int(grp.shape[0]),
-        "total_citations": int(grp["total_citations"].sum()),
-        "h_index_avg": float(grp["h_index"].mean()),
-        "conference_papers": 0,
-        "journal_papers": 0,
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat(),
-    } for uid, grp in df_cand.groupby("university_id")]
-    pd.DataFrame(metrics_rows).to_csv(os.path.join(out_dir, "academic_metrics.csv"), index=False, quoting=csv.QUOTE_ALL)
-
-    pd.DataFrame([{
-        "id": tid,
-        "name": t,
+        "created_at": run_ts,
+        "updated_at": run_ts,
+    }, columns=UNI_COLUMNS)
+
+    agg = df_cand.groupby("university_id").agg(
+        publications_count=("id", "size"),
+        total_citations=("total_citations", "sum"),
+        h_index_avg=("h_index", "mean"),
+    ).reset_index()
+    df_metrics = metrics_table(agg, run_ts)
+
+    df_topics = pd.DataFrame({
+        "id": list(topic_lookup.values()),
+        "name": list(topic_lookup),
         "description": "",
-        "created_at": datetime.utcnow().isoformat(),
-        "updated_at": datetime.utcnow().isoformat(),
-    } for t, tid in topic_dict.items()]).to_csv(os.path.join(out_dir, "research_topics.csv"), index=False, quoting=csv.QUOTE_ALL)
-
-    cand_topic_rows = []
-    for _, r in df_cand.iterrows():
-        topics = [t.strip() for t in r["research_interests"].split(";") if t.strip()]
-        for t in topics:
-            tid = topic_dict.get(t)
-            if tid:
-                cand_topic_rows.append({
-                    "candidate_id": r["id"],
-                    "topic_id": tid,
-                    "created_at": datetime.utcnow().isoformat(),
-                })
-    pd.DataFrame(cand_topic_rows).to_csv(os.path.join(out_dir, "candidate_topics.csv"), index=False, quoting=csv.QUOTE_ALL)
+        "created_at": run_ts,
+        "updated_at": run_ts,
+    }, columns=TOPIC_COLUMNS)
+
+    df_cand_topics = pd.DataFrame({
+        "candidate_id": np.array(cand_ids, dtype=object)[t_slot],
+        "topic_id": pd.Series(topic_names).map(topic_lookup).to_numpy(),
+        "created_at": run_ts,
+    }, columns=CAND_TOPIC_COLUMNS)
+
+    return {
+        "candidates": df_cand,
+        "universities": df_uni,
+        "academic_metrics": df_metrics,
+        "research_topics": df_topics,
+        "candidate_topics": df_cand_topics,
+    }
+
+# =============================================================
+# University comparison aggregates
+# =============================================================
+# The grouping src/api/universityComparison.ts used to do in the browser, with its matching rules:
+# a venue maps to the first pattern it contains; a research interest maps to an emerging topic by
+# name, then keyword, then shared words. The page now only sums these tables over a year range.
+CONFERENCE_PATTERNS = {
+    "icml": "ICML", "neurips": "NeurIPS", "nips": "NeurIPS", "iclr": "ICLR", "aaai": "AAAI",
+    "ijcai": "IJCAI", "acl": "ACL", "emnlp": "EMNLP", "cvpr": "CVPR", "iccv": "ICCV", "eccv": "ECCV",
+    "sigmod": "SIGMOD", "vldb": "VLDB", "kdd": "KDD", "www": "WWW", "chi": "CHI", "uist": "UIST",
+    "usenix": "USENIX", "osdi": "OSDI", "sosp": "SOSP", "ccs": "CCS", "ndss": "NDSS",
+}
+EMERGING_TOPIC_KEYWORDS = {
+    # AI/ML
+    "Large Language Models": ["llm", "large language model", "language model", "gpt", "bert", "transformer model"],
+    "Generative AI": ["generative", "generative ai", "gan", "generative adversarial", "text generation",
+                      "image generation"],
+    "Federated Learning": ["federated", "federated learning", "distributed learning", "privacy-preserving"],
+    "Edge Computing": ["edge", "edge computing", "edge ai", "mobile computing", "iot"],
+    "Explainable AI": ["explainable", "xai", "interpretable", "model interpretability", "explainability"],
+    "Neural Architecture Search": ["nas", "neural architecture", "architecture search", "auto ml"],
+    "Graph Neural Networks": ["gnn", "graph neural", "graph network", "graph learning", "graph convolution"],
+    "Multimodal Learning": ["multimodal", "multi-modal", "vision-language", "cross-modal"],
+    "Zero-Shot Learning": ["zero-shot", "zero shot", "few-shot", "few shot", "transfer learning"],
+    "Sustainable Computing": ["sustainable", "green computing", "energy efficient", "carbon footprint"],
+    "Foundation Models": ["foundation model", "foundation models", "pre-trained model", "base model"],
+    "Transformers": ["transformer", "attention mechanism", "self-attention", "bert", "gpt"],
+    "Diffusion Models": ["diffusion", "diffusion model", "stable diffusion", "denoising"],
+    "Prompt Engineering": ["prompt", "prompting", "in-context learning", "few-shot prompting"],
+    "Reinforcement Learning from Human Feedback": ["rlhf", "reinforcement learning from human", "human feedback",
+                                                   "preference learning"],
+    # High-Performance Computing & Systems
+    "High-Performance Computing": ["high-performance computing", "hpc", "supercomputing", "parallel computing",
+                                   "distributed computing"],
+    "Distributed Systems": ["distributed systems", "distributed computing", "distributed architecture"],
+    "Parallel Computing": ["parallel computing", "parallel processing", "parallel algorithms"],
+    "Cloud Computing": ["cloud computing", "cloud systems", "cloud infrastructure"],
+    # Materials Science & Engineering
+    "Materials Science": ["materials science", "material science", "materials engineering", "material engineering"],
+    "Advanced Materials": ["advanced materials", "novel materials", "smart materials"],
+    "Additive Manufacturing": ["additive manufacturing", "3d printing", "rapid prototyping"],
+    "Computational Materials": ["computational materials", "materials simulation", "materials modeling"],
+    "Nuclear Materials": ["nuclear materials", "nuclear material", "fusion materials", "reactor materials"],
+    "Fusion Materials": ["fusion materials", "fusion material", "nuclear fusion materials"],
+    # Energy Systems
+    "Nuclear Engineering": ["nuclear engineering", "nuclear", "reactor", "nuclear reactor"],
+    "Fusion Technology": ["fusion technology", "fusion", "nuclear fusion", "fusion energy"],
+    "Advanced Energy Systems": ["advanced energy", "energy systems", "energy technology"],
+    "Renewable Energy": ["renewable energy", "solar", "wind energy", "clean energy"],
+    "Energy Storage": ["energy storage", "battery", "energy storage systems"],
+    # Control & Automation
+    "Control Systems": ["control systems", "control engineering", "control theory"],
+    "Automation Engineering": ["automation", "automation engineering", "industrial automation"],
+    "Cyber-Physical Systems": ["cyber-physical", "cyber physical", "cps", "embedded systems"],
+    "Robotics": ["robotics", "robotic", "robot", "autonomous robot"],
+    "Autonomous Systems": ["autonomous systems", "autonomous", "self-driving"],
+    # Computational Methods
+    "Computational Mechanics": ["computational mechanics", "computational engineering", "numerical methods"],
+    "Computational Physics": ["computational physics", "physics simulation", "numerical physics"],
+    "Simulation": ["simulation", "modeling", "computational modeling"],
+    "Modeling": ["modeling", "modelling", "computational modeling", "simulation"],
+    # Other Emerging Areas
+    "Plasma Physics": ["plasma physics", "plasma", "plasma science"],
+    "Thermal Hydraulics": ["thermal hydraulics", "thermal hydraulic", "heat transfer"],
+    "Reactor Safety": ["reactor safety", "nuclear safety", "safety analysis"],
+    "Radiation Damage": ["radiation damage", "radiation", "irradiation", "damage modeling"],
+}
+EMERGING_TOPICS = list(EMERGING_TOPIC_KEYWORDS)
+CONFERENCES = list(dict.fromkeys(CONFERENCE_PATTERNS.values()))
+COMPARISON_COLUMNS = {
+    "university_conference_stats": ["university_id", "conference", "year", "papers"],
+    "university_topic_stats": ["university_id", "topic", "year", "papers"],
+    "university_emerging_topic_stats": ["university_id", "topic", "year", "papers"],
+}
+
+def conference_of(venue):
+    """Standard conference name of a venue, or None when no pattern matches."""
+    if not isinstance(venue, str) or not venue:
+        return None
+    v = venue.lower()
+    for pattern, conference in CONFERENCE_PATTERNS.items():
+        if pattern in v:
+            return conference
+    return None
+
+def emerging_topic_of(interest):
+    """Emerging topic a research interest counts toward, or None."""
+    t = interest.lower().strip()
+    for et in EMERGING_TOPICS:
+        e = et.lower()
+        if t == e or e in t or t in e:
+            return et
+    for et, keywords in EMERGING_TOPIC_KEYWORDS.items():
+        if any(k in t for k in keywords):
+            return et
+    words = t.split()
+    for et in EMERGING_TOPICS:
+        et_words = et.lower().split()
+        if len(et_words) > 1 and sum(any(w in e or e in w for w in words) for e in et_words) >= 2:
+            return et
+    return None
+
+def table_chunks(path, columns, chunksize):
+    """DataFrame chunks of some columns of an output table (CSV, compressed CSV or Parquet), as written.
+
+    CSV values stay strings ("" for empty); Parquet dictionary columns come back as plain objects.
+    """
+    if path.endswith(".parquet"):
+        _pyarrow()
+        import pyarrow.dataset as ds
+        dataset = ds.dataset(path, format="parquet", partitioning="hive" if os.path.isdir(path) else None)
+        for batch in dataset.to_batches(columns=columns, batch_size=chunksize):
+            df = batch.to_pandas()
+            for c in df.columns:
+                if isinstance(df[c].dtype, pd.CategoricalDtype):
+                    df[c] = df[c].astype(object)
+            yield df
+        return
+    with io.TextIOWrapper(open_input(path), encoding="utf-8", newline="") as f:
+        yield from pd.read_csv(f, usecols=columns, dtype=str, keep_default_na=False, chunksize=chunksize)
+
+def _publication_rows(out_dir, fmt, chunksize):
+    """(row key hash, candidate_id, venue, year) chunks of every publication row in out_dir.
+
+    Reads publications when it was written, else joins candidate_publications to papers by id
+    hash (links to a missing paper are dropped, like the loaders' FK check).
+    """
+    path = publication_path(out_dir, "publications", fmt)
+    if os.path.exists(path):
+        for c in table_chunks(path, ["id", "candidate_id", "venue", "year"], chunksize):
+            yield id_hashes(c["id"]), c["candidate_id"], c["venue"], c["year"]
+        return
+    path = publication_path(out_dir, "papers", fmt)
+    if not os.path.exists(path):
+        return
+    keys, venues, years = [], [], []
+    for c in table_chunks(path, ["id", "venue", "year"], chunksize):
+        keys.append(id_hashes(c["id"]))
+        # Only the conference name is kept per paper (it maps to itself again)
+        venues.append(c["venue"].map(conference_of))
+        years.append(c["year"])
+    if not keys:
+        return
+    keys = np.concatenate(keys)
+    # Last copy of a repeated paper id wins, as in the upsert; np.unique also sorts the keys
+    n = keys.size
+    keys, last = np.unique(keys[::-1], return_index=True)
+    last = n - 1 - last
+    venues, years = pd.concat(venues).iloc[last], pd.concat(years).iloc[last]
+    for c in table_chunks(publication_path(out_dir, "candidate_publications", fmt),
+                          ["candidate_id", "paper_id"], chunksize):
+        h = id_hashes(c["paper_id"])
+        pos = np.minimum(np.searchsorted(keys, h), max(keys.size - 1, 0))
+        hit = keys[pos] == h if keys.size else np.zeros(h.size, dtype=bool)
+        cand_id, paper_id, pos = c["candidate_id"][hit], c["paper_id"][hit], pos[hit]
+        yield id_hashes(cand_id + "|" + paper_id), cand_id, venues.iloc[pos].fillna(""), years.iloc[pos]
+
+def comparison_tables(out_dir, fmt="csv", chunksize=500000):
+    """The universityComparison.ts chart aggregates, from the candidates and publications in out_dir.
+
+    papers counts publication rows of a university's candidates per year: per matching venue
+    (university_conference_stats), once per research interest of the candidate
+    (university_topic_stats) and once per interest that maps to an emerging topic
+    (university_emerging_topic_stats) - what the page used to count in the browser.
+    Repeated publication ids count once and rows without a year are left out.
+    """
+    cands = pd.concat(table_chunks(os.path.join(out_dir, f"candidates.{fmt}"),
+                                   ["id", "university_id", "research_interests"], chunksize), ignore_index=True)
+    cand_index = pd.Index(cands["id"])
+    uni_code, uni_ids = pd.factorize(cands["university_id"])
+    # Candidates of one university with the same interests count alike: aggregate per profile
+    cands["research_interests"] = cands["research_interests"].fillna("")
+    profile = cands.groupby(["university_id", "research_interests"], sort=False).ngroup().to_numpy()
+    conf_code = {"": -1}
+
+    keys, slots, confs, years = [], [], [], []
+    for key, cand_id, venue, year in _publication_rows(out_dir, fmt, chunksize):
+        venue = venue.fillna("")
+        for v in pd.unique(venue):
+            if v not in conf_code:
+                c = conference_of(v)
+                conf_code[v] = -1 if c is None else CONFERENCES.index(c)
+        keys.append(key)
+        slots.append(cand_index.get_indexer(cand_id).astype(np.int32))
+        confs.append(venue.map(conf_code).to_numpy(np.int8))
+        years.append(pd.to_numeric(year, errors="coerce").to_numpy(np.float64))
+    if keys:
+        keys, slots, confs, years = map(np.concatenate, (keys, slots, confs, years))
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = np.zeros(keys.size, dtype=bool)
+        keep[keys.size - 1 - last] = True
+        keep &= (slots >= 0) & ~np.isnan(years)
+        slots, confs, years = slots[keep], confs[keep], years[keep].astype(np.int64)
+        del keys, keep
+    else:
+        slots, confs, years = np.zeros(0, np.int32), np.zeros(0, np.int8), np.zeros(0, np.int64)
+
+    def table(name, df, label):
+        df = df.groupby(["uni", label, "year"], sort=False)["papers"].sum().reset_index()
+        out = pd.DataFrame({
+            "university_id": uni_ids[df["uni"].to_numpy()],
+            COMPARISON_COLUMNS[name][1]: df[label].to_numpy(),
+            "year": df["year"].to_numpy(),
+            "papers": df["papers"].to_numpy(),
+        }, columns=COMPARISON_COLUMNS[name])
+        return out.sort_values(COMPARISON_COLUMNS[name][:3], ignore_index=True)
+
+    hit = confs >= 0
+    by_conf = pd.DataFrame({"uni": uni_code[slots[hit]], "conf": confs[hit], "year": years[hit]})
+    by_conf = by_conf.value_counts().rename("papers").reset_index()
+    by_conf["conf"] = np.array(CONFERENCES, dtype=object)[by_conf["conf"].to_numpy()]
+
+    # One row per (profile, interest); research_interests is "; "-joined like the TEXT[] load
+    first = np.unique(profile, return_index=True)[1]
+    interests = pd.Series(cands["research_interests"].to_numpy()[first]).str.split("; ").explode()
+    interests = interests[interests.fillna("") != ""]
+    profile_topics = pd.DataFrame({"profile": interests.index.to_numpy(), "topic": interests.to_numpy(),
+                                   "uni": uni_code[first][interests.index.to_numpy()]})
+    emerging = {t: emerging_topic_of(t) for t in pd.unique(profile_topics["topic"])}
+    profile_topics["emerging"] = profile_topics["topic"].map(emerging)
+    per_year = pd.DataFrame({"profile": profile[slots], "year": years}).value_counts().rename("papers")
+    by_topic = per_year.reset_index().merge(profile_topics, on="profile")
+
+    return {
+        "university_conference_stats": table("university_conference_stats", by_conf, "conf"),
+        "university_topic_stats": table("university_topic_stats", by_topic, "topic"),
+        "university_emerging_topic_stats": table("university_emerging_topic_stats",
+                                                 by_topic.dropna(subset=["emerging"]), "emerging"),
+    }
+
+def write_comparison_tables(out_dir, fmt="csv", chunksize=500000):
+    """comparison_tables() written next to the other tables; returns the row counts for RUN_SUMMARY.json."""
+    t0 = time.time()
+    tables = comparison_tables(out_dir, fmt, chunksize)
+    write_tables(out_dir, tables, fmt)
+    print(f"[COMPARE] {', '.join(f'{name} {len(df):,}' for name, df in tables.items())} rows "
+          f"in {time.time() - t0:.1f}s")
+    return {name: len(df) for name, df in tables.items()}
+
+def path_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+    return os.path.getsize(path)
+
+def publication_bytes(out_dir):
+    """Size of each publication table (CSV file or Parquet dataset) present in out_dir."""
+    return {f"{t}.{fmt}": path_bytes(publication_path(out_dir, t, fmt))
+            for t in PUB_TABLES for fmt in OUTPUT_FORMATS if os.path.exists(publication_path(out_dir, t, fmt))}
+
+def finalize(store, csr_map, alias_map, out_dir, region_map, resolver=None, run_ts=None, fmt="csv",
+             affiliation_hops=1, chunksize=500000):
+    """Write the derived tables, the comparison aggregates and RUN_SUMMARY.json; returns the per-slot
+    university names.
+
+    A SpillStore is merged and written batch by batch instead (see _finalize_spilled) and
+    returns None; it only supports affiliation_hops=1, since a batch sees only its own slots.
+    """
+    run_ts = run_ts or datetime.utcnow().isoformat()
+    resolver = resolver or ResolutionCache()
+    resolve = lambda co: fuzzy_match(co, csr_map, alias_map)
+    if isinstance(store, SpillStore):
+        uni_names, summary = None, _finalize_spilled(store, resolver, resolve, out_dir, region_map, run_ts, fmt)
+    else:
+        uni_names = infer_universities(store, resolver, resolve, hops=affiliation_hops)
+        tables = build_tables(store, uni_names, region_map, run_ts)
+        write_tables(out_dir, tables, fmt)
+        summary = {
+            "candidates": len(tables["candidates"]),
+            "universities": len(tables["universities"]),
+            "topics": len(tables["research_topics"]),
+            "candidate_topics": len(tables["candidate_topics"]),
+            "academic_metrics": len(tables["academic_metrics"]),
+            "affiliation": {"hops": affiliation_hops, "unknown_candidates": uni_names.count(UNKNOWN_UNIVERSITY)},
+        }
+    # Publications are re-read in pass2's chunks (its last, limit-sized one under --memory-limit),
+    # so this stays within what pass2 needed
+    if isinstance(store, SpillStore):
+        release_memory()
+        chunksize = min(chunksize, store.chunk_size)
+    summary.update(write_comparison_tables(out_dir, fmt, chunksize))
+    if "spill" in summary:
+        summary["spill"]["peak_rss"] = peak = peak_rss_bytes()
+        if peak > store.memory_limit:
+            print(f"[WARN] peak RSS {peak / 2**20:,.0f} MiB exceeded --memory-limit "
+                  f"{store.memory_limit / 2**20:,.0f} MiB; raise it")
 
     with open(os.path.join(out_dir, "RUN_SUMMARY.json"), "w") as f:
         json.dump({
-            "candidates": len(df_cand),
-            "universities": len(uni_rows),
-            "topics": len(topic_dict),
-            "generated_at": datetime.utcnow().isoformat()
+            **summary,
+            "publication_bytes": publication_bytes(out_dir),
+            "resolve_cache": resolver.summary(),
+            "generated_at": run_ts
         }, f, indent=2)
     print("[DONE] build_clean_dataset_chunked_v11.2_full.py finished successfully.")
+    return uni_names
+
+def _finalize_spilled(store, resolver, resolve, out_dir, region_map, run_ts, fmt):
+    """finalize() for a SpillStore: build_tables() per merged slot range, tables appended in slot order.
+
+    universities / research_topics keep first-use order across batches and academic_metrics
+    is re-aggregated from per-batch sums, so every table matches the in-memory build.
+    """
+    unis, topics, acc, n_batches, n_unknown, n_cand_topics = [], [], None, 0, 0, 0
+    with TableWriter(out_dir, "candidates", fmt) as cand_out, \
+         TableWriter(out_dir, "candidate_topics", fmt) as cand_topic_out:
+        for batch in store.batches():
+            uni_names = infer_universities(batch, resolver, resolve)
+            n_unknown += uni_names.count(UNKNOWN_UNIVERSITY)
+            tables = build_tables(batch, uni_names, region_map, run_ts)
+            df_cand = tables["candidates"]
+            cand_out.write(df_cand)
+            cand_topic_out.write(tables["candidate_topics"])
+            n_cand_topics += len(tables["candidate_topics"])
+            unis.append(tables["universities"])
+            topics.append(tables["research_topics"])
+            part = df_cand.groupby("university_id").agg(
+                publications_count=("id", "size"),
+                total_citations=("total_citations", "sum"),
+                h_index_sum=("h_index", "sum"),
+            )
+            acc = part if acc is None else pd.concat([acc, part]).groupby(level=0).sum()
+            n_batches += 1
+            del batch, tables, df_cand
+            release_memory()
+
+    agg = acc.reset_index()
+    agg["h_index_avg"] = agg["h_index_sum"] / agg["publications_count"]
+    df_uni = pd.concat(unis).drop_duplicates("id").reset_index(drop=True)
+    df_topics = pd.concat(topics).drop_duplicates("id").reset_index(drop=True)
+    df_metrics = metrics_table(agg, run_ts)
+    write_tables(out_dir, {"universities": df_uni, "academic_metrics": df_metrics, "research_topics": df_topics}, fmt)
+    print(f"[MERGE] {len(store.runs)} spill runs ({store.spill_bytes() / 2**20:,.1f} MiB) "
+          f"-> {n_batches} batches of <= {store.merge_budget / 2**20:,.0f} MiB")
+    return {
+        "candidates": len(store),
+        "universities": len(df_uni),
+        "topics": len(df_topics),
+        "candidate_topics": n_cand_topics,
+        "academic_metrics": len(df_metrics),
+        "affiliation": {"hops": 1, "unknown_candidates": n_unknown},
+        "spill": {"memory_limit": store.memory_limit, "runs": len(store.runs), "bytes": store.spill_bytes(),
+                  "batches": n_batches},
+    }
+
+# =============================================================
+# Incremental builds (--state-dir / --incremental)
+# =============================================================
+STATE_FORMAT = 1
+
+class BuildState:
+    """What an incremental build needs from the previous run, kept under --state-dir.
+
+    build_state.pkl holds the settings, every author's first publication year, the
+    candidate pool, the CandidateStore and each slot's university; seen_ids.npy is the
+    sorted id_hashes() of every paper already processed (the watermark). meta_mark.json
+    is the byte watermark of a plain --meta (meta_mark()); without it the next run finds
+    its rows by id.
+    """
+
+    def __init__(self, settings, author_first, pool, store, uni_names, seen, meta_mark=None):
+        self.settings = settings
+        self.author_first = author_first
+        self.pool = pool
+        self.store = store
+        self.uni_names = uni_names
+        self.seen = seen
+        self.meta_mark = meta_mark
+
+    @staticmethod
+    def settings_for(yrmin, yrmax, topics, pub_layout="denormalized", fmt="csv", affiliation_hops=1):
+        return {"format": STATE_FORMAT, "yrmin": yrmin, "yrmax": yrmax, "topics": list(topics.names),
+                "pub_layout": pub_layout, "output_format": fmt, "affiliation_hops": affiliation_hops}
+
+    @classmethod
+    def load(cls, state_dir):
+        with open(os.path.join(state_dir, "build_state.pkl"), "rb") as f:
+            settings, author_first, pool, store, uni_names = pickle.load(f)
+        if settings.get("format") != STATE_FORMAT:
+            raise SystemExit(f"[ERROR] {state_dir} was written by an incompatible build; run a full build")
+        seen = np.load(os.path.join(state_dir, "seen_ids.npy"))
+        mark = None
+        if os.path.exists(os.path.join(state_dir, "meta_mark.json")):
+            with open(os.path.join(state_dir, "meta_mark.json")) as f:
+                mark = json.load(f)
+        return cls(settings, author_first, pool, store, uni_names, seen, mark)
+
+    def save(self, state_dir):
+        os.makedirs(state_dir, exist_ok=True)
+        pkl, npy = os.path.join(state_dir, "build_state.pkl"), os.path.join(state_dir, "seen_ids.npy")
+        with open(pkl + ".tmp", "wb") as f:
+            pickle.dump((self.settings, self.author_first, self.pool, self.store, self.uni_names),
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(npy + ".tmp", "wb") as f:
+            np.save(f, self.seen)
+        # The byte watermark moves last: after a crash an older one only means re-reading seen rows
+        mark = os.path.join(state_dir, "meta_mark.json")
+        if os.path.exists(mark):
+            os.remove(mark)
+        os.replace(npy + ".tmp", npy)
+        os.replace(pkl + ".tmp", pkl)
+        if self.meta_mark is not None:
+            with open(mark + ".tmp", "w") as f:
+                json.dump(self.meta_mark, f)
+            os.replace(mark + ".tmp", mark)
+
+    def unseen(self, ids):
+        """Boolean mask of the ids not yet processed."""
+        h = id_hashes(ids)
+        if not self.seen.size:
+            return np.ones(len(h), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.seen, h), self.seen.size - 1)
+        return self.seen[pos] != h
+
+META_BLOCK = 1 << 22  # bytes of whole records parsed at a time by the incremental scans
+META_PROBE = 1 << 16  # bytes before the byte watermark that must be unchanged to trust it
+
+def meta_mark(meta_path):
+    """Byte watermark of a plain metadata CSV: {"size", "probe"}; None for .gz/.zst (not seekable).
+
+    The next --incremental run reads only past "size" as long as the META_PROBE bytes before it
+    still hash to "probe", i.e. new papers were appended as whole records.
+    """
+    if codec_of(meta_path):
+        return None
+    size = os.path.getsize(meta_path)
+    return {"size": size, "probe": _meta_probe(meta_path, size)}
+
+def _meta_probe(meta_path, end):
+    with open(meta_path, "rb") as f:
+        f.seek(max(0, end - META_PROBE))
+        return hashlib.sha256(f.read(min(end, META_PROBE))).hexdigest()
+
+def meta_prefix_unchanged(meta_path, mark):
+    return (mark is not None and not codec_of(meta_path) and os.path.getsize(meta_path) >= mark["size"]
+            and _meta_probe(meta_path, mark["size"]) == mark["probe"])
+
+def meta_blocks(meta_path, start=None, end=None, block=META_BLOCK):
+    """(offset, bytes) blocks of whole records from the data section of meta_path.
+
+    start/end bound a plain file to a byte range; a compressed file is always read whole and
+    offsets count decompressed bytes. read_meta_blocks() re-reads blocks by offset.
+    """
+    if codec_of(meta_path):
+        with open_input(meta_path) as src:
+            pos = len(src.readline())
+            for data in record_blocks(src, block):
+                yield pos, data
+                pos += len(data)
+        return
+    with open(meta_path, "rb") as f:
+        data_start = len(f.readline())
+    pos = data_start if start is None else max(start, data_start)
+    end = os.path.getsize(meta_path) if end is None else end
+    with io.BufferedReader(_ByteRange(meta_path, pos, end)) as src:
+        for data in record_blocks(src, block):
+            yield pos, data
+            pos += len(data)
+
+def read_meta_blocks(meta_path, spans, names):
+    """All columns of the blocks at spans [(offset, length)] from meta_blocks(), in order."""
+    if not spans:
+        return
+    if codec_of(meta_path):
+        wanted, last = dict(spans), spans[-1][0]
+        for pos, data in meta_blocks(meta_path):
+            if pos in wanted:
+                yield parse_meta_block(data, names)
+            if pos >= last:
+                return
+        return
+    with open(meta_path, "rb") as f:
+        for pos, n in spans:
+            f.seek(pos)
+            yield parse_meta_block(f.read(n), names)
+
+def parse_meta_block(data, names, usecols=None):
+    """DataFrame of one meta_blocks() block (lower-cased column names), optionally only some columns."""
+    keep = names if usecols is None else [c for c in names if c.lower().strip() in usecols]
+    try:
+        chunk = pd.read_csv(io.BytesIO(data), names=names, header=None, usecols=keep,
+                            dtype=meta_dtypes(names), low_memory=False)
+    except pd.errors.EmptyDataError:  # only blank lines
+        chunk = pd.DataFrame(columns=keep)
+    chunk.columns = [c.lower().strip() for c in chunk.columns]
+    return chunk
+
+def _meta_ids(chunk):
+    return chunk["id"] if "id" in chunk.columns else pd.Series("", index=chunk.index)
+
+def rows_with_authors(chunk, authors):
+    """Boolean mask of the rows listing any of the (normalized) authors."""
+    if "author" not in chunk.columns or not len(chunk):
+        return np.zeros(len(chunk), dtype=bool)
+    names = chunk["author"].fillna("").str.split(";").explode().str.strip()
+    names = names[names.str.len() > 0]
+    hit = names.index[normalize_name_series(names).isin(authors).to_numpy()]
+    return chunk.index.isin(hit)
+
+def rescan_authors(meta_path, names, authors, state, store, run_ts, topics, end=None):
+    """Aggregate the already processed rows of `authors` (authors that just entered the pool), return their rows.
+
+    Reads only id/author of the processed rows (the bytes before `end` when the byte watermark holds),
+    then all columns of just the blocks that list one of the authors.
+    """
+    spans, hits = [], []
+    for pos, data in meta_blocks(meta_path, None, end):
+        chunk = parse_meta_block(data, names, {"id", "author"})
+        hit = np.flatnonzero(rows_with_authors(chunk, authors) & ~state.unseen(_meta_ids(chunk)))
+        if len(hit):
+            spans.append((pos, len(data)))
+            hits.append(hit)
+    rows = []
+    for chunk, hit in zip(read_meta_blocks(meta_path, spans, names), hits):
+        # Same bytes, same rows: keep the narrow scan's matches. Only these authors are aggregated,
+        # everyone else in the pool already has these papers
+        rows += _pass2_chunk(chunk.iloc[hit], authors, store, run_ts, topics)
+    return rows
+
+def _drop_rows(path, col, values):
+    """Rewrite a publication table (CSV or Parquet) without the rows whose `col` is in `values`."""
+    if os.path.isdir(path):
+        filter_parquet(path, col, values)
+        return
+    tmp = path + ".tmp"
+    with io.TextIOWrapper(open_input(path), newline="") as src, OutputFile(tmp, codec=codec_of(path)) as dst:
+        reader, writer = csv.reader(src), csv.writer(dst, quoting=csv.QUOTE_ALL)
+        header = next(reader)
+        i = header.index(col)
+        writer.writerow(header)
+        writer.writerows(row for row in reader if row[i] not in values)
+    os.replace(tmp, path)
+
+def _drop_candidates(paths, cand_ids, chunksize):
+    """Remove the given candidates' rows from the publication tables {table: path}.
+
+    A paper is kept only while some candidate_publications row links to it, as in a full
+    build; papers left without a link are dropped too.
+    """
+    for table in ("publications", "candidate_publications"):
+        if table in paths:
+            _drop_rows(paths[table], "candidate_id", cand_ids)
+    if "papers" in paths:
+        linked = set()
+        for chunk in table_chunks(paths["candidate_publications"], ["paper_id"], chunksize):
+            linked.update(chunk["paper_id"])
+        orphans = set()
+        for chunk in table_chunks(paths["papers"], ["id"], chunksize):
+            orphans.update(chunk["id"][~chunk["id"].isin(linked)])
+        if orphans:
+            _drop_rows(paths["papers"], "id", orphans)
+
+def run_incremental(meta, csr, alias_json, region_json, out_dir, chunksize, state_dir, snapshot=False,
+                    resolve_cache="default", csrank_index=None, topic_taxonomy=None):
+    """Fold only the papers past the watermark into the saved state and emit delta CSVs.
+
+    Deltas go to <out-dir>/deltas/<timestamp>/: new publications, new/changed candidates and
+    their candidate_topics (replace semantics), academic_metrics/universities for affected
+    universities, research_topics, and removed_candidates.csv for candidates whose first year
+    moved out of the window. publications.csv in out-dir gets the new rows appended; the other
+    full tables, including the comparison aggregates, are rewritten only with --snapshot.
+
+    When --meta is the previous file with papers appended, only the bytes past its byte
+    watermark are read; otherwise (a delta-only file, a rewrite, .gz/.zst) the id column is
+    read first and all columns only of the blocks holding new ids. Authors that enter the pool
+    with papers already processed get those papers re-read (rescan_authors()).
+    """
+    run_ts = datetime.utcnow().isoformat()
+    state = BuildState.load(state_dir)
+    yrmin, yrmax = state.settings["yrmin"], state.settings["yrmax"]
+    topics = TopicClassifier(load_topic_taxonomy(topic_taxonomy)) if topic_taxonomy else TOPICS
+    if list(topics.names) != state.settings["topics"]:
+        raise SystemExit("[ERROR] topic taxonomy differs from the saved state; run a full build")
+    if resolve_cache == "default":
+        resolve_cache = os.path.join(out_dir, "resolve_cache.sqlite")
+    if resolve_cache:
+        resolver = ResolutionCache(resolve_cache, f"{sources_digest(csr, alias_json)}:v{RESOLVER_VERSION}")
+    else:
+        resolver = ResolutionCache()
+    alias_map = AliasMatcher(load_alias_map(alias_json))
+    csr_map = CsrIndex.load(csr, csrank_index)
+    region_map = load_region_map(region_json)
+    store, pool, author_first = state.store, state.pool, state.author_first
+
+    # Where the new rows are: past the byte watermark of an appended plain file, else found by id
+    header = read_meta_header(meta)
+    start = state.meta_mark["size"] if meta_prefix_unchanged(meta, state.meta_mark) else None
+    mark = meta_mark(meta)
+    end = mark["size"] if mark else None
+    if start is None:
+        print("[INFO] no usable byte watermark for --meta; scanning ids for new rows")
+
+    # Delta pass 1: first years of the new rows (id/author/pub_date only), then pool entries/exits
+    before, new_hashes, spans, n_old = {}, [], [], 0
+    for pos, data in meta_blocks(meta, start, end):
+        chunk = parse_meta_block(data, header, {"id", "author", "pub_date"})
+        mask = state.unseen(_meta_ids(chunk))
+        n_old += int((~mask).sum())
+        if not mask.any():
+            continue
+        spans.append((pos, len(data)))
+        chunk = chunk[mask]
+        if "id" in chunk.columns:
+            new_hashes.append(id_hashes(chunk["id"]))
+        if "author" not in chunk.columns or "pub_date" not in chunk.columns:
+            continue
+        mins = chunk_first_years(chunk)
+        for a in mins.index:
+            if a not in before:
+                before[a] = author_first.get(a)
+        merge_first_years(author_first, mins)
+    entered, left, stale = [], [], []
+    for a, prev in before.items():
+        was_in, is_in = a in pool, yrmin <= author_first[a] <= yrmax
+        if is_in and not was_in:
+            pool.add(a)
+            entered.append(a)
+            if prev is not None:
+                stale.append(a)  # earlier papers fell outside the old pool and were never aggregated
+        elif was_in and not is_in:
+            pool.discard(a)
+            left.append(a)
+    if stale and start is None and n_old < state.seen.size:
+        # Their earlier papers must be re-read; a delta-only --meta doesn't have them
+        raise SystemExit(f"[ERROR] {len(stale):,} authors entered the pool with papers processed earlier, but "
+                         f"--meta holds only {n_old:,} of the {state.seen.size:,} processed rows; pass the "
+                         f"full metadata file (old rows + new) or run a full build")
+
+    # Aggregate re-read history, then the new rows; publications go to the delta and the cumulative file
+    delta_dir = os.path.join(out_dir, "deltas", run_ts.replace(":", "").replace("-", ""))
+    os.makedirs(delta_dir, exist_ok=True)
+    old_n = len(store)
+    old_lens = np.fromiter((len(c) for c in store.cit), dtype=np.int64, count=old_n)
+    n_rows = n_pubs = n_rescanned = 0
+    pub_layout = state.settings.get("pub_layout", "denormalized")
+    fmt = state.settings.get("output_format", "csv")
+    cum_paths = [publication_path(out_dir, t, fmt) for t in PUB_LAYOUTS[pub_layout]]
+    if fmt == "parquet":
+        # New files join the existing datasets under a per-run prefix
+        cum_args = {"part": delta_dir.rsplit(os.sep, 1)[-1]}
+    else:
+        cum_args = {"offsets": {t: os.path.getsize(p) for t, p in zip(PUB_LAYOUTS[pub_layout], cum_paths)}}
+    with PublicationWriter(delta_dir, pub_layout, fmt=fmt) as delta_w, \
+            PublicationWriter(out_dir, pub_layout, fmt=fmt, **cum_args) as cum_w:
+        if stale:
+            # Before the new rows, so each author's papers are aggregated in file order as in a full build
+            rows = rescan_authors(meta, header, set(stale), state, store, run_ts, topics, start)
+            if "papers" in cum_w.paths:
+                # Papers another candidate already brought in stay single rows in the full table
+                wanted = {r[0] for r in rows}
+                for chunk in table_chunks(cum_w.paths["papers"], ["id"], chunksize):
+                    cum_w.seen.update(wanted.intersection(chunk["id"]))
+            delta_w.write(rows)
+            cum_w.write(rows)
+            n_rescanned = len(rows)
+            n_pubs += len(rows)
+        # Delta pass 2: all columns, but only of the blocks that hold new rows
+        for chunk in read_meta_blocks(meta, spans, header):
+            chunk = chunk[state.unseen(_meta_ids(chunk))]
+            rows = _pass2_chunk(chunk, pool, store, run_ts, topics)
+            delta_w.write(rows)
+            cum_w.write(rows)
+            n_rows += len(chunk)
+            n_pubs += len(rows)
+
+    lens = np.fromiter((len(c) for c in store.cit), dtype=np.int64, count=len(store))
+    changed = np.flatnonzero(np.r_[lens[:old_n] != old_lens, np.ones(len(store) - old_n, dtype=bool)])
+    names = store.author_names
+    active = np.fromiter((names[aid] in pool for aid in store.slot_author), dtype=bool, count=len(store))
+
+    resolve = lambda co: fuzzy_match(co, csr_map, alias_map)
+    hops = state.settings.get("affiliation_hops", 1)
+    if hops > 1:
+        # Propagated affiliations can move for candidates whose own papers did not change
+        unis = infer_universities(store, resolver, resolve, hops=hops, active=active)
+        relabeled = np.flatnonzero([unis[i] != state.uni_names[i] for i in range(old_n)])
+        changed = np.union1d(changed, relabeled)
+    else:
+        unis = dict(zip(changed.tolist(), infer_universities(store, resolver, resolve, changed.tolist())))
+    old_unis = {state.uni_names[i] for i in changed if i < old_n}
+    state.uni_names.extend([None] * (len(store) - old_n))
+    for slot in changed.tolist():
+        state.uni_names[slot] = unis[slot]
+    tables = build_tables(store, state.uni_names, region_map, run_ts, active)
+
+    cand_ids = store.candidate_ids()
+    changed_ids = {cand_ids[i] for i in changed if active[i]}
+    removed_ids = sorted({cand_ids[store.slot_of[store.author_ids[a]]] for a in left
+                          if store.author_ids.get(a) in store.slot_of})
+    old_unis.update(state.uni_names[store.slot_of[store.author_ids[a]]] for a in left
+                    if store.author_ids.get(a) in store.slot_of)
+    cands = tables["candidates"]
+    cands = cands[cands["id"].isin(changed_ids)]
+    uni_ids = set(cands["university_id"]) | {stable_uuid("university", u) for u in old_unis}
+    write_tables(delta_dir, fmt=fmt, tables={
+        "candidates": cands,
+        "universities": tables["universities"][tables["universities"]["id"].isin(uni_ids)],
+        "academic_metrics": tables["academic_metrics"][tables["academic_metrics"]["university_id"].isin(uni_ids)],
+        "research_topics": tables["research_topics"],
+        "candidate_topics": tables["candidate_topics"][tables["candidate_topics"]["candidate_id"].isin(changed_ids)],
+        "removed_candidates": pd.DataFrame({"id": removed_ids}, columns=["id"]),
+    })
+    if stale:
+        print(f"[RESCAN] {len(stale):,} authors entered the pool with earlier papers: "
+              f"{n_rescanned:,} publications re-read from already processed rows")
+    summary = {
+        "mode": "delta",
+        "new_rows": n_rows,
+        "new_publications": n_pubs,
+        "changed_candidates": len(changed_ids),
+        "new_candidates": len(entered),
+        "removed_candidates": len(removed_ids),
+        "rescanned_candidates": len(stale),
+        "rescanned_publications": n_rescanned,
+        "resolve_cache": resolver.summary(),
+        "generated_at": run_ts,
+    }
+    with open(os.path.join(delta_dir, "RUN_SUMMARY.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    if snapshot:
+        write_tables(out_dir, tables, fmt)
+        inactive = {cand_ids[i] for i in np.flatnonzero(~active)}
+        if inactive:
+            _drop_candidates(dict(zip(PUB_LAYOUTS[pub_layout], cum_paths)), inactive, chunksize)
+        with open(os.path.join(out_dir, "RUN_SUMMARY.json"), "w") as f:
+            json.dump({
+                "candidates": len(tables["candidates"]),
+                "universities": len(tables["universities"]),
+                "topics": len(tables["research_topics"]),
+                "candidate_topics": len(tables["candidate_topics"]),
+                "academic_metrics": len(tables["academic_metrics"]),
+                **write_comparison_tables(out_dir, fmt, chunksize),
+                "publication_bytes": publication_bytes(out_dir),
+                "resolve_cache": resolver.summary(),
+                "generated_at": run_ts
+            }, f, indent=2)
+
+    if new_hashes:
+        state.seen = np.union1d(state.seen, np.concatenate(new_hashes))
+    state.meta_mark = mark
+    state.save(state_dir)
+    resolver.save()
+    print(f"[DELTA] {n_rows:,} new rows -> {n_pubs:,} publications, {len(changed_ids):,} changed and "
+          f"{len(removed_ids):,} removed candidates in {delta_dir}")
 
 # =============================================================
 # Entry
 # =============================================================
-def run(meta, csr, alias_json, region_json, out_dir, chunksize, yrmin, yrmax):
+def run(meta, csr, alias_json, region_json, out_dir, chunksize, yrmin, yrmax, pass1_mode="vectorized",
+        workers=1, resolve_cache="default", csrank_index=None, topic_taxonomy=None,
+        checkpoint_every=20, resume=False, state_dir=None, pub_layout="denormalized", fmt="csv",
+        memory_limit=None, spill_dir=None, affiliation_hops=1):
     os.makedirs(out_dir, exist_ok=True)
-    alias_map = load_alias_map(alias_json)
-    csr_map = load_csranks_map(csr)
+    if resolve_cache == "default":
+        resolve_cache = os.path.join(out_dir, "resolve_cache.sqlite")
+    if resolve_cache:
+        resolver = ResolutionCache(resolve_cache, f"{sources_digest(csr, alias_json)}:v{RESOLVER_VERSION}")
+    else:
+        resolver = ResolutionCache()
+    alias_map = AliasMatcher(load_alias_map(alias_json))
+    csr_map = CsrIndex.load(csr, csrank_index)
     region_map = load_region_map(region_json)
-    pool = pass1(meta, chunksize, yrmin, yrmax)
-    per_cand = pass2(meta, chunksize, pool, out_dir)
-    finalize(per_cand, csr_map, alias_map, out_dir, region_map)
+    topics = TopicClassifier(load_topic_taxonomy(topic_taxonomy)) if topic_taxonomy else TOPICS
+
+    checkpoint = None
+    if checkpoint_every:
+        checkpoint = Checkpoint(out_dir, run_fingerprint(meta, chunksize, yrmin, yrmax, pass1_mode,
+                                                         workers, topics, pub_layout, fmt, memory_limit),
+                                checkpoint_every)
+        if not resume:
+            checkpoint.clear()
+    state = checkpoint.load("run") if checkpoint else None
+    if state and (not state_dir or "author_first" in state):
+        pool, run_ts = state["pool"], state["run_ts"]
+        author_first, seen, mark = state.get("author_first"), state.get("seen"), state.get("meta_mark")
+        print(f"[RESUME] pass1 pool from checkpoint ({len(pool):,} authors)")
+    else:
+        author_first = seen = mark = None
+        if state_dir:
+            # Taken before reading: rows appended meanwhile are past it, and filtered by id if already seen
+            mark = meta_mark(meta)
+            seen = []
+            author_first = author_first_years(meta, chunksize, seen)
+            seen = np.unique(np.concatenate(seen)) if seen else np.zeros(0, np.uint64)
+            pool = pool_from_first_years(author_first, yrmin, yrmax)
+        elif pass1_mode == "rows":
+            pool = pass1(meta, chunksize, yrmin, yrmax)
+        else:
+            pool = pass1_vectorized(meta, chunksize, yrmin, yrmax)
+        run_ts = datetime.utcnow().isoformat()
+        if checkpoint:
+            payload = {"pool": pool, "run_ts": run_ts}
+            if state_dir:
+                payload.update(author_first=author_first, seen=seen, meta_mark=mark)
+            checkpoint.save("run", payload)
+    if workers > 1:
+        per_cand = pass2_parallel(meta, chunksize, pool, out_dir, workers, run_ts, topics, checkpoint,
+                                  pub_layout, fmt)
+    elif memory_limit:
+        # Run files referenced by a pass2 checkpoint are reused on --resume
+        spill_dir = spill_dir or os.path.join(out_dir, ".spill")
+        if not (checkpoint and "pass2" in checkpoint.names()):
+            shutil.rmtree(spill_dir, ignore_errors=True)
+        per_cand = pass2(meta, chunksize, pool, out_dir, run_ts, topics, checkpoint, pub_layout, fmt,
+                         SpillStore(spill_dir, memory_limit, topics.names))
+    else:
+        per_cand = pass2(meta, chunksize, pool, out_dir, run_ts, topics, checkpoint, pub_layout, fmt)
+    uni_names = finalize(per_cand, csr_map, alias_map, out_dir, region_map, resolver, run_ts, fmt,
+                         affiliation_hops, chunksize)
+    resolver.save()
+    if memory_limit:
+        per_cand.cleanup()
+    if state_dir:
+        BuildState(BuildState.settings_for(yrmin, yrmax, topics, pub_layout, fmt, affiliation_hops),
+                   author_first, set(pool), per_cand, uni_names, seen, mark).save(state_dir)
+    if checkpoint:
+        checkpoint.clear()
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
@@ -318,6 +2927,59 @@ if __name__ == "__main__":
     ap.add_argument("--chunksize", type=int, default=500000)
     ap.add_argument("--student-first-year-min", type=int, default=2017)
     ap.add_argument("--student-first-year-max", type=int, default=2022)
+    ap.add_argument("--pass1-mode", choices=["vectorized", "rows"], default="vectorized")
+    ap.add_argument("--workers", type=int, default=1, help="pass2 worker processes")
+    ap.add_argument("--resolve-cache", default="default",
+                    help="coauthor->university cache file (default: <out-dir>/resolve_cache.sqlite)")
+    ap.add_argument("--no-resolve-cache", action="store_const", const=None, dest="resolve_cache")
+    ap.add_argument("--csrank-index", help="compiled CSRankings index (default: <csrank>.idx)")
+    ap.add_argument("--topic-taxonomy", help="JSON {topic: [keywords]} replacing TOPIC_KEYWORDS")
+    ap.add_argument("--checkpoint-every", type=int, default=20,
+                    help="checkpoint pass2 every N chunks (0 disables checkpoints)")
+    ap.add_argument("--resume", action="store_true", help="continue from <out-dir>/.checkpoint")
+    ap.add_argument("--pub-layout", choices=sorted(PUB_LAYOUTS), default="denormalized",
+                    help="publications.csv per (paper, candidate), and/or papers.csv + candidate_publications.csv")
+    ap.add_argument("--format", choices=["csv", "parquet"], default="csv", dest="fmt",
+                    help="output tables as QUOTE_ALL CSV or typed Parquet (publications partitioned by year)")
+    ap.add_argument("--compress", choices=["gz", "zst"],
+                    help="write the CSV tables as <table>.csv.gz / .csv.zst (multithreaded)")
+    ap.add_argument("--compress-threads", type=int, default=COMPRESS_THREADS,
+                    help="compression threads per output file (default: all cores)")
+    ap.add_argument("--memory-limit", type=parse_size,
+                    help="spill pass2 per-candidate state to sorted runs on disk and merge them in finalize "
+                         "and shrink pass2 chunks below --chunksize so peak RSS stays under this size, e.g. 4G "
+                         "(pool and name->slot map stay in RAM)")
+    ap.add_argument("--spill-dir", help="run files for --memory-limit (default: <out-dir>/.spill; use local disk)")
+    ap.add_argument("--affiliation-hops", type=int, default=1,
+                    help="label-propagation rounds for university inference: 1 = coauthors' resolved "
+                         "affiliations only; 2+ also lets still-unknown candidates inherit from coauthors "
+                         "that are candidates with an inferred university")
+    ap.add_argument("--state-dir", help="save (full build) or load (--incremental) incremental-build state")
+    ap.add_argument("--incremental", action="store_true",
+                    help="process only --meta rows not seen by the run that wrote --state-dir")
+    ap.add_argument("--snapshot", action="store_true",
+                    help="with --incremental, also rewrite the full tables in --out-dir")
     args = ap.parse_args()
-    run(args.meta, args.csrank, args.alias, args.region, args.out_dir, args.chunksize,
-        args.student_first_year_min, args.student_first_year_max)
+    if args.compress:
+        if args.fmt == "parquet":
+            ap.error("--compress applies to --format csv (Parquet pages are already zstd-compressed)")
+        args.fmt = f"{args.fmt}.{args.compress}"
+    COMPRESS_THREADS = max(1, args.compress_threads)
+    if args.memory_limit and (args.workers > 1 or args.state_dir or args.incremental):
+        ap.error("--memory-limit runs pass2 in-process; it cannot be combined with --workers > 1 or --state-dir")
+    if args.affiliation_hops < 1:
+        ap.error("--affiliation-hops must be >= 1")
+    if args.memory_limit and args.affiliation_hops > 1:
+        ap.error("--affiliation-hops > 1 needs the whole coauthor graph in memory; drop --memory-limit")
+    if args.incremental:
+        if not args.state_dir:
+            ap.error("--incremental requires --state-dir")
+        run_incremental(args.meta, args.csrank, args.alias, args.region, args.out_dir, args.chunksize,
+                        args.state_dir, args.snapshot, args.resolve_cache, args.csrank_index,
+                        args.topic_taxonomy)
+    else:
+        run(args.meta, args.csrank, args.alias, args.region, args.out_dir, args.chunksize,
+            args.student_first_year_min, args.student_first_year_max, args.pass1_mode, args.workers,
+            args.resolve_cache, args.csrank_index, args.topic_taxonomy, args.checkpoint_every,
+            args.resume, args.state_dir, args.pub_layout, args.fmt, args.memory_limit, args.spill_dir,
+            args.affiliation_hops)
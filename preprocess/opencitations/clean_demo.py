@@ -1,90 +1,240 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-sample_meta_large_v2.py
+sample_meta_large_v3.py
 --------------------------------
 针对亿级 OpenAlex CSV 优化：
-✅ 不再因零样本提前结束
-✅ 完全流式读取，支持超大文件
-✅ 优先取 citation_count > 0，不足则补零
+✅ 单遍流式读取全文件，内存只与目标样本量有关（不再提前结束、不再偏向文件开头）
+✅ 按 citation 分桶 × 发表年份分层抽样，配额可配置（--quotas JSON）
+✅ 分层蓄水池（bottom-k 随机键），同一 seed 结果可复现，与 chunksize 无关
+✅ 某层不足配额时从全局蓄水池补齐（默认：优先 citation_count > 0，不足则补零）
+✅ 一遍抽出多个嵌套样本（demo ⊂ 10k ⊂ 100k ⊂ 1M）
 ✅ 带详细日志打印
+✅ 输入/输出可直接是 .gz / .zst（按后缀流式解压；.zst 输出多线程压缩）
 """
 
-import pandas as pd
+import argparse
+import json
+from collections import Counter
 from datetime import datetime
 
-def sample_meta(in_path, out_path_demo, out_path_full, target_demo=100, target_full=10000, chunksize=200000):
-    print(f"[{datetime.now().isoformat()}] 🚀 开始抽样：{in_path}")
-    print(f"  - 每块读取 {chunksize:,} 行")
-    print(f"  - demo 样本 {target_demo} 行，完整样本 {target_full} 行")
+import numpy as np
+import pandas as pd
+
+# 默认配额：只按 citation 分层，全部配给 citation_count > 0；不足部分由全局蓄水池补（多为零引用）
+DEFAULT_QUOTAS = {"citations": {"1+": 1.0}}
+DEFAULT_CITATION_BUCKETS = (0, 1)
+UNKNOWN = "unknown"
+
+def write_csv(df, path):
+    # .zst 交给 zstd 多线程压缩（threads=-1：全部核心）；.gz / .csv 由 pandas 按后缀推断
+    compression = {"method": "zstd", "threads": -1} if path.endswith(".zst") else "infer"
+    df.to_csv(path, index=False, compression=compression)
+
+def citation_labels(bounds):
+    """分桶下界 (0, 1, 10, 100) → ["0", "1-9", "10-99", "100+"]"""
+    labels = []
+    for lo, hi in zip(bounds, list(bounds[1:]) + [None]):
+        labels.append(f"{lo}+" if hi is None else str(lo) if hi - lo == 1 else f"{lo}-{hi - 1}")
+    return labels
+
+def citation_bucket(citations, bounds):
+    labels = np.array(citation_labels(bounds) + [UNKNOWN], dtype=object)
+    idx = np.searchsorted(np.asarray(bounds), citations.to_numpy(dtype=float), side="right") - 1
+    idx[citations.isna().to_numpy() | (idx < 0)] = len(bounds)
+    return pd.Series(labels[idx], index=citations.index)
+
+def year_bucket(pub_date, width):
+    year = pd.to_numeric(pub_date.str.extract(r"((?:19|20)\d{2})", expand=False), errors="coerce")
+    start = (year // width) * width
+    label = start.astype("Int64").astype(str) if width == 1 else \
+        start.astype("Int64").astype(str) + "-" + (start + width - 1).astype("Int64").astype(str)
+    return label.where(year.notna(), UNKNOWN)
+
+def year_label_ok(label, width):
+    """label 是否可能由 year_bucket(…, width) 产生："2019"（width=1）或 "2015-2019"（起点对齐 width）。"""
+    if label == UNKNOWN:
+        return True
+    parts = label.split("-")
+    if not all(p.isdigit() and len(p) == 4 and p[:2] in ("19", "20") for p in parts):
+        return False
+    if width == 1:
+        return len(parts) == 1
+    return len(parts) == 2 and int(parts[0]) % width == 0 and int(parts[1]) == int(parts[0]) + width - 1
+
+def check_quotas(quotas, citation_buckets=DEFAULT_CITATION_BUCKETS, year_width=5):
+    """配额里的维度 / 分层名必须是 citation_bucket、year_bucket 会产生的标签，否则该层永远为空，名额被悄悄补给别层。"""
+    dims = set(quotas) - {"citations", "years"}
+    if dims:
+        raise ValueError(f"未知的配额维度 {sorted(dims)}，只支持 citations / years")
+    labels = set(citation_labels(citation_buckets)) | {UNKNOWN}
+    bad = sorted(k for k in quotas.get("citations", {}) if k not in labels)
+    if bad:
+        raise ValueError(f"citation 配额 {bad} 不在分桶 {citation_labels(citation_buckets)} 中")
+    bad = sorted(k for k in quotas.get("years", {}) if not year_label_ok(k, year_width))
+    if bad:
+        start = 2020 // year_width * year_width
+        example = str(start) if year_width == 1 else f"{start}-{start + year_width - 1}"
+        raise ValueError(f"years 配额 {bad} 不是 --year-width={year_width} 的分桶（应形如 {example!r} 或 {UNKNOWN!r}）")
+
+def allocate(quotas, target, citation_buckets=DEFAULT_CITATION_BUCKETS, year_width=5):
+    """各维配额（比例）相乘得到每层名额，最大余数法取整，总和 = target。未知的配额键抛 ValueError。"""
+    check_quotas(quotas, citation_buckets, year_width)
+    dims = [d for d in ("citations", "years") if quotas.get(d)]
+    cells = [((), 1.0)]
+    for d in dims:
+        total = sum(quotas[d].values())
+        cells = [(key + (label,), share * w / total) for key, share in cells for label, w in quotas[d].items() if w > 0]
+    exact = {"|".join(key): share * target for key, share in cells}
+    caps = {k: int(v) for k, v in exact.items()}
+    for k in sorted(exact, key=lambda k: caps[k] - exact[k])[:target - sum(caps.values())]:
+        caps[k] += 1
+    return dims, {k: v for k, v in caps.items() if v > 0}
+
+class StratifiedReservoir:
+    """分层 bottom-k 蓄水池：每行取一个随机键，每层只保留键最小的 cap 行。
+
+    键最小的 k 行就是该层的等概率无放回样本，且更小目标量的样本是它的子集，所以一遍
+    即可得到嵌套的 demo/10k/100k 样本。另保留全局键最小的 target 行，用于补齐不足配额的层。
+    内存上限约 2 × target 行。
+    """
+
+    def __init__(self, caps, target, seed=42):
+        self.caps, self.target = pd.Series(caps, dtype="int64"), target
+        self.rng = np.random.default_rng(seed)
+        self.kept = self.backfill = None
+        self.rows, self.seen = 0, Counter()
+
+    @staticmethod
+    def _bottom(df, caps=None, k=None):
+        df = df.sort_values("_key", kind="stable")
+        if caps is None:
+            return df.head(k)
+        return df[df.groupby("_stratum", sort=False).cumcount().to_numpy() < df["_stratum"].map(caps).to_numpy()]
+
+    def offer(self, chunk, strata):
+        # 键按行顺序从同一随机流取，结果只取决于 seed，与分块大小无关
+        n = len(chunk)
+        chunk = chunk.assign(_stratum=strata.to_numpy(), _key=self.rng.random(n),
+                             _row=np.arange(self.rows, self.rows + n))
+        self.rows += n
+        self.seen.update(chunk["_stratum"].tolist())
+
+        cand = chunk[chunk["_stratum"].isin(self.caps.index)]
+        if self.kept is not None:
+            # 已满的层只接受比当前第 cap 小的键
+            counts = self.kept["_stratum"].value_counts()
+            full = counts[counts >= self.caps.reindex(counts.index)].index
+            thr = self.kept[self.kept["_stratum"].isin(full)].groupby("_stratum")["_key"].max()
+            cand = cand[cand["_key"].to_numpy() < cand["_stratum"].map(thr).fillna(1.0).to_numpy()]
+            cand = pd.concat([self.kept, cand])
+        self.kept = self._bottom(cand, self.caps)
+
+        back = chunk
+        if self.backfill is not None:
+            if len(self.backfill) >= self.target:
+                back = back[back["_key"] < self.backfill["_key"].iloc[-1]]
+            back = pd.concat([self.backfill, back])
+        self.backfill = self._bottom(back, k=self.target)
+
+    def sample(self, caps, target):
+        """按给定名额取样（名额不超过构造时的 caps），不足部分用全局键最小的其它行补齐。"""
+        picked = self._bottom(self.kept, pd.Series(caps, dtype="int64")) if self.kept is not None else None
+        n = 0 if picked is None else len(picked)
+        if n < target and self.backfill is not None:
+            rest = self.backfill if picked is None else self.backfill[~self.backfill["_row"].isin(picked["_row"])]
+            picked = pd.concat([picked, rest.head(target - n)])
+        if picked is None:
+            return pd.DataFrame()
+        return picked.sort_values("_row")
+
+def sample_meta(in_path, out_path_demo, out_path_full, target_demo=100, target_full=10000, chunksize=200000,
+                seed=42, quotas=None, citation_buckets=DEFAULT_CITATION_BUCKETS, year_width=5, extra=None):
+    quotas = quotas or DEFAULT_QUOTAS
+    extra = dict(extra or {})
+    target_max = max([target_full, target_demo] + list(extra))
+    dims, caps = allocate(quotas, target_max, citation_buckets, year_width)
 
-    samples_nonzero, samples_zero = [], []
-    total_rows, total_nonzero, total_zero = 0, 0, 0
+    print(f"[{datetime.now().isoformat()}] 🚀 开始抽样：{in_path}")
+    print(f"  - 每块读取 {chunksize:,} 行，seed={seed}")
+    print(f"  - demo 样本 {target_demo} 行，完整样本 {target_full} 行" +
+          (f"，另有 {', '.join(f'{k:,}' for k in sorted(extra))} 行" if extra else ""))
+    print(f"  - 分层维度：{', '.join(dims) or '无'}；{len(caps)} 个有配额的层")
 
-    # 分块读取大文件
+    res = StratifiedReservoir(caps, target_max, seed)
     for chunk_idx, chunk in enumerate(pd.read_csv(in_path, chunksize=chunksize, dtype=str, low_memory=False)):
-        total_rows += len(chunk)
+        # 分块读取大文件（.gz / .zst 直接流式解压，无需先落盘）
         chunk["citation_count"] = pd.to_numeric(chunk["citation_count"], errors="coerce")
-
-        nonzero = chunk[chunk["citation_count"] > 0]
-        zero = chunk[chunk["citation_count"] == 0]
-
-        total_nonzero += len(nonzero)
-        total_zero += len(zero)
-
-        # 累积样本
-        if len(nonzero) > 0:
-            samples_nonzero.append(nonzero)
-        if len(zero) > 0 and len(samples_zero) < target_full * 3:
-            samples_zero.append(zero)
+        parts = []
+        if "citations" in dims:
+            parts.append(citation_bucket(chunk["citation_count"], citation_buckets))
+        if "years" in dims:
+            parts.append(year_bucket(chunk["pub_date"].fillna(""), year_width))
+        strata = parts[0].str.cat(parts[1:], sep="|") if parts else pd.Series("", index=chunk.index)
+        res.offer(chunk, strata)
 
         if chunk_idx % 20 == 0:
-            print(f"[Chunk {chunk_idx}] processed {total_rows:,} rows | nonzero={total_nonzero:,}, zero={total_zero:,}")
-
-        # ✅ 只在非零样本够了才提前结束
-        if total_nonzero >= target_full * 1.2:
-            print(f"[Break] 已收集足够非零样本 ({total_nonzero:,})，提前结束。")
-            break
-
-    print(f"[Combine] nonzero={sum(len(x) for x in samples_nonzero):,}, zero={sum(len(x) for x in samples_zero):,}")
-
-    # 合并
-    df_nonzero = pd.concat(samples_nonzero) if samples_nonzero else pd.DataFrame()
-    df_zero = pd.concat(samples_zero) if samples_zero else pd.DataFrame()
-
-    # Demo 样本
-    df_demo = df_nonzero.head(target_demo) if len(df_nonzero) >= target_demo else \
-               pd.concat([df_nonzero, df_zero.head(target_demo - len(df_nonzero))])
-    df_demo.to_csv(out_path_demo, index=False)
-    print(f"[✅ Demo] 已写出 {len(df_demo):,} 行 → {out_path_demo}")
-
-    # Full 样本
-    if len(df_nonzero) >= target_full:
-        df_full = df_nonzero.sample(n=target_full, random_state=42)
-    else:
-        remaining = target_full - len(df_nonzero)
-        df_full = pd.concat([
-            df_nonzero,
-            df_zero.sample(n=min(remaining, len(df_zero)), random_state=42)
-        ])
-    df_full = df_full.head(target_full)
-    df_full.to_csv(out_path_full, index=False)
+            print(f"[Chunk {chunk_idx}] processed {res.rows:,} rows | kept={len(res.kept):,}, "
+                  f"backfill={len(res.backfill):,}")
+
+    def take(target):
+        _, t_caps = allocate(quotas, target, citation_buckets, year_width)
+        df = res.sample(t_caps, target)
+        return df, df["_stratum"].value_counts() if len(df) else pd.Series(dtype="int64"), t_caps
+
+    # Demo / Full / 额外样本：同一批随机键取前 k，因此互为子集
+    outputs = [(target_demo, out_path_demo, "Demo"), (target_full, out_path_full, "Full")] + \
+              [(k, path, f"{k:,}") for k, path in sorted(extra.items())]
+    df_full = None
+    for target, path, label in outputs:
+        df, got, t_caps = take(target)
+        short = {k: (got.get(k, 0), v) for k, v in t_caps.items() if got.get(k, 0) < v}
+        write_csv(df.drop(columns=["_stratum", "_key", "_row"], errors="ignore"), path)
+        print(f"[✅ {label}] 已写出 {len(df):,} 行 → {path}" +
+              (f"（{len(short)} 层不足配额，已补齐）" if short else ""))
+        if label == "Full":
+            df_full, full_got, full_caps = df, got, t_caps
 
     # 统计
     nonzero_count = (df_full["citation_count"] > 0).sum()
     zero_count = (df_full["citation_count"] == 0).sum()
     missing_count = df_full["citation_count"].isna().sum()
 
-    print(f"[✅ Full] 已写出 {len(df_full):,} 行 → {out_path_full}")
     print("\n📊 抽样统计：")
-    print(f"  总样本：{len(df_full):,}")
+    print(f"  总行数：{res.rows:,}，总样本：{len(df_full):,}")
     print(f"  citation_count > 0 ：{nonzero_count:,}")
     print(f"  citation_count == 0 ：{zero_count:,}")
     print(f"  citation_count 缺失 ：{missing_count:,}")
+    for stratum in sorted(set(full_caps) | set(full_got.index)):
+        print(f"  [{stratum or '*'}] 总体 {res.seen.get(stratum, 0):,} | 配额 {full_caps.get(stratum, 0):,} | "
+              f"样本 {full_got.get(stratum, 0):,}")
     print(f"[{datetime.now().isoformat()}] ✅ 抽样任务完成。")
 
 if __name__ == "__main__":
-    in_path = "/disk1/xy/graphtalk/openalex/paper_citation_summary.csv"
-    out_path_demo = "/disk1/xy/graphtalk/openalex/test_meta_demo.csv"
-    out_path_full = "/disk1/xy/graphtalk/openalex/test_meta_new.csv"
-    sample_meta(in_path, out_path_demo, out_path_full, target_demo=100, target_full=10000, chunksize=200000)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="in_path", default="/disk1/xy/graphtalk/openalex/paper_citation_summary.csv")
+    ap.add_argument("--demo-out", default="/disk1/xy/graphtalk/openalex/test_meta_demo.csv")
+    ap.add_argument("--full-out", default="/disk1/xy/graphtalk/openalex/test_meta_new.csv")
+    ap.add_argument("--target-demo", type=int, default=100)
+    ap.add_argument("--target-full", type=int, default=10000)
+    ap.add_argument("--extra", action="append", default=[], metavar="N=PATH",
+                    help="同一遍额外写出 N 行的嵌套样本，可重复，如 1000000=test_meta_1m.csv.zst")
+    ap.add_argument("--chunksize", type=int, default=200000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--quotas", help='JSON 文件，如 {"citations": {"0": 0.2, "1-9": 0.4, "10+": 0.4}, '
+                                     '"years": {"2015-2019": 0.5, "2020-2024": 0.5}}；未列出的维度不分层')
+    ap.add_argument("--citation-buckets", default="0,1", help="citation 分桶下界，如 0,1,10,100")
+    ap.add_argument("--year-width", type=int, default=5, help="年份分桶宽度（年）")
+    args = ap.parse_args()
+    quotas = None
+    if args.quotas:
+        with open(args.quotas, "r") as f:
+            quotas = json.load(f)
+    extra = {int(n): path for n, path in (e.split("=", 1) for e in args.extra)}
+    citation_buckets = tuple(int(b) for b in args.citation_buckets.split(","))
+    try:
+        check_quotas(quotas or DEFAULT_QUOTAS, citation_buckets, args.year_width)
+    except ValueError as e:
+        ap.error(str(e))
+    sample_meta(args.in_path, args.demo_out, args.full_out, args.target_demo, args.target_full, args.chunksize,
+                args.seed, quotas, citation_buckets, args.year_width, extra)
@@ -1,74 +1,210 @@
 import requests
 import pandas as pd
-import io
+import argparse
+import hashlib
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-def download_csranks_files(save_dir="csrankings_raw"):
+BASE_URL = "https://raw.githubusercontent.com/emeryberger/CSrankings/gh-pages/"
+LETTERS = [chr(c) for c in range(ord('a'), ord('z')+1)]
+# Per-file validators (ETag / Last-Modified) and content hashes, plus what the last output was built from
+CACHE_INDEX = "cache.json"
+
+
+def load_cache_index(save_dir):
+    try:
+        with open(os.path.join(save_dir, CACHE_INDEX)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+
+
+def save_cache_index(save_dir, index):
+    path = os.path.join(save_dir, CACHE_INDEX)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _write_atomic(path, data):
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def fetch_one(session, base_url, fname, save_dir, entry, timeout=10):
+    """Conditional GET of one file into save_dir.
+
+    Returns (status, entry): "changed" (new content written), "unchanged" (304, or same bytes),
+    "cached" (fetch failed, the cached copy is used) or "missing".
+    """
+    path = os.path.join(save_dir, fname)
+    headers = {}
+    if entry and os.path.exists(path):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    try:
+        resp = session.get(base_url + fname, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        if os.path.exists(path):
+            print("Error fetching", fname, e, "- using cached copy")
+            return "cached", entry
+        print("Error fetching", fname, e)
+        return "missing", None
+    if resp.status_code == 304:
+        return "unchanged", entry
+    if resp.status_code != 200:
+        print("Skip:", fname, "status", resp.status_code)
+        if resp.status_code == 404:
+            # Gone upstream: drop the cached copy too
+            if os.path.exists(path):
+                os.remove(path)
+            return "missing", None
+        return ("cached", entry) if os.path.exists(path) else ("missing", None)
+    new = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified"),
+           "sha256": hashlib.sha256(resp.content).hexdigest()}
+    if entry and entry.get("sha256") == new["sha256"] and os.path.exists(path):
+        return "unchanged", new
+    # Keep the bytes exactly as served so the hash matches on the next run
+    _write_atomic(path, resp.content)
+    print("Downloaded:", fname)
+    return "changed", new
+
+
+def download_csranks_files(save_dir="csrankings_raw", index=None, base_url=BASE_URL, workers=8, offline=False,
+                           timeout=10):
+    """Refresh the local csrankings_raw cache; returns {fname: status} for every file available.
+
+    All 26 files are fetched concurrently over one keep-alive session with conditional requests,
+    so an unchanged file costs a 304 and is never rewritten. offline=True only uses the cache.
+    """
     os.makedirs(save_dir, exist_ok=True)
-    base = "https://raw.githubusercontent.com/emeryberger/CSrankings/gh-pages/"
-    letters = [chr(c) for c in range(ord('a'), ord('z')+1)]
-    dfs = []
-    for letter in letters:
-        fname = f"csrankings-{letter}.csv"
-        url = base + fname
-        try:
-            resp = requests.get(url, timeout=10)
-        except Exception as e:
-            print("Error fetching", fname, e)
+    index = load_cache_index(save_dir) if index is None else index
+    files = index.setdefault("files", {})
+    fnames = [f"csrankings-{letter}.csv" for letter in LETTERS]
+    if offline:
+        return {f: "cached" for f in fnames if os.path.exists(os.path.join(save_dir, f))}
+
+    session = requests.Session()
+    session.mount(base_url, HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+    with session, ThreadPoolExecutor(max_workers=workers) as ex:
+        results = list(ex.map(lambda f: fetch_one(session, base_url, f, save_dir, files.get(f), timeout), fnames))
+    statuses = {}
+    for fname, (status, entry) in zip(fnames, results):
+        if status == "missing":
+            files.pop(fname, None)
             continue
-        if resp.status_code == 200:
-            print("Downloaded:", fname)
-            df = pd.read_csv(io.StringIO(resp.text))
-            df["source_file"] = fname
-            dfs.append(df)
-            # Optionally save raw copy
-            df.to_csv(os.path.join(save_dir, fname), index=False)
-        else:
-            print("Skip:", fname, "status", resp.status_code)
-    return dfs
+        files[fname] = entry
+        statuses[fname] = status
+    save_cache_index(save_dir, index)
+    counts = {s: list(statuses.values()).count(s) for s in ("changed", "unchanged", "cached")}
+    print(f"CSRankings files: {counts['changed']} changed, {counts['unchanged']} unchanged, "
+          f"{counts['cached']} from cache")
+    return statuses
 
-def unify_and_clean(dfs):
-    df_all = pd.concat(dfs, ignore_index=True)
-    print("Combined columns:", df_all.columns.tolist())
-    # Choose columns present
+
+def file_sha256(save_dir, fname, index):
+    entry = index.setdefault("files", {}).get(fname) or {}
+    if not entry.get("sha256"):
+        # Cache written before the index existed (or offline): hash the file itself
+        with open(os.path.join(save_dir, fname), "rb") as f:
+            entry["sha256"] = hashlib.sha256(f.read()).hexdigest()
+        index["files"][fname] = entry
+    return entry["sha256"]
+
+
+def read_csranks_file(save_dir, fname, sha):
+    """Cleaned DataFrame (clean_file) of one cached file; re-parsed and re-cleaned only when its content hash changed."""
+    pkl = os.path.join(save_dir, "parsed", f"{fname}.{sha[:16]}.clean.pkl")
+    if os.path.exists(pkl):
+        try:
+            return pd.read_pickle(pkl)
+        except Exception:
+            pass
+    df = pd.read_csv(os.path.join(save_dir, fname))
+    df["source_file"] = fname
+    df = clean_file(df)
+    os.makedirs(os.path.dirname(pkl), exist_ok=True)
+    for old in os.listdir(os.path.dirname(pkl)):
+        if old.startswith(fname + "."):
+            os.remove(os.path.join(os.path.dirname(pkl), old))
+    df.to_pickle(pkl)
+    return df
+
+def clean_file(df):
+    """Per-file part of the cleaning: pick/rename columns, drop rows without affiliation, trim names."""
     # Many csrankings CSVs include: name, affiliation, dept, homepage, scholarid, areas, etc.
     # We care: name → author_name, affiliation → university_name
     # Optionally include dept/homepage if exist.
-    ex = df_all.columns
-    keep = []
-    if "name" in ex:
-        keep.append("name")
-    if "affiliation" in ex:
-        keep.append("affiliation")
-    if "dept" in ex:
-        keep.append("dept")
-    if "homepage" in ex:
-        keep.append("homepage")
-    keep.append("source_file")
-    df_sel = df_all[keep].copy()
     rename = {
         "name": "author_name",
         "affiliation": "university_name",
         "dept": "department",
         "homepage": "homepage"
     }
-    df_sel = df_sel.rename(columns=rename)
+    # name/affiliation always (missing = NaN, as in a concat with files that have them)
+    keep = [c for c in rename if c in df.columns or c in ("name", "affiliation")] + ["source_file"]
+    df_sel = df.reindex(columns=keep).rename(columns=rename)
     # Drop rows without affiliation
-    df_sel = df_sel[df_sel["university_name"].notna()]
-    # Trim whitespace
-    df_sel["author_name"] = df_sel["author_name"].str.strip()
-    df_sel["university_name"] = df_sel["university_name"].str.strip()
-    # Deduplicate: same author_name, choose first
-    df_sel = df_sel.drop_duplicates(subset=["author_name"], keep="first").reset_index(drop=True)
+    df_sel = df_sel[df_sel["university_name"].notna()].copy()
+    # Trim whitespace (a column the file lacks is all-NaN floats)
+    for col in ("author_name", "university_name"):
+        if pd.api.types.is_string_dtype(df_sel[col]):
+            df_sel[col] = df_sel[col].str.strip()
     return df_sel
 
+def unify_and_clean(dfs):
+    """Combine per-file cleaned frames (clean_file), in order; an author listed in several files keeps the first."""
+    df_all = pd.concat(dfs, ignore_index=True)
+    # Same column order whichever files have dept/homepage
+    order = ["author_name", "university_name", "department", "homepage", "source_file"]
+    df_all = df_all[[c for c in order if c in df_all.columns]]
+    print("Combined columns:", df_all.columns.tolist())
+    # Deduplicate: same author_name, choose first. This one step spans every file; it is a
+    # hash pass over the already cleaned rows, not a re-parse
+    return df_all.drop_duplicates(subset=["author_name"], keep="first").reset_index(drop=True)
+
 def save_affiliation_csv(df, out_path="csranks_author_affiliations.csv"):
-    df.to_csv(out_path, index=False, encoding="utf-8")
+    df.to_csv(out_path + ".tmp", index=False, encoding="utf-8")
+    os.replace(out_path + ".tmp", out_path)
     print("Saved to", out_path, "rows:", len(df))
 
-if __name__ == "__main__":
-    dfs = download_csranks_files()
-    if not dfs:
+
+def build_affiliations(save_dir="csrankings_raw", out_path="csranks_author_affiliations.csv", base_url=BASE_URL,
+                       workers=8, offline=False):
+    """Refresh the cache and rebuild out_path if any input file changed; returns True if rewritten.
+
+    Only changed files are downloaded, parsed and cleaned; the others come from their cached
+    cleaned frames. Recombining still concatenates every file's frame and dedupes authors across
+    all of them, since which copy of an author wins depends on every file.
+    An untouched out_path keeps its mtime, so the build's CsrIndex sidecar stays valid.
+    """
+    index = load_cache_index(save_dir)
+    statuses = download_csranks_files(save_dir, index, base_url, workers, offline)
+    if not statuses:
         raise RuntimeError("No CSRankings files downloaded")
-    df_aff = unify_and_clean(dfs)
-    save_affiliation_csv(df_aff)
+    inputs = {fname: file_sha256(save_dir, fname, index) for fname in sorted(statuses)}
+    built = index.get("output", {})
+    if built.get("path") == os.path.abspath(out_path) and built.get("inputs") == inputs and os.path.exists(out_path):
+        save_cache_index(save_dir, index)
+        print("Up to date:", out_path)
+        return False
+    dfs = [read_csranks_file(save_dir, fname, sha) for fname, sha in inputs.items()]
+    save_affiliation_csv(unify_and_clean(dfs), out_path)
+    index["output"] = {"path": os.path.abspath(out_path), "inputs": inputs}
+    save_cache_index(save_dir, index)
+    return True
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--save-dir", default="csrankings_raw", help="local cache of the raw csrankings-*.csv files")
+    ap.add_argument("--out", default="csranks_author_affiliations.csv")
+    ap.add_argument("--base-url", default=BASE_URL)
+    ap.add_argument("--workers", type=int, default=8, help="concurrent downloads")
+    ap.add_argument("--offline", action="store_true", help="build from the cache without any network access")
+    args = ap.parse_args()
+    build_affiliations(args.save_dir, args.out, args.base_url, args.workers, args.offline)
@@ -12,13 +12,46 @@ DATA_DIR='/disk1/xy/graphtalk/openalex/output_v11_full'
 
 echo "Starting import at $(date)"
 
+# \copy 的数据源：<table>.csv，或 build --compress 写出的 .csv.zst / .csv.gz（经 PROGRAM 流式解压）
+copy_src() {
+  local f="${DATA_DIR}/$1.csv"
+  if [ -f "${f}" ]; then
+    echo "'${f}'"
+  elif [ -f "${f}.zst" ]; then
+    echo "PROGRAM 'zstd -dc ${f}.zst'"
+  elif [ -f "${f}.gz" ]; then
+    echo "PROGRAM 'gzip -dc ${f}.gz'"
+  fi
+}
+
+# publications.csv and/or papers.csv + candidate_publications.csv, depending on --pub-layout
+PUB_COPY=""
+if [ -n "$(copy_src publications)" ]; then
+  PUB_COPY="\\copy publications FROM $(copy_src publications) CSV HEADER;"
+fi
+if [ -n "$(copy_src papers)" ]; then
+  PUB_COPY="${PUB_COPY}
+\\copy papers FROM $(copy_src papers) CSV HEADER;
+\\copy candidate_publications FROM $(copy_src candidate_publications) CSV HEADER;"
+fi
+
+# 大学对比页的预聚合表（较早的 build 输出里没有，跳过）
+STATS_COPY=""
+for t in university_conference_stats university_topic_stats university_emerging_topic_stats; do
+  if [ -n "$(copy_src ${t})" ]; then
+    STATS_COPY="${STATS_COPY}
+\\copy ${t} FROM $(copy_src ${t}) CSV HEADER;"
+  fi
+done
+
 psql "host=${PGHOST} port=${PGPORT} dbname=${PGDB} user=${PGUSER} password=${PGPASSWORD} sslmode=require" <<EOF
-\copy universities FROM '${DATA_DIR}/universities.csv' CSV HEADER;
-\copy research_topics FROM '${DATA_DIR}/research_topics.csv' CSV HEADER;
-\copy candidates FROM '${DATA_DIR}/candidates.csv' CSV HEADER;
-\copy publications FROM '${DATA_DIR}/publications.csv' CSV HEADER;
-\copy candidate_topics FROM '${DATA_DIR}/candidate_topics.csv' CSV HEADER;
-\copy academic_metrics FROM '${DATA_DIR}/academic_metrics.csv' CSV HEADER;
+\copy universities FROM $(copy_src universities) CSV HEADER;
+\copy research_topics FROM $(copy_src research_topics) CSV HEADER;
+\copy candidates FROM $(copy_src candidates) CSV HEADER;
+${PUB_COPY}
+\copy candidate_topics FROM $(copy_src candidate_topics) CSV HEADER;
+\copy academic_metrics FROM $(copy_src academic_metrics) CSV HEADER;
+${STATS_COPY}
 EOF
 
 echo "Import finished at $(date)"
@@ -1,86 +1,211 @@
 import os
+import io
+import gzip
 import json
 import csv
+import queue
 import sqlite3
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import pandas as pd
 
 # === 路径配置（按你的实际输出目录改） ===
 DATA_DIR = "/disk1/xy/graphtalk/openalex/test_output_v3_full_plus"
 DB_PATH = os.path.join(DATA_DIR, "graphtalk.db")
-PATH_UNI  = os.path.join(DATA_DIR, "universities.csv")
-PATH_CAND = os.path.join(DATA_DIR, "candidates.csv")
-PATH_PUB  = os.path.join(DATA_DIR, "publications.csv")
-PATH_RAD  = os.path.join(DATA_DIR, "radar_data.csv")
 PATH_SUM  = os.path.join(DATA_DIR, "RUN_SUMMARY.json")
 
-# === 建表（对齐你给的 schema，并补充生成列） ===
-DDL = """
+# === 日志/同步设置 ===
+# 默认：WAL + synchronous=NORMAL，每批提交
+SAFE_PRAGMAS = """
+PRAGMA locking_mode=NORMAL;
 PRAGMA journal_mode=WAL;
 PRAGMA synchronous=NORMAL;
+"""
+# --bulk：新建的库导入失败重跑即可，所以整个导入放在一个事务里，关闭回滚日志和 fsync；
+# 导入完成后恢复 SAFE_PRAGMAS
+BULK_PRAGMAS = """
+PRAGMA journal_mode=OFF;
+PRAGMA synchronous=OFF;
+PRAGMA locking_mode=EXCLUSIVE;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-524288;
+"""
+BULK = False
+BATCH_SIZE = 100_000
+READERS = min(4, os.cpu_count() or 1)
+
+# === 列转换：生成产物的值（CSV 字符串或 Parquet 类型值）→ SQLite 值 ===
+def to_text(v):
+    if v is None or v == "":
+        return None
+    if isinstance(v, datetime):
+        # Parquet 时间戳为 UTC；与 CSV 的 isoformat 文本保持一致
+        return v.replace(tzinfo=None).isoformat()
+    return str(v)
+
+def to_int(v):
+    if v is None or v == "":
+        return None
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return None
+
+def to_real(v):
+    if v is None or v == "":
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def to_json_list(v):
+    # research_interests："a; b; c" → JSON 数组文本（SQLite 无原生数组，对应 PG 的 TEXT[]）
+    if v is None or v == "":
+        return "[]"
+    return json.dumps([t.strip() for t in str(v).split(";") if t.strip()], ensure_ascii=False)
+
+# === 建表（对齐 database-schema.sql 与 build_clean_dataset_chunked_v5_full.py 的输出列） ===
+# 表 → [(列名, 类型/约束, 转换函数)]；列名即生成产物的表头，DDL 与插入语句都由此生成
+SCHEMA = {
+    "universities": [
+        ("id", "TEXT PRIMARY KEY", to_text),
+        ("name", "TEXT NOT NULL", to_text),
+        ("country", "TEXT", to_text),
+        ("ranking", "INTEGER", to_int),
+        ("logo_url", "TEXT", to_text),
+        ("website", "TEXT", to_text),
+        ("created_at", "TEXT", to_text),
+        ("updated_at", "TEXT", to_text),
+    ],
+    "research_topics": [
+        ("id", "TEXT PRIMARY KEY", to_text),
+        ("name", "TEXT NOT NULL UNIQUE", to_text),
+        ("description", "TEXT", to_text),
+        ("created_at", "TEXT", to_text),
+        ("updated_at", "TEXT", to_text),
+    ],
+    "candidates": [
+        ("id", "TEXT PRIMARY KEY", to_text),
+        ("name", "TEXT NOT NULL", to_text),
+        ("university_id", "TEXT REFERENCES universities(id)", to_text),
+        ("graduation_year", "INTEGER", to_int),
+        ("total_citations", "INTEGER DEFAULT 0", to_int),
+        ("h_index", "INTEGER DEFAULT 0", to_int),
+        ("ranking_score", "INTEGER DEFAULT 0", to_int),
+        ("research_interests", "TEXT DEFAULT '[]'", to_json_list),  # JSON 数组文本
+        ("profile_image_url", "TEXT", to_text),
+        ("linkedin_url", "TEXT", to_text),
+        ("google_scholar_url", "TEXT", to_text),
+        ("created_at", "TEXT", to_text),
+        ("updated_at", "TEXT", to_text),
+    ],
+    # 一行 = (论文, 候选人)；id 是二者的 stable uuid
+    "publications": [
+        ("id", "TEXT PRIMARY KEY", to_text),
+        ("candidate_id", "TEXT REFERENCES candidates(id)", to_text),
+        ("title", "TEXT", to_text),
+        ("venue", "TEXT", to_text),
+        ("year", "INTEGER", to_int),
+        ("citations", "INTEGER DEFAULT 0", to_int),
+        ("doi", "TEXT", to_text),
+        ("abstract", "TEXT", to_text),
+        ("topic_id", "TEXT", to_text),
+        ("created_at", "TEXT", to_text),
+        ("updated_at", "TEXT", to_text),
+    ],
+    # 规范化布局（--pub-layout normalized）：每篇论文只存一次，候选人通过 candidate_publications 关联
+    "papers": [
+        ("id", "TEXT PRIMARY KEY", to_text),  # OpenAlex work id
+        ("title", "TEXT", to_text),
+        ("venue", "TEXT", to_text),
+        ("year", "INTEGER", to_int),
+        ("citations", "INTEGER DEFAULT 0", to_int),
+        ("doi", "TEXT", to_text),
+        ("abstract", "TEXT", to_text),
+        ("topic_id", "TEXT", to_text),
+        ("created_at", "TEXT", to_text),
+        ("updated_at", "TEXT", to_text),
+    ],
+    "candidate_publications": [
+        ("candidate_id", "TEXT REFERENCES candidates(id)", to_text),
+        ("paper_id", "TEXT REFERENCES papers(id)", to_text),
+        ("created_at", "TEXT", to_text),
+    ],
+    "candidate_topics": [
+        ("candidate_id", "TEXT REFERENCES candidates(id)", to_text),
+        ("topic_id", "TEXT REFERENCES research_topics(id)", to_text),
+        ("created_at", "TEXT", to_text),
+    ],
+    "academic_metrics": [
+        ("id", "TEXT PRIMARY KEY", to_text),
+        ("university_id", "TEXT REFERENCES universities(id)", to_text),
+        ("year", "INTEGER NOT NULL", to_int),
+        ("publications_count", "INTEGER DEFAULT 0", to_int),
+        ("total_citations", "INTEGER DEFAULT 0", to_int),
+        ("h_index_avg", "REAL DEFAULT 0", to_real),
+        ("conference_papers", "INTEGER DEFAULT 0", to_int),
+        ("journal_papers", "INTEGER DEFAULT 0", to_int),
+        ("created_at", "TEXT", to_text),
+        ("updated_at", "TEXT", to_text),
+    ],
+    # 大学对比页的预聚合表：每个大学 × 会议/研究方向/新兴方向 × 年份一行
+    "university_conference_stats": [
+        ("university_id", "TEXT REFERENCES universities(id)", to_text),
+        ("conference", "TEXT NOT NULL", to_text),
+        ("year", "INTEGER NOT NULL", to_int),
+        ("papers", "INTEGER NOT NULL DEFAULT 0", to_int),
+    ],
+    "university_topic_stats": [
+        ("university_id", "TEXT REFERENCES universities(id)", to_text),
+        ("topic", "TEXT NOT NULL", to_text),
+        ("year", "INTEGER NOT NULL", to_int),
+        ("papers", "INTEGER NOT NULL DEFAULT 0", to_int),
+    ],
+    "university_emerging_topic_stats": [
+        ("university_id", "TEXT REFERENCES universities(id)", to_text),
+        ("topic", "TEXT NOT NULL", to_text),
+        ("year", "INTEGER NOT NULL", to_int),
+        ("papers", "INTEGER NOT NULL DEFAULT 0", to_int),
+    ],
+}
+TABLE_CONSTRAINTS = {
+    "candidate_publications": ["PRIMARY KEY (candidate_id, paper_id)"],
+    "candidate_topics": ["PRIMARY KEY (candidate_id, topic_id)"],
+    "academic_metrics": ["UNIQUE (university_id, year)"],
+    "university_conference_stats": ["PRIMARY KEY (university_id, year, conference)"],
+    "university_topic_stats": ["PRIMARY KEY (university_id, year, topic)"],
+    "university_emerging_topic_stats": ["PRIMARY KEY (university_id, year, topic)"],
+}
+# RUN_SUMMARY.json 中记录行数的键（publications 等只记录字节数，不校验）
+SUMMARY_KEYS = {"candidates": "candidates", "universities": "universities", "research_topics": "topics",
+                "candidate_topics": "candidate_topics", "academic_metrics": "academic_metrics",
+                "university_conference_stats": "university_conference_stats",
+                "university_topic_stats": "university_topic_stats",
+                "university_emerging_topic_stats": "university_emerging_topic_stats"}
 
-CREATE TABLE IF NOT EXISTS universities (
-    id TEXT PRIMARY KEY,
-    name TEXT,
-    candidate_count INTEGER,   -- 来自生成产物
-    ranking INTEGER,
-    location TEXT,
-    created_at TEXT,
-    updated_at TEXT
-);
-
-CREATE TABLE IF NOT EXISTS candidates (
-    id TEXT PRIMARY KEY,
-    name TEXT,
-    name_display TEXT,         -- 生成产物中用于展示
-    university_id TEXT,
-    department TEXT,
-    advisor TEXT,
-    research_areas TEXT,       -- 用 TEXT 存储 JSON 数组（SQLite无原生数组）
-    total_citations INTEGER,
-    h_index INTEGER,
-    graduation_year INTEGER,
-    email TEXT,
-    website TEXT,
-    ranking_score INTEGER,
-    publication_count INTEGER, -- 生成产物中已有
-    FOREIGN KEY(university_id) REFERENCES universities(id)
-);
-
--- 复合主键：同一paper可对应多个candidate
-CREATE TABLE IF NOT EXISTS publications (
-    id TEXT,
-    title TEXT,
-    authors TEXT,      -- JSON数组原样存文本
-    venue TEXT,
-    year INTEGER,
-    citations INTEGER,
-    type TEXT,
-    candidate_id TEXT,
-    PRIMARY KEY (id, candidate_id),
-    FOREIGN KEY(candidate_id) REFERENCES candidates(id)
-);
-
-CREATE TABLE IF NOT EXISTS radar_data (
-    id TEXT PRIMARY KEY,
-    subject TEXT,
-    value INTEGER,
-    full_mark INTEGER,
-    source TEXT,
-    candidate_id TEXT,
-    FOREIGN KEY(candidate_id) REFERENCES candidates(id)
-);
-
-CREATE TABLE IF NOT EXISTS candidate_analysis (
-    id TEXT PRIMARY KEY,
-    bio TEXT,
-    research_summary TEXT,
-    score_explanation TEXT,  -- JSONB in PG, 这里用 TEXT
-    key_strengths TEXT,
-    potential_concerns TEXT,
-    candidate_id TEXT,
-    FOREIGN KEY(candidate_id) REFERENCES candidates(id)
-);
+def table_ddl(table):
+    lines = [f"    {col} {decl}" for col, decl, _ in SCHEMA[table]] + \
+            [f"    {c}" for c in TABLE_CONSTRAINTS.get(table, [])]
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n" + ",\n".join(lines) + "\n);\n"
+
+DDL = "\n".join(table_ddl(t) for t in SCHEMA)
+
+# === 二级索引（与 database-schema.sql 一致）===
+# 默认模式建表时一起建；--bulk 导入完成后再建，最后 ANALYZE
+INDEX_DDL = """
+CREATE INDEX IF NOT EXISTS idx_candidates_university_id ON candidates(university_id);
+CREATE INDEX IF NOT EXISTS idx_candidates_graduation_year ON candidates(graduation_year);
+CREATE INDEX IF NOT EXISTS idx_candidates_citations ON candidates(total_citations);
+CREATE INDEX IF NOT EXISTS idx_candidates_ranking_score ON candidates(ranking_score);
+CREATE INDEX IF NOT EXISTS idx_publications_candidate_id ON publications(candidate_id);
+CREATE INDEX IF NOT EXISTS idx_publications_year ON publications(year);
+CREATE INDEX IF NOT EXISTS idx_publications_citations ON publications(citations);
+CREATE INDEX IF NOT EXISTS idx_papers_year ON papers(year);
+CREATE INDEX IF NOT EXISTS idx_papers_citations ON papers(citations);
+CREATE INDEX IF NOT EXISTS idx_candidate_publications_paper_id ON candidate_publications(paper_id);
+CREATE INDEX IF NOT EXISTS idx_academic_metrics_university_year ON academic_metrics(university_id, year);
 """
 
 def connect():
@@ -88,110 +213,235 @@ def connect():
     if os.path.exists(DB_PATH):
         os.remove(DB_PATH)
     conn = sqlite3.connect(DB_PATH)
+    conn.executescript(BULK_PRAGMAS if BULK else SAFE_PRAGMAS)
     conn.executescript(DDL)
+    if not BULK:
+        conn.executescript(INDEX_DDL)
     return conn
 
-def insert_dataframe(conn, table, df):
-    # 将 NaN → None
-    df = df.where(pd.notnull(df), None)
-    # 直接批量插入
-    df.to_sql(table, conn, if_exists="append", index=False)
-
-def load_universities(conn):
-    df = pd.read_csv(PATH_UNI)
-    # 填补 schema 中的字段
-    if "candidate_count" not in df.columns:
-        df["candidate_count"] = None
-    if "ranking" not in df.columns:
-        df["ranking"] = None
-    if "location" not in df.columns:
-        df["location"] = None
-    if "created_at" not in df.columns:
-        df["created_at"] = datetime.utcnow().isoformat()
-    df["updated_at"] = datetime.utcnow().isoformat()
-    insert_dataframe(conn, "universities", df)
-    print(f"[OK] universities: {len(df)}")
-
-def load_candidates(conn):
-    df = pd.read_csv(PATH_CAND)
-    # 对齐 schema：补齐缺少的列
-    for col in ["department","advisor","research_areas","graduation_year","email","website"]:
-        if col not in df.columns:
-            df[col] = None
-    if "name_display" not in df.columns:
-        df["name_display"] = df["name"]  # 回退
-    if "publication_count" not in df.columns:
-        df["publication_count"] = None
-    insert_dataframe(conn, "candidates", df)
-    print(f"[OK] candidates: {len(df)}")
-
-def load_publications_streaming(conn, chunksize=100_000):
-    cur = conn.cursor()
-    # 使用 Python csv 流式读取，避免 pandas 解析器在复杂引号/逗号时爆炸
-    count, dropped = 0, 0
-    with open(PATH_PUB, "r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+def commit_batch(conn):
+    # --bulk 只在 finish_load() 提交一次
+    if not BULK:
+        conn.commit()
+
+def finish_load(conn):
+    conn.commit()
+    if BULK:
+        t0 = time.time()
+        conn.executescript(INDEX_DDL)
+        print(f"[INDEX] built {INDEX_DDL.count('CREATE INDEX')} indexes in {time.time() - t0:.2f}s")
+    conn.execute("ANALYZE")
+    if BULK:
+        conn.executescript(SAFE_PRAGMAS)
+        conn.execute("SELECT count(*) FROM sqlite_master").fetchone()  # 释放 EXCLUSIVE 锁
+
+def table_path(table):
+    return os.path.join(DATA_DIR, f"{table}.csv")
+
+def parquet_path(csv_path):
+    # build --format parquet 写出 <name>.parquet（publications 等为按年分区的目录）
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+def csv_source(csv_path):
+    # build --compress gz|zst 写出 <name>.csv.gz / <name>.csv.zst，读取时直接流式解压
+    for path in (csv_path, csv_path + ".zst", csv_path + ".gz"):
+        if os.path.exists(path):
+            return path
+    return csv_path
+
+def open_csv(csv_path):
+    path = csv_source(csv_path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    if path.endswith(".zst"):
+        import zstandard
+        # 多帧文件（--compress 每次 sync 结束一帧）需要 read_across_frames
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, newline="", encoding="utf-8")
+    return open(path, "r", newline="", encoding="utf-8")
+
+def has_table(csv_path):
+    return os.path.exists(csv_source(csv_path)) or os.path.exists(parquet_path(csv_path))
+
+def parquet_dataset(csv_path):
+    import pyarrow.dataset as ds
+    return ds.dataset(parquet_path(csv_path), format="parquet", partitioning="hive")
+
+def csv_batches(csv_path, columns, batch_size):
+    # csv 模块流式读取（引号内的逗号/换行都安全）；按表头定位列，产物缺的列填 None
+    with open_csv(csv_path) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        idx = [header.index(c) if c in header else None for c in columns]
         batch = []
         for row in reader:
-            # 规范化/容错
-            pid = row.get("id","")
-            cid = row.get("candidate_id","")
-            if not pid or not cid:
-                dropped += 1
-                continue
-            title = (row.get("title") or "").strip()
-            authors = (row.get("authors") or "[]").strip()
-            venue = (row.get("venue") or "").strip()
-            year = row.get("year") or None
-            citations = row.get("citations") or 0
-            ptype = (row.get("type") or "").strip()
-
-            batch.append((pid, title, authors, venue, int(year) if str(year).isdigit() else None,
-                          int(citations) if str(citations).isdigit() else 0, ptype, cid))
-
-            if len(batch) >= chunksize:
-                cur.executemany(
-                    "INSERT OR IGNORE INTO publications "
-                    "(id,title,authors,venue,year,citations,type,candidate_id) "
-                    "VALUES (?,?,?,?,?,?,?,?)", batch)
-                conn.commit()
-                count += len(batch)
-                print(f"[PUB] inserted {count} (+{len(batch)})")
+            batch.append([row[i] if i is not None and i < len(row) else None for i in idx])
+            if len(batch) >= batch_size:
+                yield batch
                 batch = []
         if batch:
-            cur.executemany(
-                "INSERT OR IGNORE INTO publications "
-                "(id,title,authors,venue,year,citations,type,candidate_id) "
-                "VALUES (?,?,?,?,?,?,?,?)", batch)
-            conn.commit()
-            count += len(batch)
-    print(f"[OK] publications: {count} (ignored duplicates: {dropped})")
-
-def load_radar(conn):
-    df = pd.read_csv(PATH_RAD)
-    if "source" not in df.columns:
-        df["source"] = "Computed from publication metrics"
-    insert_dataframe(conn, "radar_data", df)
-    print(f"[OK] radar_data: {len(df)}")
-
-def print_summary():
-    if os.path.exists(PATH_SUM):
-        with open(PATH_SUM, "r") as f:
-            s = json.load(f)
-        print("[SUMMARY]", json.dumps(s, indent=2, ensure_ascii=False))
+            yield batch
+
+def parquet_batches(dataset, fragment, columns, batch_size):
+    # 按文件读；传入数据集 schema 以带上分区列（如 publications 的 year）
+    for rb in fragment.to_batches(schema=dataset.schema, batch_size=batch_size):
+        cols = rb.to_pydict()
+        yield list(zip(*(cols.get(c, [None] * rb.num_rows) for c in columns)))
+
+def read_tasks(table, batch_size):
+    # 每个 CSV 文件一个读取任务；Parquet 数据集每个文件一个任务
+    columns = [c for c, _, _ in SCHEMA[table]]
+    path = table_path(table)
+    if os.path.exists(parquet_path(path)):
+        dataset = parquet_dataset(path)
+        return [lambda fr=fr: parquet_batches(dataset, fr, columns, batch_size) for fr in dataset.get_fragments()]
+    return [lambda: csv_batches(path, columns, batch_size)]
+
+def _read_into(q, table, batches):
+    # 读取线程：解析 + 列转换，批次交给唯一的写连接；异常也经队列交给写线程抛出
+    convert = [conv for _, _, conv in SCHEMA[table]]
+    try:
+        for raw in batches():
+            q.put((table, [tuple(f(v) for f, v in zip(convert, row)) for row in raw]))
+    except BaseException as exc:
+        q.put((table, exc))
+    finally:
+        q.put((table, None))
+
+def load_tables(conn, tables, readers=READERS, batch_size=BATCH_SIZE):
+    """读取线程池并行解析各表，主线程单连接按批 executemany；返回 {表: (读取行数, 插入行数)}。"""
+    tasks = [(t, fn) for t in tables for fn in read_tasks(t, batch_size)]
+    sql = {t: f"INSERT OR IGNORE INTO {t} ({','.join(c for c, _, _ in SCHEMA[t])}) "
+              f"VALUES ({','.join('?' * len(SCHEMA[t]))})" for t in tables}
+    counts = {t: [0, 0] for t in tables}
+    q = queue.Queue(maxsize=2 * max(readers, 1))
+    pending, error = len(tasks), None
+    with ThreadPoolExecutor(max_workers=max(readers, 1)) as pool:
+        for table, fn in tasks:
+            pool.submit(_read_into, q, table, fn)
+        while pending:
+            table, rows = q.get()
+            if rows is None:
+                pending -= 1
+            elif isinstance(rows, BaseException):
+                error = error or rows
+            elif error is None:
+                before = conn.total_changes
+                conn.executemany(sql[table], rows)
+                commit_batch(conn)
+                counts[table][0] += len(rows)
+                counts[table][1] += conn.total_changes - before
+                if table in ("publications", "papers", "candidate_publications"):
+                    print(f"[{table.upper()}] inserted {counts[table][1]:,} (+{len(rows):,})")
+    if error is not None:
+        raise error
+    for table in tables:
+        read, inserted = counts[table]
+        print(f"[OK] {table}: {inserted:,}" + (f" (ignored duplicates: {read - inserted:,})" if read != inserted else ""))
+    return {t: tuple(c) for t, c in counts.items()}
+
+def load_summary():
+    if not os.path.exists(PATH_SUM):
+        return None
+    with open(PATH_SUM, "r") as f:
+        return json.load(f)
+
+def check_counts(conn, summary):
+    # 库中行数与 RUN_SUMMARY.json 对账；不一致返回 False
+    if summary is None:
+        print("[CHECK] RUN_SUMMARY.json not found, row counts not verified")
+        return True
+    ok = True
+    for table, key in SUMMARY_KEYS.items():
+        if key not in summary:
+            continue
+        n = table_rows(conn, table)
+        if n != summary[key]:
+            ok = False
+            print(f"[CHECK] ❌ {table}: {n:,} rows, RUN_SUMMARY.json says {summary[key]:,}")
+        else:
+            print(f"[CHECK] {table}: {n:,} rows ✓")
+    return ok
+
+def table_rows(conn, table):
+    return conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+def benchmark_queries(conn, n_universities=3, n_years=5, repeat=5):
+    # universityComparison.ts 原来的三步查询（大学 → 候选人 → 时间段内的发表）与现在读的预聚合表；
+    # 参数取候选人最多的几所大学、最近 n_years 年
+    unis = [r[0] for r in conn.execute(
+        "SELECT u.name FROM universities u JOIN candidates c ON c.university_id = u.id "
+        "GROUP BY u.id ORDER BY count(*) DESC LIMIT ?", (n_universities,))]
+    if not unis:
+        print("[QUERY] no candidates loaded, skipped")
+        return
+    marks = ",".join("?" * len(unis))
+    in_unis = f"SELECT id FROM universities WHERE name IN ({marks})"
+    in_cands = f"SELECT id FROM candidates WHERE university_id IN ({in_unis})"
+    queries = [
+        ("universities by name", f"SELECT id, name FROM universities WHERE name IN ({marks})", unis),
+        ("candidates by university",
+         f"SELECT id, university_id, research_interests FROM candidates WHERE university_id IN ({in_unis})", unis),
+    ]
+    for table, label, sql in [
+        ("publications", "publications by candidate + year", f"SELECT venue, year, candidate_id FROM publications "
+                         f"WHERE candidate_id IN ({in_cands}) AND year BETWEEN ? AND ?"),
+        # IN (候选人子查询) 会让规划器对每篇论文逐个探测候选人，这里写成连接
+        ("papers", "papers by candidate + year", f"SELECT p.venue, p.year, cp.candidate_id FROM candidates c "
+                   f"JOIN candidate_publications cp ON cp.candidate_id = c.id JOIN papers p ON p.id = cp.paper_id "
+                   f"WHERE c.university_id IN ({in_unis}) AND p.year BETWEEN ? AND ?"),
+    ] + [
+        # 预聚合表：每个图表只读 大学 × 标签 × 年份 的几行
+        (table, f"{table} by university + year", f"SELECT university_id, {label}, year, papers FROM {table} "
+                                                 f"WHERE university_id IN ({in_unis}) AND year BETWEEN ? AND ?")
+        for table, label in (("university_conference_stats", "conference"), ("university_topic_stats", "topic"),
+                             ("university_emerging_topic_stats", "topic"))
+    ]:
+        end = conn.execute(f"SELECT max(year) FROM {table}").fetchone()[0]
+        if end is not None:
+            queries.append((label, sql, unis + [end - n_years + 1, end]))
+
+    print(f"[QUERY] {', '.join(unis)} (median of {repeat})")
+    for label, sql, params in queries:
+        plan = "; ".join(r[-1] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            n = len(conn.execute(sql, params).fetchall())
+            times.append(time.perf_counter() - t0)
+        print(f"[QUERY] {label}: {sorted(times)[repeat // 2] * 1000:.2f} ms, {n} rows | {plan}")
+
+def print_summary(summary):
+    if summary is not None:
+        print("[SUMMARY]", json.dumps(summary, indent=2, ensure_ascii=False))
     else:
         print("[SUMMARY] RUN_SUMMARY.json not found")
 
-def main():
-    print(f"[INFO] SQLite DB: {DB_PATH}")
+def main(readers=READERS):
+    print(f"[INFO] SQLite DB: {DB_PATH}" + (" (bulk load)" if BULK else ""))
+    t0 = time.time()
     conn = connect()
-    load_universities(conn)
-    load_candidates(conn)
-    load_publications_streaming(conn, chunksize=100000)
-    load_radar(conn)
+    tables = [t for t in SCHEMA if has_table(table_path(t))]
+    missing = [t for t in SCHEMA if t not in tables]
+    if missing:
+        print(f"[INFO] not in {DATA_DIR}: {', '.join(missing)}")
+    load_tables(conn, tables, readers)
+    finish_load(conn)
+    print(f"[TIME] load {time.time() - t0:.2f}s ({readers} reader threads)")
+    summary = load_summary()
+    ok = check_counts(conn, summary)
+    benchmark_queries(conn)
     conn.close()
-    print_summary()
+    print_summary(summary)
+    if not ok:
+        raise SystemExit("[ERROR] row counts differ from RUN_SUMMARY.json")
     print("✅ DONE")
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bulk", action="store_true",
+                    help="单事务导入、关闭回滚日志与 fsync，导入后再建二级索引并 ANALYZE（失败需重跑）")
+    ap.add_argument("--readers", type=int, default=READERS, help="解析线程数（写入始终是单连接）")
+    args = ap.parse_args()
+    BULK = args.bulk
+    main(args.readers)
@@ -1,9 +1,21 @@
 import os
-import json
-import math
-import pandas as pd
+import io
+import re
+import sys
+import csv
+import time
+import uuid
+import zlib
+import hashlib
+import queue
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+import numpy as np
 import psycopg2
-from psycopg2.extras import execute_values
 
 # ========= 配置区域 =========
 # 从环境变量读取 Supabase 连接信息（推荐）
@@ -12,225 +24,822 @@ PG_PORT = int(os.environ.get("SUPABASE_PGPORT", "5432"))
 PG_DB   = os.environ.get("SUPABASE_DB",       "graphtalk")
 PG_USER = os.environ.get("SUPABASE_USER",     "KidultXy")
 PG_PASS = os.environ.get("SUPABASE_PASS",     "xy123456")
+PG_SSLMODE = os.environ.get("SUPABASE_SSLMODE", "require")  # 本地 Postgres 测试时设为 disable
 
 # 你的 CSV 路径（改成你自己的输出目录）
 DATA_DIR = "/disk1/xy/graphtalk/openalex/test_output_v3_full_plus"
-PATH_UNI  = os.path.join(DATA_DIR, "universities.csv")
-PATH_CAND = os.path.join(DATA_DIR, "candidates.csv")
-PATH_PUB  = os.path.join(DATA_DIR, "publications.csv")
-PATH_RAD  = os.path.join(DATA_DIR, "radar_data.csv")
 
-BATCH = 5000  # 批量插入大小
+COPY_READ_SIZE = 1 << 16    # copy_expert 每次从流读取的字符数
+PROGRESS_EVERY = 1_000_000  # 每 N 行打印一次进度
+
+JOBS = 4                    # 并发连接数（连接池大小）
+PARTITIONS = 4              # 大表按键范围切分的分区数
+RETRIES = 2                 # 每个分区失败后的重试次数
+SPOOL_DIR = None            # 分区临时文件目录；None = 系统临时目录
+LARGE_TABLES = ("publications", "papers", "candidate_publications", "candidate_topics")
+
+# ========= 表结构（对齐 database-schema.sql；列名即 build 输出的表头）=========
+# 列：(列名, PG 类型, NOT NULL, 缺省值 SQL)；key 为 ON CONFLICT 键，refs 为外键 列 → 父表
+TABLES = {
+    "universities": {
+        "columns": [("id", "uuid", True, None), ("name", "text", True, None), ("country", "text", True, None),
+                    ("ranking", "integer", False, None), ("logo_url", "text", False, None),
+                    ("website", "text", False, None), ("created_at", "timestamptz", False, "now()"),
+                    ("updated_at", "timestamptz", False, "now()")],
+        "key": ["id"], "refs": {},
+    },
+    "research_topics": {
+        "columns": [("id", "uuid", True, None), ("name", "text", True, None), ("description", "text", False, None),
+                    ("created_at", "timestamptz", False, "now()"), ("updated_at", "timestamptz", False, "now()")],
+        "key": ["id"], "refs": {},
+    },
+    "candidates": {
+        "columns": [("id", "uuid", True, None), ("name", "text", True, None), ("university_id", "uuid", False, None),
+                    ("graduation_year", "integer", True, None), ("total_citations", "integer", False, "0"),
+                    ("h_index", "integer", False, "0"), ("ranking_score", "integer", False, "0"),
+                    ("research_interests", "text[]", False, "'{}'"), ("profile_image_url", "text", False, None),
+                    ("linkedin_url", "text", False, None), ("google_scholar_url", "text", False, None),
+                    ("created_at", "timestamptz", False, "now()"), ("updated_at", "timestamptz", False, "now()")],
+        "key": ["id"], "refs": {"university_id": "universities"},
+    },
+    "publications": {
+        "columns": [("id", "uuid", True, None), ("candidate_id", "uuid", False, None), ("title", "text", True, None),
+                    ("venue", "text", True, None), ("year", "integer", True, None),
+                    ("citations", "integer", False, "0"), ("doi", "text", False, None),
+                    ("abstract", "text", False, None), ("topic_id", "text", False, None),
+                    ("created_at", "timestamptz", False, "now()"), ("updated_at", "timestamptz", False, "now()")],
+        "key": ["id"], "refs": {"candidate_id": "candidates"},
+    },
+    "papers": {
+        "columns": [("id", "text", True, None), ("title", "text", True, None), ("venue", "text", False, None),
+                    ("year", "integer", False, None), ("citations", "integer", False, "0"),
+                    ("doi", "text", False, None), ("abstract", "text", False, None),
+                    ("topic_id", "text", False, None), ("created_at", "timestamptz", False, "now()"),
+                    ("updated_at", "timestamptz", False, "now()")],
+        "key": ["id"], "refs": {},
+    },
+    "candidate_publications": {
+        "columns": [("candidate_id", "uuid", True, None), ("paper_id", "text", True, None),
+                    ("created_at", "timestamptz", False, "now()")],
+        "key": ["candidate_id", "paper_id"], "refs": {"candidate_id": "candidates", "paper_id": "papers"},
+    },
+    "candidate_topics": {
+        "columns": [("candidate_id", "uuid", True, None), ("topic_id", "uuid", True, None),
+                    ("created_at", "timestamptz", False, "now()")],
+        "key": ["candidate_id", "topic_id"], "refs": {"candidate_id": "candidates", "topic_id": "research_topics"},
+    },
+    "academic_metrics": {
+        "columns": [("id", "uuid", True, None), ("university_id", "uuid", False, None), ("year", "integer", True, None),
+                    ("publications_count", "integer", False, "0"), ("total_citations", "integer", False, "0"),
+                    ("h_index_avg", "numeric", False, "0"), ("conference_papers", "integer", False, "0"),
+                    ("journal_papers", "integer", False, "0"), ("created_at", "timestamptz", False, "now()"),
+                    ("updated_at", "timestamptz", False, "now()")],
+        "key": ["id"], "refs": {"university_id": "universities"},
+    },
+    # 大学对比页的预聚合表（每个大学 × 会议/研究方向/新兴方向 × 年份一行）
+    "university_conference_stats": {
+        "columns": [("university_id", "uuid", True, None), ("conference", "text", True, None),
+                    ("year", "integer", True, None), ("papers", "integer", True, "0")],
+        "key": ["university_id", "year", "conference"], "refs": {"university_id": "universities"},
+    },
+    "university_topic_stats": {
+        "columns": [("university_id", "uuid", True, None), ("topic", "text", True, None),
+                    ("year", "integer", True, None), ("papers", "integer", True, "0")],
+        "key": ["university_id", "year", "topic"], "refs": {"university_id": "universities"},
+    },
+    "university_emerging_topic_stats": {
+        "columns": [("university_id", "uuid", True, None), ("topic", "text", True, None),
+                    ("year", "integer", True, None), ("papers", "integer", True, "0")],
+        "key": ["university_id", "year", "topic"], "refs": {"university_id": "universities"},
+    },
+}
 
 
 def connect():
     print("[INFO] Connecting to Supabase Postgres...")
     conn = psycopg2.connect(
         host=PG_HOST, port=PG_PORT, dbname=PG_DB, user=PG_USER, password=PG_PASS,
-        sslmode="require"  # Supabase 需要 SSL
+        sslmode=PG_SSLMODE  # Supabase 需要 SSL
     )
     print("[OK] Connected.")
     return conn
 
 
-def df_iter_batches(df: pd.DataFrame, batch_size=5000):
-    n = len(df)
-    for i in range(0, n, batch_size):
-        yield df.iloc[i:i+batch_size]
+def table_path(table):
+    return os.path.join(DATA_DIR, f"{table}.csv")
 
 
-def load_universities(conn):
-    df = pd.read_csv(PATH_UNI)
-    # 只取符合 schema 的列
-    cols = ["id", "name", "ranking", "location", "created_at", "updated_at"]
-    for c in cols:
-        if c not in df.columns:
-            df[c] = None
-    df = df[cols]
+def parquet_path(csv_path):
+    # build --format parquet 写出 <name>.parquet（publications 等为按年分区的目录）
+    return os.path.splitext(csv_path)[0] + ".parquet"
 
-    with conn.cursor() as cur:
-        sql = """
-        insert into universities (id, name, ranking, location, created_at, updated_at)
-        values %s
-        on conflict (id) do update set
-            name = excluded.name,
-            ranking = excluded.ranking,
-            location = excluded.location,
-            created_at = coalesce(universities.created_at, excluded.created_at),
-            updated_at = excluded.updated_at;
-        """
-        inserted = 0
-        for chunk in df_iter_batches(df, BATCH):
-            values = [tuple(row) for row in chunk.itertuples(index=False, name=None)]
-            execute_values(cur, sql, values)
-            inserted += len(chunk)
-        conn.commit()
-    print(f"[OK] universities upserted: {inserted}")
-
-
-def load_candidates(conn):
-    df = pd.read_csv(PATH_CAND)
-    cols = ["id","name","university_id","department","advisor","research_areas",
-            "total_citations","h_index","graduation_year","email","website","ranking_score"]
-    for c in cols:
-        if c not in df.columns:
-            df[c] = None
-    df = df[cols]
-
-    # 将 research_areas 从字符串/空值 → PG 数组
-    def to_pg_array(x):
-        if pd.isna(x) or x is None or str(x).strip() == "" or str(x).strip() == "[]":
-            return []
-        # 允许 JSON 或简单分隔
-        try:
-            val = json.loads(x) if isinstance(x, str) else x
-            if isinstance(val, list):
-                return val
-        except Exception:
-            pass
-        # 兜底：按 ; 或 , 分拆
-        s = str(x)
-        parts = [p.strip() for p in s.replace(";", ",").split(",") if p.strip()]
-        return parts
-
-    df["research_areas"] = df["research_areas"].apply(to_pg_array)
 
-    with conn.cursor() as cur:
-        sql = """
-        insert into candidates
-        (id, name, university_id, department, advisor, research_areas,
-         total_citations, h_index, graduation_year, email, website, ranking_score)
-        values %s
-        on conflict (id) do update set
-          name = excluded.name,
-          university_id = excluded.university_id,
-          department = excluded.department,
-          advisor = excluded.advisor,
-          research_areas = excluded.research_areas,
-          total_citations = excluded.total_citations,
-          h_index = excluded.h_index,
-          graduation_year = excluded.graduation_year,
-          email = excluded.email,
-          website = excluded.website,
-          ranking_score = excluded.ranking_score;
-        """
-        inserted = 0
-        for chunk in df_iter_batches(df, BATCH):
-            values = [tuple(row) for row in chunk.itertuples(index=False, name=None)]
-            execute_values(cur, sql, values)
-            inserted += len(chunk)
-        conn.commit()
-    print(f"[OK] candidates upserted: {inserted}")
+def csv_source(csv_path):
+    # build --compress gz|zst 写出 <name>.csv.gz / <name>.csv.zst，读取时流式解压
+    for path in (csv_path, csv_path + ".zst", csv_path + ".gz"):
+        if os.path.exists(path):
+            return path
+    return csv_path
 
 
-def load_publications(conn):
-    # 安全解析：authors 是 JSON 字符串 → 转 TEXT[]；其余字段兜底
-    df = pd.read_csv(
-        PATH_PUB,
-        on_bad_lines="skip",
-        quotechar='"',
-        escapechar='\\',
-        engine="python"
-    )
+def has_table(csv_path):
+    return os.path.exists(csv_source(csv_path)) or os.path.exists(parquet_path(csv_path))
 
-    cols = ["id","title","authors","venue","year","citations","type","candidate_id"]
-    for c in cols:
-        if c not in df.columns:
-            df[c] = None
-    df = df[cols]
 
-    def authors_to_array(s):
-        if pd.isna(s) or s is None or str(s).strip() == "":
-            return []
-        try:
-            val = json.loads(s)
-            if isinstance(val, list):
-                return [str(x) for x in val]
-        except Exception:
-            pass
-        # 如果不是 JSON，尽力分割
-        txt = str(s)
-        parts = [p.strip() for p in txt.split(",") if p.strip()]
-        return parts
-
-    df["authors"] = df["authors"].apply(authors_to_array)
-
-    # year/citations 清洗
-    def to_int_or_none(x):
-        try:
-            return int(x)
-        except Exception:
-            return None
-    def to_int_or_zero(x):
-        try:
-            return int(x)
-        except Exception:
-            return 0
+def parquet_dataset(csv_path):
+    import pyarrow.dataset as ds
+    # year=__HIVE_DEFAULT_PARTITION__ 读作 NULL；分区键按整数解析
+    return ds.dataset(parquet_path(csv_path), format="parquet", partitioning="hive")
 
-    df["year"] = df["year"].apply(to_int_or_none)
-    df["citations"] = df["citations"].apply(to_int_or_zero)
 
-    # 复合主键 upsert（id, candidate_id）
-    with conn.cursor() as cur:
-        sql = """
-        insert into publications
-        (id, title, authors, venue, year, citations, type, candidate_id)
-        values %s
-        on conflict (id, candidate_id) do update set
-          title = excluded.title,
-          authors = excluded.authors,
-          venue = excluded.venue,
-          year = excluded.year,
-          citations = excluded.citations,
-          type = excluded.type;
-        """
-        inserted = 0
-        for chunk in df_iter_batches(df, BATCH):
-            values = [tuple(row) for row in chunk.itertuples(index=False, name=None)]
-            execute_values(cur, sql, values)
-            inserted += len(chunk)
+def open_csv(csv_path):
+    path = csv_source(csv_path)
+    if path.endswith(".gz"):
+        import gzip
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    if path.endswith(".zst"):
+        import zstandard
+        # 多帧文件（--compress 每次 sync 结束一帧）需要 read_across_frames
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, newline="", encoding="utf-8")
+    return open(path, "r", newline="", encoding="utf-8")
+
+
+def iter_rows(table):
+    """逐条产出 (values, raw, reason)。
+
+    values 按 TABLES 列顺序（缺失值为 ""）；CSV 表头与 TABLES 一致时 raw 是该记录的原始文本，
+    可以原样交给 COPY，否则为 None。列数不对的记录 values 为原始字段、reason 为原因。
+    """
+    columns = [c[0] for c in TABLES[table]["columns"]]
+    path = table_path(table)
+    if os.path.exists(parquet_path(path)):
+        for batch in parquet_dataset(path).to_batches():
+            cols = batch.to_pydict()
+            for row in zip(*(cols.get(c, [None] * batch.num_rows) for c in columns)):
+                yield ["" if v is None else v.isoformat() if isinstance(v, datetime) else str(v) for v in row], None, None
+        return
+    with open_csv(path) as f:
+        # 记录 csv.reader 消费的物理行，拼回一条记录的原始文本（引号内可能有换行）
+        lines = []
+
+        def feed():
+            for line in f:
+                lines.append(line)
+                yield line
+
+        reader = csv.reader(feed())
+        header = next(reader, [])
+        lines.clear()
+        same = header == columns
+        idx = [header.index(c) if c in header else None for c in columns]
+        width = len(header)
+        for row in reader:
+            raw = "".join(lines)
+            lines.clear()
+            if len(row) != width:
+                # 列数不对（引号损坏等）：不交给 COPY，记为拒绝行
+                yield row, None, f"{len(row)} fields, expected {width}"
+            elif same:
+                yield row, raw, None
+            else:
+                yield [row[i] if i is not None else "" for i in idx], None, None
+
+
+_UUID = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+
+def _int4(value):
+    if not -2**31 <= int(value) < 2**31:
+        raise ValueError(value)
+
+
+def _uuid(value):
+    # build 写出的是标准格式；其他 Postgres 接受的写法交给 uuid.UUID 判断
+    if not _UUID.fullmatch(value):
+        uuid.UUID(value)
+
+
+# 非 text 列的校验：不能转换时抛 ValueError
+PARSERS = {"integer": _int4, "numeric": float, "uuid": _uuid, "timestamptz": datetime.fromisoformat}
+
+
+def _cast(col, typ, default):
+    # staging 全是 text；"" 视为 NULL，再回落到 schema 中的缺省值
+    if typ == "text":
+        expr = f"nullif({col}, '')"
+    elif typ == "text[]":
+        expr = f"string_to_array(nullif({col}, ''), '; ')"
+    else:
+        expr = f"nullif({col}, '')::{typ}"
+    return f"coalesce({expr}, {default})" if default else expr
+
+
+class RejectLog:
+    """被拒绝的行写到 <DATA_DIR>/<table>.rejected.csv（原列 + _reason），不再静默丢弃。线程安全。"""
+
+    def __init__(self, table):
+        self.table, self.count, self._f = table, 0, None
+        self._lock = threading.Lock()  # 分区切分与各分区的外键拒绝行可能来自不同线程
+        self.path = os.path.join(DATA_DIR, f"{table}.rejected.csv")
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, row, reason):
+        with self._lock:
+            self._write(row, reason)
+
+    def _write(self, row, reason):
+        if self._f is None:
+            self._f = open(self.path, "w", newline="", encoding="utf-8")
+            self._w = csv.writer(self._f)
+            self._w.writerow([c[0] for c in TABLES[self.table]["columns"]] + ["_reason"])
+        self._w.writerow(list(row) + [reason])
+        self.count += 1
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+
+
+def validated_rows(table, rejects):
+    """只放行能按 schema 类型转换的记录，产出 (values, raw)；其余写入 rejects。"""
+    checks = [(i, col, PARSERS[typ], required) for i, (col, typ, required, _) in enumerate(TABLES[table]["columns"])
+              if typ in PARSERS]
+    for row, raw, reason in iter_rows(table):
+        if reason is None and "\x00" in (raw or "".join(row)):
+            reason = "NUL byte"
+        for i, col, parse, required in checks:
+            if reason is not None:
+                break
+            value = row[i]
+            if value == "":
+                if required:
+                    reason = f"{col}: missing value"
+                continue
+            try:
+                parse(value)
+            except ValueError:
+                reason = f"{col}: invalid value {value[:40]!r}"
+        if reason is None:
+            yield row, raw
+        else:
+            rejects.write(row, reason)
+
+
+class CopyStream:
+    """把校验过的记录拼成 CSV 文本，供 copy_expert 按块 read()；内存只与块大小有关。
+
+    有原始文本的记录直接拼接，没有的（Parquet、表头不一致）用 csv.writer 重新写出。
+    """
+
+    def __init__(self, records, chunk_rows=2000):
+        self._records, self._chunk_rows = records, chunk_rows
+        self._buf = io.StringIO()
+        self._writer = csv.writer(self._buf, lineterminator="\n")
+        self._pending, self._done = "", False
+        self.count = 0
+
+    def _fill(self):
+        n = 0
+        for row, raw in self._records:
+            if raw is None:
+                self._writer.writerow(row)
+            else:
+                self._buf.write(raw)
+            n += 1
+            if n >= self._chunk_rows:
+                break
+        if n < self._chunk_rows:
+            self._done = True
+        self.count += n
+        if self.count // PROGRESS_EVERY != (self.count - n) // PROGRESS_EVERY:
+            print(f"[COPY] {self.count:,} rows streamed")
+        self._pending += self._buf.getvalue()
+        self._buf.seek(0)
+        self._buf.truncate()
+
+    def read(self, size=-1):
+        while not self._done and (size < 0 or len(self._pending) < size):
+            self._fill()
+        if size < 0:
+            size = len(self._pending)
+        out, self._pending = self._pending[:size], self._pending[size:]
+        return out
+
+
+def _merge(conn, table, source):
+    """COPY source 到临时 staging 表 → 外键检查 → 一条 INSERT ... ON CONFLICT 合并，一个事务内完成。
+
+    staging 列全是 text，类型转换在合并语句里做；同一个键在 source 中出现多次时保留最后一行。
+    返回 (staged, merged, fk_rejects)；fk_rejects 是父表中不存在的外键行 [(row, reason)]，
+    事务提交后才由调用方写入 sidecar，失败重试时不会重复记录。
+    """
+    spec, key, refs = TABLES[table]["columns"], TABLES[table]["key"], TABLES[table]["refs"]
+    cols = [c[0] for c in spec]
+    stage = f"stage_{table}"
+    fk_rejects = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TEMP TABLE {stage} (_row bigint GENERATED ALWAYS AS IDENTITY, "
+                        f"{', '.join(c + ' text' for c in cols)}) ON COMMIT DROP")
+            cur.copy_expert(f"COPY {stage} ({', '.join(cols)}) FROM STDIN "
+                            f"WITH (FORMAT csv, FORCE_NOT_NULL ({', '.join(cols)}))", source, size=COPY_READ_SIZE)
+            staged = cur.rowcount
+
+            # 外键：父表里没有的行移出 staging
+            for col, parent in refs.items():
+                typ = next(c[1] for c in spec if c[0] == col)
+                cur.execute(f"DELETE FROM {stage} s WHERE s.{col} <> '' AND NOT EXISTS "
+                            f"(SELECT 1 FROM {parent} p WHERE p.id = s.{col}::{typ}) RETURNING {', '.join(cols)}")
+                fk_rejects += [(row, f"{col}: not in {parent}") for row in cur.fetchall()]
+
+            updates = [c for c in cols if c not in key and c != "created_at"]
+            action = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in updates) if updates else "DO NOTHING"
+            # 同一键只保留最后一行（反连接，不必对宽行排序）
+            later = " AND ".join(f"d.{k} = s.{k}" for k in key)
+            cur.execute(
+                f"INSERT INTO {table} ({', '.join(cols)}) "
+                f"SELECT {', '.join(_cast('s.' + c[0], c[1], c[3]) for c in spec)} FROM {stage} s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {stage} d WHERE {later} AND d._row > s._row) "
+                f"ON CONFLICT ({', '.join(key)}) {action}")
+            merged = cur.rowcount
         conn.commit()
-    print(f"[OK] publications upserted: {inserted}")
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    return staged, merged, fk_rejects
+
+
+def _key_text(value, typ):
+    # 与 Postgres 的 key::text 一致：uuid 输出为小写带连字符的标准格式
+    if typ == "uuid" and not (_UUID.fullmatch(value) and value == value.lower()):
+        return str(uuid.UUID(value))
+    return value
+
+
+def _hash64(text):
+    # md5 前 8 字节（有符号 int64）；与 key_hash_sql 在服务端算出的值相同
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "big", signed=True)
+
 
+def key_hash_sql(table, alias="t"):
+    text = " || '|' || ".join(f"{alias}.{k}::text" for k in TABLES[table]["key"])
+    return f"('x' || left(md5({text}), 16))::bit(64)::bigint"
 
-def load_radar(conn):
-    df = pd.read_csv(PATH_RAD)
-    cols = ["id","subject","value","full_mark","source","candidate_id"]
-    for c in cols:
-        if c not in df.columns:
-            df[c] = None
-    df = df[cols]
 
+class PushManifest:
+    """上次成功推送到目标库的每行哈希，<manifest_dir>/<table>.npz：按 key 排序的 key/row 两列 int64。
+
+    key 是主键文本的 hash（服务端可以用 key_hash_sql 算出同样的值，删除时只需传 hash）；row 是
+    除 created_at/updated_at 外所有列的 hash —— 每次 build 都会刷新时间戳，内容没变的行不算修改。
+    diff() 只放行新增和修改的行，同时收集本次输出的全部哈希；表推送成功后 save() 才写回。
+    """
+
+    def __init__(self, table, directory, full=False):
+        self.table, self.full = table, full
+        self.path = os.path.join(directory, f"{table}.npz")
+        spec = TABLES[table]["columns"]
+        self.signature = np.array([f"{c[0]}:{c[1]}" for c in spec])
+        names = [c[0] for c in spec]
+        # 按 key 的顺序拼接，与 key_hash_sql 一致（统计表的主键顺序和列顺序不同）
+        self._key_cols = [(names.index(k), spec[names.index(k)][1]) for k in TABLES[table]["key"]]
+        self._row_cols = [i for i, c in enumerate(spec) if c[0] not in ("created_at", "updated_at")]
+        self.keys = self.rows = np.empty(0, dtype=np.int64)
+        if os.path.exists(self.path):
+            with np.load(self.path) as z:
+                # 列定义变了，旧哈希没有意义：当作首次推送
+                if np.array_equal(z["signature"], self.signature):
+                    self.keys, self.rows = z["keys"], z["rows"]
+        self._reset()
+
+    def _reset(self):
+        self._new_keys, self._new_rows, self._dropped = [], [], []
+        self.inserted = self.changed = self.unchanged = 0
+
+    def key_of(self, row):
+        return _hash64("|".join(_key_text(row[i], typ) for i, typ in self._key_cols))
+
+    def _row_of(self, row):
+        return _hash64("\x1f".join(row[i] for i in self._row_cols))
+
+    def diff(self, records, batch=20000):
+        """records → 需要推送的 (values, raw)；full=True 时全部推送，但仍记录哈希。"""
+        self._reset()
+        buf = []
+        for record in records:
+            buf.append(record)
+            if len(buf) >= batch:
+                yield from self._diff_batch(buf)
+                buf = []
+        yield from self._diff_batch(buf)
+
+    def _diff_batch(self, buf):
+        if not buf:
+            return
+        keys = np.fromiter((self.key_of(r) for r, _ in buf), dtype=np.int64, count=len(buf))
+        rows = np.fromiter((self._row_of(r) for r, _ in buf), dtype=np.int64, count=len(buf))
+        self._new_keys.append(keys)
+        self._new_rows.append(rows)
+        if self.keys.size:
+            pos = np.minimum(np.searchsorted(self.keys, keys), self.keys.size - 1)
+            known = self.keys[pos] == keys
+            same = known & (self.rows[pos] == rows)
+        else:
+            known = same = np.zeros(len(buf), dtype=bool)
+        self.inserted += int((~known).sum())
+        self.changed += int((known & ~same).sum())
+        self.unchanged += int(same.sum())
+        ship = np.ones(len(buf), dtype=bool) if self.full else ~same
+        for record, keep in zip(buf, ship):
+            if keep:
+                yield record
+
+    def drop(self, rows):
+        """这些行没有进入目标库（外键拒绝）：不写进新 manifest，下次还会推送。"""
+        self._dropped += [self.key_of(row) for row in rows]
+
+    def forget(self, hashes):
+        """这些 key 推送后又被目标库删掉了（父表删除时级联）：同 drop()，下次还会推送。"""
+        self._dropped += [int(h) for h in hashes]
+
+    def keep(self, hashes):
+        """这些已从输出消失的 key 这次没删（推迟）：保留上次的哈希，下次 deleted() 仍会列出。"""
+        pos = np.searchsorted(self.keys, hashes)
+        self._new_keys.append(self.keys[pos])
+        self._new_rows.append(self.rows[pos])
+
+    def current(self):
+        """本次输出的 (keys, rows)：按 key 排序，同一 key 保留最后一行，去掉 drop() 的 key。"""
+        keys = np.concatenate(self._new_keys) if self._new_keys else np.empty(0, dtype=np.int64)
+        rows = np.concatenate(self._new_rows) if self._new_rows else np.empty(0, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        keys, rows = keys[order], rows[order]
+        last = np.r_[keys[1:] != keys[:-1], True] if keys.size else np.empty(0, dtype=bool)
+        keys, rows = keys[last], rows[last]
+        if self._dropped:
+            keep = ~np.isin(keys, np.array(self._dropped, dtype=np.int64))
+            keys, rows = keys[keep], rows[keep]
+        return keys, rows
+
+    def deleted(self):
+        """上次推送过、这次输出里已经没有的 key hash。"""
+        keys, _ = self.current()
+        if not self.keys.size:
+            return self.keys
+        if not keys.size:
+            return self.keys
+        pos = np.minimum(np.searchsorted(keys, self.keys), keys.size - 1)
+        return self.keys[keys[pos] != self.keys]
+
+    def save(self):
+        keys, rows = self.current()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "wb") as f:
+            np.savez(f, keys=keys, rows=rows, signature=self.signature)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def check_manifests(conn, manifests):
+    """目标表行数和 manifest 对不上（被清空、手工改过）时改为全量推送，避免把缺失的行当成未修改。"""
     with conn.cursor() as cur:
-        sql = """
-        insert into radar_data (id, subject, value, full_mark, source, candidate_id)
-        values %s
-        on conflict (id) do update set
-          subject = excluded.subject,
-          value = excluded.value,
-          full_mark = excluded.full_mark,
-          source = excluded.source,
-          candidate_id = excluded.candidate_id;
-        """
-        inserted = 0
-        for chunk in df_iter_batches(df, BATCH):
-            values = [tuple(row) for row in chunk.itertuples(index=False, name=None)]
-            execute_values(cur, sql, values)
-            inserted += len(chunk)
+        for m in manifests:
+            if m.full or not m.keys.size:
+                continue
+            cur.execute(f"SELECT count(*) FROM {m.table}")
+            n = cur.fetchone()[0]
+            if n != m.keys.size:
+                print(f"[WARN] {m.table}: target has {n:,} rows, manifest {m.keys.size:,} — pushing all rows")
+                m.full = True
+    conn.commit()
+
+
+def child_tables(table):
+    """[(子表, 外键列)]：database-schema.sql 里所有外键都是 ON DELETE CASCADE。"""
+    return [(child, col) for child, spec in TABLES.items() if child != table
+            for col, parent in spec["refs"].items() if parent == table]
+
+
+def descendants(table):
+    """删除 table 的行时可能被级联删除的全部表。"""
+    found, todo = set(), [table]
+    while todo:
+        for child, _ in child_tables(todo.pop()):
+            if child not in found:
+                found.add(child)
+                todo.append(child)
+    return found
+
+
+def _cascaded(cur, table, hashes):
+    """删除 table 中这些 key 时会被级联删掉的子孙表行：{表: key hash 列表}。"""
+    victims, todo = {}, [(table, hashes)]
+    while todo:
+        parent, keys = todo.pop()
+        for child, col in child_tables(parent):
+            cur.execute(f"SELECT {key_hash_sql(child)} FROM {child} t WHERE t.{col} IN "
+                        f"(SELECT p.id FROM {parent} p WHERE {key_hash_sql(parent, 'p')} = ANY(%s))", (keys,))
+            found = [r[0] for r in cur.fetchall()]
+            if found:
+                victims.setdefault(child, []).extend(found)
+                todo.append((child, found))
+    return victims
+
+
+def delete_keys(conn, table, hashes, batch=100_000):
+    """按 key hash 删除目标库中的行；返回 (删除行数, 被级联删除的子孙表行 {表: key hash 列表})。
+
+    级联删除的行由调用方从子表 manifest 中去掉，否则它们会一直被当成“未修改”而不再推送。
+    """
+    deleted, cascaded = 0, {}
+    try:
+        with conn.cursor() as cur:
+            for i in range(0, len(hashes), batch):
+                keys = [int(h) for h in hashes[i:i + batch]]
+                for child, found in _cascaded(cur, table, keys).items():
+                    cascaded.setdefault(child, []).extend(found)
+                cur.execute(f"DELETE FROM {table} t WHERE {key_hash_sql(table)} = ANY(%s)", (keys,))
+                deleted += cur.rowcount
         conn.commit()
-    print(f"[OK] radar_data upserted: {inserted}")
+    except BaseException:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    return deleted, cascaded
+
+
+def partition_of(key, n):
+    """键 → 分区号。uuid 按前 8 位十六进制把键空间等分成 n 段（键范围分区）；其他键按 crc32 取模。"""
+    try:
+        return int(key[:8], 16) * n >> 32
+    except ValueError:
+        return zlib.crc32(key.encode("utf-8")) % n
 
 
-def main():
-    conn = connect()
+def split_table(table, n, records, spool_dir):
+    """把 records 按主键首列分到 n 个 CSV 临时文件；同一个键总在同一分区。返回 (文件列表, 每个分区行数)。"""
+    col = [c[0] for c in TABLES[table]["columns"]].index(TABLES[table]["key"][0])
+    paths = [os.path.join(spool_dir, f"{table}.part{i}.csv") for i in range(n)]
+    counts = [0] * n
+    files = [open(path, "w", newline="", encoding="utf-8") for path in paths]
+    writers = [csv.writer(f, lineterminator="\n") for f in files]
     try:
-        load_universities(conn)
-        load_candidates(conn)
-        load_publications(conn)
-        load_radar(conn)
+        for row, raw in records:
+            i = partition_of(row[col], n)
+            counts[i] += 1
+            if raw is None:
+                writers[i].writerow(row)
+            else:
+                files[i].write(raw)
     finally:
-        conn.close()
-        print("✅ Migration finished.")
+        for f in files:
+            f.close()
+    return paths, counts
+
+
+class ConnectionPool:
+    """最多 size 条连接，按需建立；出错断开的连接丢弃，下次重新连接。"""
+
+    def __init__(self, size):
+        self._free = queue.Queue()
+        for _ in range(size):
+            self._free.put(None)
+
+    def get(self):
+        conn = self._free.get()
+        if conn is not None and not conn.closed:
+            return conn
+        try:
+            return connect()
+        except BaseException:
+            # 连不上也要把名额还回去，否则 size 次失败后 get() 永远阻塞
+            self._free.put(None)
+            raise
+
+    def put(self, conn):
+        self._free.put(conn)
+
+    def close(self):
+        while not self._free.empty():
+            conn = self._free.get()
+            if conn is not None and not conn.closed:
+                conn.close()
+
+
+class TableLoad:
+    """一张表的调度状态：分区临时文件、剩余分区、拒绝行日志、manifest。"""
+
+    def __init__(self, table, n, manifest=None):
+        self.table, self.n = table, n
+        self.parents = {p for p in TABLES[table]["refs"].values() if p != table}
+        self.rejects = RejectLog(table)
+        self.manifest = manifest
+        self.parts = None              # 分区文件（split 完成后）；n == 1 时不切分
+        self.remaining = n
+        self.rows = self.merged = self.deleted = 0
+        self.t0 = time.time()
+
+    def records(self):
+        records = validated_rows(self.table, self.rejects)
+        return self.manifest.diff(records) if self.manifest else records
+
+
+def main(tables=None, jobs=JOBS, partitions=PARTITIONS, retries=RETRIES, spool_dir=SPOOL_DIR,
+         manifest_dir=None, full=False):
+    """并行迁移：父表全部提交后才开始子表；大表按键范围分区，每个分区单独事务、单独重试。
+
+    manifest_dir 不为 None 时只推送相对上次成功推送新增/修改的行，并删除输出里已经没有的行
+    （全部表 upsert 完之后按外键逆序删除，子表先删）；full=True 时推送全部行（目标库被改动过、
+    和 manifest 对不上时用）。
+    返回失败（含因父表失败而跳过）的表名列表。
+    """
+    t0 = time.time()
+    loads = {}
+    for t in tables or TABLES:
+        if has_table(table_path(t)):
+            manifest = PushManifest(t, manifest_dir, full) if manifest_dir else None
+            loads[t] = TableLoad(t, partitions if t in LARGE_TABLES and partitions > 1 else 1, manifest)
+    spool = tempfile.mkdtemp(prefix="migrate-", dir=spool_dir)
+    pool = ConnectionPool(jobs)
+    if manifest_dir:
+        conn = None
+        try:
+            conn = pool.get()
+            check_manifests(conn, [load.manifest for load in loads.values()])
+        finally:
+            if conn is not None:
+                pool.put(conn)
+    done, failed = set(), set()
+
+    def run_split(load, i, attempt):
+        return split_table(load.table, load.n, load.records(), spool)
+
+    def run_part(load, i, attempt):
+        if attempt:
+            time.sleep(2 ** attempt)
+        if load.parts is not None and not load.parts[1][i]:
+            return 0, 0, [], 0.0  # 这个分区没有要推送的行
+        conn = None
+        try:
+            conn = pool.get()
+            t = time.time()
+            if load.parts is None:
+                if attempt:
+                    # 整表重读：上一次的校验拒绝行作废，重新记录
+                    load.rejects.close()
+                    load.rejects = RejectLog(load.table)
+                staged, merged, fk_rejects = _merge(conn, load.table, CopyStream(load.records()))
+            else:
+                with open(load.parts[0][i], newline="", encoding="utf-8") as f:
+                    staged, merged, fk_rejects = _merge(conn, load.table, f)
+            return staged, merged, fk_rejects, time.time() - t
+        finally:
+            if conn is not None:
+                pool.put(conn)
+
+    def finish(load, ok):
+        load.rejects.close()
+        (done if ok else failed).add(load.table)
+        if load.parts:
+            for path in load.parts[0]:
+                os.remove(path)
+        if not ok:
+            return
+        print(f"[OK] {load.table}: {load.rows:,} rows copied, {load.merged:,} merged, "
+              f"{load.rejects.count:,} rejected in {time.time() - load.t0:.1f}s"
+              + (f" -> {load.rejects.path}" if load.rejects.count else ""))
+
+    with ThreadPoolExecutor(max_workers=jobs) as ex:
+        running = {}  # future → (load, 任务类型, 分区号, 尝试次数)
+        started = set()
+        tasks = {"split": run_split, "part": run_part}
+
+        def submit(load, kind, i=None, attempt=0):
+            running[ex.submit(tasks[kind], load, i, attempt)] = (load, kind, i, attempt)
+
+        # 切分不依赖父表，先做；与父表的加载重叠
+        for load in loads.values():
+            if load.n > 1:
+                submit(load, "split")
+        while True:
+            for load in loads.values():
+                if load.table in started or load.table in done | failed:
+                    continue
+                if load.parents & failed:
+                    print(f"[SKIP] {load.table}: parent table failed ({', '.join(sorted(load.parents & failed))})")
+                    finish(load, False)
+                elif not load.parents & (set(loads) - done) and (load.n == 1 or load.parts is not None):
+                    started.add(load.table)
+                    load.t0 = time.time()
+                    for i in range(load.n):
+                        submit(load, "part", i)
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                load, kind, i, attempt = running.pop(fut)
+                if load.table in failed:
+                    continue
+                what = f"[{i + 1}/{load.n}]" if kind == "part" else kind
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    if kind != "split" and attempt < retries:
+                        print(f"[RETRY] {load.table} {what} attempt {attempt + 2}: {e}")
+                        submit(load, kind, i, attempt + 1)
+                    else:
+                        print(f"[ERROR] {load.table} {what} failed: {e}")
+                        finish(load, False)
+                    continue
+                if kind == "split":
+                    load.parts = result
+                    continue
+                staged, merged, fk_rejects, seconds = result
+                for row, reason in fk_rejects:
+                    load.rejects.write(row, reason)
+                if load.manifest:
+                    load.manifest.drop(row for row, _ in fk_rejects)
+                load.rows += staged
+                load.merged += merged
+                load.remaining -= 1
+                if load.n > 1 and staged:
+                    print(f"[PART] {load.table} {what}: {staged:,} rows in {seconds:.1f}s "
+                          f"({staged / max(seconds, 1e-9):,.0f} rows/s)")
+                if load.remaining == 0:
+                    finish(load, True)
+
+    # 输出里已经没有的行：全部表 upsert 完之后再删，子表先删。父表先删会把还在输出里的子行级联删掉，
+    # 而子表 manifest 仍把它们记成“未修改”，之后再也不会推送
+    manifests = [loads[t].manifest for t in TABLES if t in done and loads[t].manifest]
+    for table in reversed(TABLES):
+        load = loads.get(table)
+        if table not in done or not load.manifest:
+            continue
+        gone = load.manifest.deleted()
+        if not gone.size:
+            continue
+        blocked = descendants(table) & failed
+        if blocked:
+            # 子表没推完，删父表会级联到它：留到下次
+            print(f"[SKIP] {table}: {gone.size:,} deletes deferred, child table failed ({', '.join(sorted(blocked))})")
+            load.manifest.keep(gone)
+            continue
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(2 ** attempt)
+            conn = None
+            try:
+                conn = pool.get()
+                load.deleted, cascaded = delete_keys(conn, table, gone)
+                break
+            except Exception as e:
+                if attempt < retries:
+                    print(f"[RETRY] {table} delete attempt {attempt + 2}: {e}")
+                else:
+                    print(f"[ERROR] {table} delete failed: {e}")
+            finally:
+                if conn is not None:
+                    pool.put(conn)
+        else:
+            failed.add(table)
+            load.manifest.keep(gone)
+            continue
+        for child, keys in cascaded.items():
+            # 输出里仍引用已删除父行的子行：和全量推送一样不该在库里，下次推送时会被外键拒绝
+            print(f"[WARN] {child}: {len(keys):,} rows referencing deleted {table} rows removed by cascade")
+            if child in loads and loads[child].manifest:
+                loads[child].manifest.forget(keys)
+    for m in manifests:
+        m.save()
+        print(f"[DIFF] {m.table}: {m.inserted:,} new, {m.changed:,} changed, {loads[m.table].deleted:,} deleted, "
+              f"{m.unchanged:,} unchanged" + (" (--full: pushed anyway)" if m.full else " skipped"))
+
+    pool.close()
+    shutil.rmtree(spool, ignore_errors=True)
+    print(f"✅ Migration finished in {time.time() - t0:.1f}s"
+          + (f" — failed: {', '.join(sorted(failed))}" if failed else "."))
+    return sorted(failed)
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data-dir", default=DATA_DIR, help="build 输出目录")
+    ap.add_argument("--tables", help="只迁移这些表（逗号分隔）")
+    ap.add_argument("--jobs", type=int, default=JOBS, help="并发连接数")
+    ap.add_argument("--partitions", type=int, default=PARTITIONS,
+                    help=f"大表（{', '.join(LARGE_TABLES)}）按键范围切分的分区数；1 = 不切分")
+    ap.add_argument("--retries", type=int, default=RETRIES, help="每个分区失败后的重试次数")
+    ap.add_argument("--spool-dir", default=SPOOL_DIR, help="分区临时文件目录（默认系统临时目录）")
+    ap.add_argument("--manifest-dir",
+                    help="上次推送的行哈希目录（默认 <data-dir>/.push_manifest/<host>_<port>_<db>）")
+    ap.add_argument("--no-manifest", action="store_true", help="不做变更检测，每次推送全部行")
+    ap.add_argument("--full", action="store_true", help="推送全部行并重建 manifest（目标库被改动过时用）")
+    args = ap.parse_args()
+    if args.jobs < 1 or args.partitions < 1 or args.retries < 0:
+        ap.error("--jobs and --partitions must be >= 1, --retries >= 0")
+    DATA_DIR = args.data_dir
+    manifest_dir = None if args.no_manifest else (
+        args.manifest_dir or os.path.join(DATA_DIR, ".push_manifest", f"{PG_HOST}_{PG_PORT}_{PG_DB}"))
+    failed = main(args.tables.split(",") if args.tables else None, args.jobs, args.partitions, args.retries,
+                  args.spool_dir, manifest_dir, args.full)
+    sys.exit(1 if failed else 0)
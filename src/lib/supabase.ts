@@ -28,6 +28,7 @@ export interface Candidate {
   graduation_year: number
   total_citations: number
   h_index?: number
+  ranking_score?: number
   research_interests: string[]
   profile_image_url?: string
   linkedin_url?: string
@@ -77,3 +78,18 @@ export interface AcademicMetric {
   created_at: string
   updated_at: string
 }
+
+// University comparison aggregates (one row per university, label and year)
+export interface UniversityConferenceStat {
+  university_id: string
+  conference: string
+  year: number
+  papers: number
+}
+
+export interface UniversityTopicStat {
+  university_id: string
+  topic: string
+  year: number
+  papers: number
+}